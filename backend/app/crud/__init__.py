@@ -2,15 +2,68 @@ from .transaction import (
     create_transaction,
     get_transaction,
     get_transactions,
+    count_transactions,
     update_transaction,
     delete_transaction,
     get_fixed_transactions,
     process_fixed_transactions
 )
 
+from .bulk import (
+    bulk_create_transactions,
+    bulk_update_transactions,
+    bulk_delete_transactions
+)
+
+from .recurring import (
+    create_schedule,
+    get_schedule,
+    get_schedules,
+    deactivate_schedule,
+    materialize_occurrences
+)
+
 from .bill import (
     create_bill,
     get_bill,
     get_bills,
     update_bill
-)
\ No newline at end of file
+)
+
+from .projection import get_upcoming_bills
+
+from .changes import record_transaction_changes, on_commit, mark_changed, get_data_version
+
+from .pagination import InvalidCursor
+
+from .anomalies import (
+    get_anomalies,
+    dismiss_anomaly,
+    rebuild_stats as rebuild_amount_stats
+)
+
+from .dedup import (
+    transaction_fingerprint,
+    duplicate_mask,
+    backfill_fingerprints,
+    merge_duplicates
+)
+
+from .rollup import (
+    category_totals_between,
+    rebuild as rebuild_monthly_totals
+)
+
+from .statistics import (
+    period_bounds,
+    get_monthly_statistics,
+    get_category_statistics,
+    get_income_and_expenses,
+    get_category_summary,
+    get_budget_statistics,
+    get_monthly_history,
+    get_transactions_frame,
+    get_financial_context,
+    financial_context_scopes
+)
+from . import aio
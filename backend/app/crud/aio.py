@@ -0,0 +1,50 @@
+"""
+Async counterparts of the crud functions, for `async def` routes.
+
+Each one runs the sync implementation through `AsyncSession.run_sync`: the
+queries go through the async driver and the event loop is never blocked on
+I/O, while the logic (and the commit hooks in `changes`) stays in one place.
+"""
+from sqlalchemy.ext.asyncio import AsyncSession
+from datetime import date
+from typing import List, Optional
+from .. import models, schemas
+from . import statistics, transaction
+from .changes import data_version_query
+
+async def get_transaction(db: AsyncSession, transaction_id: int) -> Optional[models.Transaction]:
+    return await db.run_sync(transaction.get_transaction, transaction_id)
+
+async def get_transactions(db: AsyncSession, **kwargs) -> dict:
+    """See `crud.get_transactions`"""
+    return await db.run_sync(transaction.get_transactions, **kwargs)
+
+async def count_transactions(
+    db: AsyncSession,
+    search: Optional[str] = None,
+    transaction_type: Optional[str] = None
+) -> int:
+    return await db.run_sync(transaction.count_transactions, search, transaction_type)
+
+async def create_transaction(db: AsyncSession, transaction_create: schemas.TransactionCreate) -> models.Transaction:
+    return await db.run_sync(transaction.create_transaction, transaction_create)
+
+async def update_transaction(
+    db: AsyncSession,
+    transaction_id: int,
+    transaction_update: schemas.TransactionUpdate
+) -> Optional[models.Transaction]:
+    return await db.run_sync(transaction.update_transaction, transaction_id, transaction_update)
+
+async def delete_transaction(db: AsyncSession, transaction_id: int) -> bool:
+    return await db.run_sync(transaction.delete_transaction, transaction_id)
+
+async def process_fixed_transactions(db: AsyncSession, target_date: date) -> List[models.Transaction]:
+    return await db.run_sync(transaction.process_fixed_transactions, target_date)
+
+async def get_financial_context(db: AsyncSession, today: Optional[date] = None) -> dict:
+    return await db.run_sync(statistics.get_financial_context, today)
+
+async def get_data_version(db: AsyncSession) -> int:
+    """Current data version; a primary key lookup, cheap enough for every request"""
+    return await db.scalar(data_version_query()) or 0
@@ -0,0 +1,331 @@
+"""
+Anomaly detection as transactions are written.
+
+amount_stats holds, per category and per merchant (normalized description)
+and type, the running count, mean and sum of squared deviations (M2) of
+the amounts. Every write computes the moments of its rows per key with
+numpy (bincount over key codes) and merges them into the stored ones (Chan
+et al.), so a batch costs one read and one upsert of the touched keys and
+history is never rescanned. The added rows are then z-scored in one vectorized pass
+against the other rows of their category and merchant; rows far above the
+mean, and rows repeating an existing booking's fingerprint, are stored in
+the anomalies table.
+"""
+from sqlalchemy import delete, func, select, tuple_, update
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import Session
+from datetime import date
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+import json
+import numpy as np
+import os
+from .. import models
+from .changes import mark_changed, on_transaction_changes
+from .dedup import normalize_description, transaction_fingerprint
+
+Stats = models.AmountStat
+Anomaly = models.Anomaly
+Transaction = models.Transaction
+
+# z-score from which an amount is flagged, and how many other amounts a
+# category / merchant needs before its amounts are scored
+Z_THRESHOLD = float(os.getenv("ANOMALY_Z_THRESHOLD", "4"))
+MIN_COUNT = int(os.getenv("ANOMALY_MIN_COUNT", "8"))
+# Lower bound of the standard deviation relative to the mean, so a constant
+# amount (a subscription) isn't flagged for a change of a few cents
+STD_FLOOR = 0.05
+
+StatKey = Tuple[str, str, str]  # (kind, key, type)
+# (count, mean, m2) arrays, indexed by the position of a key in a KeyIndex
+Moments = Tuple[np.ndarray, np.ndarray, np.ndarray]
+KeyIndex = Dict[StatKey, int]
+
+def key_codes(
+    rows: Sequence[dict],
+    keys: KeyIndex,
+    merchants: Optional[Dict[str, str]] = None
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    (codes, positions, amounts): one entry per row and statistics key it
+    feeds, the category key of every row and then the merchant key of rows
+    with a description. New keys are added to `keys`; `merchants` caches
+    normalized descriptions across calls.
+    """
+    if merchants is None:
+        merchants = {}
+    codes: List[int] = []
+    positions: List[int] = []
+    for position, row in enumerate(rows):
+        codes.append(keys.setdefault(('category', row['category'], row['type']), len(keys)))
+        positions.append(position)
+        description = row.get('description')
+        if description:
+            merchant = merchants.get(description)
+            if merchant is None:
+                merchant = merchants[description] = normalize_description(description) or str(description).lower()
+            codes.append(keys.setdefault(('merchant', merchant, row['type']), len(keys)))
+            positions.append(position)
+    amounts = np.fromiter((row['amount'] for row in rows), dtype=float, count=len(rows))
+    positions = np.array(positions, dtype=np.intp)
+    return np.array(codes, dtype=np.intp), positions, amounts[positions]
+
+def group_moments(codes: np.ndarray, amounts: np.ndarray, size: int) -> Moments:
+    """count, mean and m2 of the amounts per key code (two passes, no per-row Python)"""
+    count = np.bincount(codes, minlength=size)
+    mean = np.bincount(codes, amounts, minlength=size) / np.maximum(count, 1)
+    m2 = np.bincount(codes, (amounts - mean[codes]) ** 2, minlength=size)
+    return count, mean, m2
+
+def zero_moments(size: int) -> Moments:
+    return np.zeros(size, dtype=np.int64), np.zeros(size), np.zeros(size)
+
+def padded(moments: Moments, size: int) -> Moments:
+    """The moments with zeros for key codes added since they were computed"""
+    return tuple(np.pad(values, (0, size - len(values))) for values in moments)
+
+def combine(a: Moments, b: Moments) -> Moments:
+    """Moments of the union of two disjoint sets of amounts, per key"""
+    count = a[0] + b[0]
+    safe = np.maximum(count, 1)
+    delta = b[1] - a[1]
+    empty = count <= 0
+    return (
+        np.where(empty, 0, count),
+        np.where(empty, 0.0, a[1] + delta * b[0] / safe),
+        np.where(empty, 0.0, a[2] + b[2] + delta * delta * a[0] * b[0] / safe)
+    )
+
+def subtract(total: Moments, part: Moments) -> Moments:
+    """Moments of `total` without the amounts of `part`, the inverse of combine"""
+    count = total[0] - part[0]
+    safe = np.maximum(count, 1)
+    mean = (total[0] * total[1] - part[0] * part[1]) / safe
+    delta = part[1] - mean
+    m2 = total[2] - part[2] - delta * delta * count * part[0] / np.maximum(total[0], 1)
+    empty = count <= 0
+    return np.where(empty, 0, count), np.where(empty, 0.0, mean), np.where(empty, 0.0, np.maximum(m2, 0.0))
+
+def _in_keys(keys: Iterable[StatKey]):
+    """(kind, key, type) IN the given keys, bound as one JSON parameter"""
+    entries = func.json_each(json.dumps([list(key) for key in keys])).table_valued('value')
+    return tuple_(Stats.kind, Stats.key, Stats.type).in_(
+        select(*(func.json_extract(entries.c.value, f'$[{i}]') for i in range(3)))
+    )
+
+def load_stats(db: Session, keys: KeyIndex) -> Moments:
+    """The stored moments of the given keys, zero for keys not stored; one query"""
+    count, mean, m2 = zero_moments(len(keys))
+    if keys:
+        for kind, key, type_, *moments in db.execute(
+            select(Stats.kind, Stats.key, Stats.type, Stats.count, Stats.mean, Stats.m2).where(_in_keys(keys))
+        ):
+            code = keys[(kind, key, type_)]
+            count[code], mean[code], m2[code] = moments
+    return count, mean, m2
+
+def save_stats(db: Session, keys: KeyIndex, stats: Moments):
+    """Upsert the given moments with one executemany; keys without rows left are deleted"""
+    count, mean, m2 = (values.tolist() for values in stats)
+    kept = [
+        {'kind': kind, 'key': key, 'type': type_, 'count': count[code], 'mean': mean[code], 'm2': m2[code]}
+        for (kind, key, type_), code in keys.items()
+        if count[code] > 0
+    ]
+    if kept:
+        stmt = sqlite_insert(Stats)
+        db.execute(
+            stmt.on_conflict_do_update(
+                index_elements=[Stats.kind, Stats.key, Stats.type],
+                set_={'count': stmt.excluded.count, 'mean': stmt.excluded.mean, 'm2': stmt.excluded.m2}
+            ),
+            kept
+        )
+    emptied = [key for key, code in keys.items() if count[code] <= 0]
+    if emptied:
+        db.execute(delete(Stats).where(_in_keys(emptied)))
+
+def _anomaly(row: dict, reason: str, key: str, scored: Optional[tuple] = None) -> dict:
+    z, expected, std = scored if scored else (None, None, None)
+    return {
+        'transaction_id': row['id'],
+        'reason': reason,
+        'key': key,
+        'date': row['date'],
+        'description': row['description'],
+        'category': row['category'],
+        'type': row['type'],
+        'amount': float(row['amount']),
+        'expected': round(float(expected), 2) if expected is not None else None,
+        'std': round(float(std), 2) if std is not None else None,
+        'z_score': round(float(z), 2) if z is not None else None,
+    }
+
+def find_duplicates(db: Session, rows: Sequence[dict]) -> List[dict]:
+    """
+    Rows repeating the fingerprint of an earlier (lower id) transaction; one
+    indexed lookup for the whole batch.
+    """
+    fingerprints = [
+        row.get('fingerprint') or transaction_fingerprint(row['date'], row['description'], row['amount'], row['type'])
+        for row in rows
+    ]
+    entries = func.json_each(json.dumps(list(set(fingerprints)))).table_valued('value')
+    first_ids: Dict[str, int] = {
+        fingerprint: first_id
+        for fingerprint, count, first_id in db.execute(
+            select(Transaction.fingerprint, func.count(), func.min(Transaction.id))
+            .where(Transaction.fingerprint.in_(select(entries.c.value)))
+            .group_by(Transaction.fingerprint)
+        )
+        if count > 1
+    }
+    return [
+        _anomaly(row, 'duplicate', fingerprint)
+        for row, fingerprint in zip(rows, fingerprints)
+        if fingerprint in first_ids and row['id'] != first_ids[fingerprint]
+    ]
+
+def score_rows(
+    rows: Sequence[dict],
+    keyed: Tuple[np.ndarray, np.ndarray, np.ndarray],
+    keys: KeyIndex,
+    stats: Moments
+) -> List[dict]:
+    """
+    Anomalies of rows whose amount is Z_THRESHOLD deviations above the other
+    amounts of their category or merchant, scored in one vectorized pass
+    over key_codes' entries. The stored moments include each amount itself,
+    which is taken out in O(1); keys with fewer than MIN_COUNT other amounts
+    are not scored.
+    """
+    codes, positions, x = keyed
+    count = stats[0][codes].astype(float)
+    mean = stats[1][codes]
+    m2 = stats[2][codes]
+    others = count - 1
+    with np.errstate(divide='ignore', invalid='ignore'):
+        other_mean = (count * mean - x) / others
+        other_m2 = np.maximum(m2 - (x - other_mean) * (x - mean), 0.0)
+        std = np.maximum(np.maximum(np.sqrt(other_m2 / (others - 1)), STD_FLOOR * np.abs(other_mean)), 0.01)
+        z = (x - other_mean) / std
+    flagged = np.flatnonzero((others >= max(MIN_COUNT, 2)) & (z >= Z_THRESHOLD))
+
+    names = list(keys)
+    return [
+        _anomaly(rows[positions[i]], names[codes[i]][0], names[codes[i]][1], (z[i], other_mean[i], std[i]))
+        for i in flagged
+    ]
+
+def save_anomalies(db: Session, anomalies: List[dict], rescored_ids: Iterable[int]):
+    """
+    Store anomalies, keeping the dismissed flag of ones already stored;
+    anomalies of rescored (updated) transactions that no longer apply are
+    deleted.
+    """
+    rescored_ids = list(set(rescored_ids))
+    if rescored_ids:
+        flagged = {(anomaly['transaction_id'], anomaly['reason']) for anomaly in anomalies}
+        stale = []
+        for start in range(0, len(rescored_ids), 900):
+            stale.extend(
+                anomaly_id for anomaly_id, transaction_id, reason in db.execute(
+                    select(Anomaly.id, Anomaly.transaction_id, Anomaly.reason)
+                    .where(Anomaly.transaction_id.in_(rescored_ids[start:start + 900]))
+                )
+                if (transaction_id, reason) not in flagged
+            )
+        for start in range(0, len(stale), 900):
+            db.execute(delete(Anomaly).where(Anomaly.id.in_(stale[start:start + 900])))
+
+    if anomalies:
+        stmt = sqlite_insert(Anomaly)
+        db.execute(
+            stmt.on_conflict_do_update(
+                index_elements=[Anomaly.transaction_id, Anomaly.reason],
+                set_={
+                    column: getattr(stmt.excluded, column)
+                    for column in ('key', 'date', 'description', 'category', 'type', 'amount', 'expected', 'std', 'z_score')
+                }
+            ),
+            anomalies
+        )
+        mark_changed(db, 'anomalies')
+
+@on_transaction_changes
+def _update_stats_and_score(db: Session, added: List[dict], removed: List[dict]):
+    keys: KeyIndex = {}
+    merchants: Dict[str, str] = {}
+    added_keyed = key_codes(added, keys, merchants)
+    removed_keyed = key_codes(removed, keys, merchants)
+    if not keys:
+        return
+
+    stats = subtract(load_stats(db, keys), group_moments(removed_keyed[0], removed_keyed[2], len(keys)))
+    stats = combine(stats, group_moments(added_keyed[0], added_keyed[2], len(keys)))
+    save_stats(db, keys, stats)
+
+    # Rows without an id (e.g. diagnostics seeding) only feed the statistics
+    scored = [row for row in added if row.get('id') is not None]
+    added_ids = {row['id'] for row in scored}
+    deleted_ids = list({row['id'] for row in removed if row.get('id') is not None} - added_ids)
+    for start in range(0, len(deleted_ids), 900):
+        db.execute(delete(Anomaly).where(Anomaly.transaction_id.in_(deleted_ids[start:start + 900])))
+    if deleted_ids:
+        mark_changed(db, 'anomalies')
+
+    if scored:
+        codes, positions, amounts = added_keyed
+        if len(scored) < len(added):
+            has_id = np.array([row.get('id') is not None for row in added], dtype=bool)[positions]
+            added_keyed = codes[has_id], positions[has_id], amounts[has_id]
+        anomalies = score_rows(added, added_keyed, keys, stats) + find_duplicates(db, scored)
+        rescored = [row['id'] for row in removed if row.get('id') in added_ids]
+        save_anomalies(db, anomalies, rescored)
+
+def rebuild_stats(db: Session, batch_size: int = 10000) -> int:
+    """Recompute amount_stats from all transactions; returns the number of keys"""
+    db.execute(delete(Stats))
+    keys: KeyIndex = {}
+    merchants: Dict[str, str] = {}
+    totals = zero_moments(0)
+    result = db.execute(
+        select(Transaction.description, Transaction.category, Transaction.type, Transaction.amount)
+        .execution_options(yield_per=batch_size)
+    )
+    for partition in result.partitions():
+        codes, _, amounts = key_codes([row._mapping for row in partition], keys, merchants)
+        totals = combine(padded(totals, len(keys)), group_moments(codes, amounts, len(keys)))
+    save_stats(db, keys, totals)
+    mark_changed(db, 'anomalies')
+    db.commit()
+    return len(keys)
+
+def get_anomalies(
+    db: Session,
+    start_date: Optional[date] = None,
+    end_date: Optional[date] = None,
+    reason: Optional[str] = None,
+    include_dismissed: bool = False,
+    skip: int = 0,
+    limit: int = 100
+) -> List[models.Anomaly]:
+    """Flagged transactions, newest first"""
+    query = db.query(Anomaly)
+    if start_date:
+        query = query.filter(Anomaly.date >= start_date)
+    if end_date:
+        query = query.filter(Anomaly.date <= end_date)
+    if reason:
+        query = query.filter(Anomaly.reason == reason)
+    if not include_dismissed:
+        query = query.filter(Anomaly.is_dismissed == False)
+    return query.order_by(Anomaly.date.desc(), Anomaly.id.desc()).offset(skip).limit(limit).all()
+
+def dismiss_anomaly(db: Session, anomaly_id: int) -> Optional[models.Anomaly]:
+    anomaly = db.query(Anomaly).filter(Anomaly.id == anomaly_id).first()
+    if anomaly:
+        anomaly.is_dismissed = True
+        mark_changed(db, 'anomalies')
+        db.commit()
+        db.refresh(anomaly)
+    return anomaly
@@ -1,11 +1,26 @@
 from sqlalchemy.orm import Session
 from datetime import datetime, date
-from typing import Optional, List
+from typing import Optional, List, Sequence
 from .. import models, schemas
+from .changes import mark_changed
+
+# Fields of a bill in list responses, in schemas.Bill order
+LIST_COLUMNS = [
+    models.Bill.name,
+    models.Bill.amount,
+    models.Bill.due_date,
+    models.Bill.category,
+    models.Bill.is_recurring,
+    models.Bill.frequency,
+    models.Bill.id,
+    models.Bill.created_at,
+    models.Bill.updated_at,
+]
 
 def create_bill(db: Session, bill: schemas.BillCreate):
-    db_bill = models.Bill(**bill.dict())
+    db_bill = models.Bill(**bill.model_dump())
     db.add(db_bill)
+    mark_changed(db, 'bills')
     db.commit()
     db.refresh(db_bill)
     return db_bill
@@ -16,9 +31,11 @@ def get_bills(
     limit: int = 100,
     start_date: Optional[date] = None,
     end_date: Optional[date] = None,
-    category: Optional[str] = None
+    category: Optional[str] = None,
+    columns: Optional[Sequence] = None
 ) -> List[models.Bill]:
-    query = db.query(models.Bill)
+    """Bills, or result rows of `columns` (e.g. LIST_COLUMNS) when given"""
+    query = db.query(*columns) if columns is not None else db.query(models.Bill)
     
     if start_date:
         query = query.filter(models.Bill.due_date >= start_date)
@@ -35,9 +52,10 @@ def get_bill(db: Session, bill_id: int):
 def update_bill(db: Session, bill_id: int, bill: schemas.BillUpdate):
     db_bill = get_bill(db=db, bill_id=bill_id)
     if db_bill:
-        update_data = bill.dict(exclude_unset=True)
+        update_data = bill.model_dump(exclude_unset=True)
         for key, value in update_data.items():
             setattr(db_bill, key, value)
+        mark_changed(db, 'bills')
         db.commit()
         db.refresh(db_bill)
     return db_bill
\ No newline at end of file
@@ -0,0 +1,121 @@
+from sqlalchemy import bindparam, delete, insert, select, update
+from sqlalchemy.orm import Session
+from typing import Dict, Iterable, List, Sequence, Tuple
+from .. import models, schemas
+from .changes import record_transaction_changes
+from .dedup import transaction_fingerprint
+
+Transaction = models.Transaction
+
+# Fields written by the bulk statements, besides the fingerprint
+FIELDS = ('date', 'description', 'amount', 'category', 'type', 'is_fixed', 'frequency')
+
+# Read along with FIELDS so schedule templates can be recognized
+SCHEDULE_FIELDS = ('schedule_id', 'occurrence_date')
+
+# Stay below SQLite's bound parameter limit in IN (...) lookups
+_IN_CHUNK = 900
+
+def _with_fingerprint(values: dict) -> dict:
+    values['fingerprint'] = transaction_fingerprint(
+        values['date'], values['description'], values['amount'], values['type']
+    )
+    return values
+
+def _current_values(db: Session, ids: Iterable[int]) -> Dict[int, dict]:
+    """The stored FIELDS and SCHEDULE_FIELDS of the given transactions, looked up in chunks"""
+    ids = list(dict.fromkeys(ids))
+    found: Dict[int, dict] = {}
+    for start in range(0, len(ids), _IN_CHUNK):
+        for row in db.execute(
+            select(Transaction.id, *(getattr(Transaction, field) for field in FIELDS + SCHEDULE_FIELDS))
+            .where(Transaction.id.in_(ids[start:start + _IN_CHUNK]))
+        ):
+            found[row.id] = {field: getattr(row, field) for field in FIELDS + SCHEDULE_FIELDS}
+    return found
+
+def bulk_create_transactions(db: Session, items: Sequence[schemas.TransactionCreate]) -> List[int]:
+    """
+    Insert all items with one executemany and one commit; returns their ids
+    in order. Fixed items with a frequency start a schedule, as in
+    create_transaction.
+    """
+    if not items:
+        return []
+    rows = [_with_fingerprint(item.model_dump()) for item in items]
+    try:
+        ids = db.execute(
+            insert(Transaction).returning(Transaction.id, sort_by_parameter_order=True),
+            rows
+        ).scalars().all()
+        for row, transaction_id in zip(rows, ids):
+            row['id'] = transaction_id
+        record_transaction_changes(db, added=rows)
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    return list(ids)
+
+def bulk_update_transactions(
+    db: Session,
+    items: Sequence[Tuple[int, schemas.TransactionUpdate]]
+) -> List[bool]:
+    """
+    Apply (id, update) pairs as one UPDATE executemany in one commit.
+    Returns, per item, whether the transaction existed. An id given twice
+    gets both updates, in order.
+    """
+    current = _current_values(db, (transaction_id for transaction_id, _ in items))
+
+    found = []
+    updated: Dict[int, dict] = {}
+    for transaction_id, transaction_update in items:
+        if transaction_id not in current:
+            found.append(False)
+            continue
+        found.append(True)
+        values = dict(updated.get(transaction_id) or current[transaction_id])
+        update_data = transaction_update.model_dump(exclude_unset=True)
+        # Same rule as update_transaction
+        if 'is_fixed' in update_data and not update_data['is_fixed']:
+            update_data['frequency'] = None
+        values.update(update_data)
+        updated[transaction_id] = _with_fingerprint(values)
+
+    if updated:
+        table = Transaction.__table__
+        try:
+            # Every parameter set has the same keys, so this is a single
+            # executemany; updated_at is filled by its onupdate default
+            db.execute(
+                update(table).where(table.c.id == bindparam('row_id')),
+                [{'row_id': transaction_id, **values} for transaction_id, values in updated.items()]
+            )
+            record_transaction_changes(
+                db,
+                added=[{'id': transaction_id, **values} for transaction_id, values in updated.items()],
+                removed=[{'id': transaction_id, **current[transaction_id]} for transaction_id in updated]
+            )
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+    return found
+
+def bulk_delete_transactions(db: Session, ids: Sequence[int]) -> List[bool]:
+    """Delete the given transactions in one commit; returns, per id, whether it existed"""
+    current = _current_values(db, ids)
+    if current:
+        existing = list(current)
+        try:
+            for start in range(0, len(existing), _IN_CHUNK):
+                db.execute(delete(Transaction).where(Transaction.id.in_(existing[start:start + _IN_CHUNK])))
+            record_transaction_changes(
+                db, removed=[{'id': transaction_id, **values} for transaction_id, values in current.items()]
+            )
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+    return [transaction_id in current for transaction_id in ids]
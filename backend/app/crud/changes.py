@@ -0,0 +1,98 @@
+from sqlalchemy import event, select, update
+from sqlalchemy.orm import Session
+from datetime import date
+from typing import Callable, Iterable, List, Set
+from .. import models
+from . import rollup
+
+TRACKED_FIELDS = (
+    'id', 'date', 'description', 'category', 'type', 'amount', 'fingerprint',
+    'is_fixed', 'frequency', 'schedule_id', 'occurrence_date'
+)
+
+# Callbacks run after a commit that changed data, with the set of changed
+# scopes (e.g. {"transactions", "month:2024-03"} or {"bills"}). Used to drop
+# caches.
+_commit_listeners: List[Callable[[Set[str]], None]] = []
+
+def on_commit(listener: Callable[[Set[str]], None]) -> Callable[[Set[str]], None]:
+    """Register a callback for committed changes; usable as a decorator"""
+    _commit_listeners.append(listener)
+    return listener
+
+# Callbacks run by record_transaction_changes inside the writing database
+# transaction, with the added and removed rows (dicts). Used to maintain
+# derived tables besides the rollup.
+_change_hooks: List[Callable[[Session, List[dict], List[dict]], None]] = []
+
+def on_transaction_changes(
+    hook: Callable[[Session, List[dict], List[dict]], None]
+) -> Callable[[Session, List[dict], List[dict]], None]:
+    """Register a callback for recorded transaction changes; usable as a decorator"""
+    _change_hooks.append(hook)
+    return hook
+
+def mark_changed(db: Session, scope: str):
+    db.info.setdefault('changed_scopes', set()).add(scope)
+
+DataVersion = models.DataVersion
+
+def data_version_query():
+    return select(DataVersion.version).where(DataVersion.id == 1)
+
+def get_data_version(db: Session) -> int:
+    return db.scalar(data_version_query()) or 0
+
+def bump_data_version():
+    """Statement incrementing the data version; run it in the writing transaction"""
+    return update(DataVersion).where(DataVersion.id == 1).values(version=DataVersion.version + 1)
+
+@event.listens_for(Session, 'before_commit')
+def _bump_data_version(session: Session):
+    # Inside the committing transaction, so readers never see new data with
+    # the old version
+    if session.info.get('changed_scopes'):
+        session.execute(bump_data_version())
+
+@event.listens_for(Session, 'after_commit')
+def _notify_commit_listeners(session: Session):
+    scopes = session.info.pop('changed_scopes', None)
+    if scopes:
+        for listener in _commit_listeners:
+            listener(scopes)
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_changed_scopes(session: Session):
+    session.info.pop('changed_scopes', None)
+
+def month_scope(value: date) -> str:
+    """Scope marked when transactions dated in value's month change"""
+    return f"month:{value.year:04d}-{value.month:02d}"
+
+def transaction_values(transaction: models.Transaction) -> dict:
+    """Snapshot of the transaction fields that derived tables depend on"""
+    return {field: getattr(transaction, field) for field in TRACKED_FIELDS}
+
+def _as_rows(items: Iterable) -> List[dict]:
+    return [
+        item if isinstance(item, dict) else transaction_values(item)
+        for item in items
+    ]
+
+def record_transaction_changes(db: Session, added: Iterable = (), removed: Iterable = ()):
+    """
+    Report inserted / deleted transaction rows (ORM objects or dicts).
+
+    Every write path calls this before committing so the derived tables are
+    updated in the same database transaction. An update is a removal of the
+    old values plus an addition of the new ones.
+    """
+    # Pending ORM writes first, so objects have their ids and fingerprints
+    db.flush()
+    added, removed = _as_rows(added), _as_rows(removed)
+    rollup.apply_deltas(db, added=added, removed=removed)
+    for hook in _change_hooks:
+        hook(db, added, removed)
+    mark_changed(db, 'transactions')
+    for row in added + removed:
+        mark_changed(db, month_scope(row['date']))
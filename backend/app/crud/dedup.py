@@ -0,0 +1,134 @@
+from sqlalchemy import bindparam, event, func, select
+from sqlalchemy.orm import Session
+from collections import Counter
+from datetime import date
+from typing import Dict, Iterable, List
+import hashlib
+import re
+from .. import models
+from .changes import record_transaction_changes
+
+Transaction = models.Transaction
+
+_WHITESPACE = re.compile(r'\s+')
+# Long tokens with at least four digits: IBANs, card and booking references
+_REFERENCE_TOKEN = re.compile(r'\b(?=(?:[a-z]*\d){4})[a-z\d]{6,}\b')
+_DIGITS = re.compile(r'\d+')
+
+def normalize_fingerprint_description(description: str) -> str:
+    """
+    Case and whitespace insensitive, but unlike the categorization key it
+    keeps reference numbers, which tell apart otherwise equal bookings.
+    """
+    return _WHITESPACE.sub(' ', str(description)).strip().casefold()
+
+def normalize_description(description: str) -> str:
+    """
+    Merchant text without reference numbers, digits and extra whitespace, so
+    "MIGROS ZURICH 123" and "Migros Zurich 456" share a categorization cache
+    entry and merchant statistics.
+    """
+    text = str(description).lower()
+    text = _REFERENCE_TOKEN.sub(' ', text)
+    text = _DIGITS.sub(' ', text)
+    return _WHITESPACE.sub(' ', text).strip()
+
+def transaction_fingerprint(transaction_date: date, description: str, amount: float, transaction_type: str) -> str:
+    """Hash of (date, normalized description, amount, type) identifying a booking"""
+    key = "|".join((
+        transaction_date.isoformat(),
+        normalize_fingerprint_description(description),
+        f"{abs(float(amount)):.2f}",
+        str(transaction_type).lower()
+    ))
+    return hashlib.sha1(key.encode('utf-8')).hexdigest()
+
+def fingerprint_of(transaction: Transaction) -> str:
+    return transaction_fingerprint(
+        transaction.date, transaction.description, transaction.amount, transaction.type
+    )
+
+@event.listens_for(Transaction, 'before_insert')
+@event.listens_for(Transaction, 'before_update')
+def _set_fingerprint(mapper, connection, target: Transaction):
+    # ORM writes; Core bulk inserts pass the fingerprint themselves
+    target.fingerprint = fingerprint_of(target)
+
+def existing_fingerprint_counts(db: Session, fingerprints: Iterable[str]) -> Dict[str, int]:
+    """Stored rows per fingerprint, for a batch of fingerprints, via the index"""
+    fingerprints = list(set(fingerprints))
+    counts: Dict[str, int] = {}
+    # Stay below SQLite's bound parameter limit
+    for start in range(0, len(fingerprints), 900):
+        chunk = fingerprints[start:start + 900]
+        counts.update(db.execute(
+            select(Transaction.fingerprint, func.count())
+            .where(Transaction.fingerprint.in_(chunk))
+            .group_by(Transaction.fingerprint)
+        ).all())
+    return counts
+
+def duplicate_mask(db: Session, fingerprints: List[str]) -> List[bool]:
+    """
+    Which rows of a batch to skip: those whose fingerprint is already
+    stored or appeared earlier in the batch. Rows in later batches of the
+    same import see the earlier batches as stored, so a repeated row is
+    skipped wherever it falls.
+    """
+    existing = existing_fingerprint_counts(db, fingerprints)
+    seen = set()
+    mask = []
+    for fingerprint in fingerprints:
+        mask.append(fingerprint in seen or existing.get(fingerprint, 0) > 0)
+        seen.add(fingerprint)
+    return mask
+
+def backfill_fingerprints(db: Session, batch_size: int = 5000) -> int:
+    """Compute missing fingerprints in batches; returns the number of rows updated"""
+    table = Transaction.__table__
+    statement = table.update().where(
+        table.c.id == bindparam('row_id')
+    ).values(fingerprint=bindparam('row_fingerprint'))
+
+    updated = 0
+    while True:
+        rows = db.execute(
+            select(Transaction.id, Transaction.date, Transaction.description, Transaction.amount, Transaction.type)
+            .where(Transaction.fingerprint.is_(None))
+            .limit(batch_size)
+        ).all()
+        if not rows:
+            return updated
+        db.execute(statement, [
+            {
+                'row_id': row.id,
+                'row_fingerprint': transaction_fingerprint(row.date, row.description, row.amount, row.type)
+            }
+            for row in rows
+        ])
+        db.commit()
+        updated += len(rows)
+
+def find_duplicates(db: Session) -> List[List[Transaction]]:
+    """Groups of transactions sharing a fingerprint, oldest (lowest id) first"""
+    duplicated = select(Transaction.fingerprint).where(
+        Transaction.fingerprint.is_not(None)
+    ).group_by(Transaction.fingerprint).having(func.count() > 1)
+
+    groups: Dict[str, List[Transaction]] = {}
+    for transaction in db.query(Transaction).filter(
+        Transaction.fingerprint.in_(duplicated)
+    ).order_by(Transaction.fingerprint, Transaction.id):
+        groups.setdefault(transaction.fingerprint, []).append(transaction)
+    return list(groups.values())
+
+def merge_duplicates(db: Session) -> int:
+    """Delete all but the oldest transaction of every duplicate group"""
+    removed = [transaction for group in find_duplicates(db) for transaction in group[1:]]
+    if not removed:
+        return 0
+    for transaction in removed:
+        db.delete(transaction)
+    record_transaction_changes(db, removed=removed)
+    db.commit()
+    return len(removed)
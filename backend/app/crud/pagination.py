@@ -0,0 +1,94 @@
+import base64
+import json
+from datetime import date, datetime
+from typing import Any, Optional, Tuple
+from sqlalchemy import Boolean, Date, DateTime, Float, Integer, String, and_, literal, or_
+from .. import models
+
+# Columns transactions can be sorted by. Each is declared NOT NULL, which
+# keeps the (sort value, id) keyset total and stable, and has a (column, id)
+# index (the primary key for id) so every page is a seek; see
+# models.Transaction. Nullable columns such as created_at are left out.
+SORTABLE_FIELDS = ('id', 'date', 'description', 'amount', 'category', 'type')
+
+# Pseudo sort field for full-text search results, ordered by bm25 rank
+RELEVANCE = 'relevance'
+
+class InvalidCursor(ValueError):
+    pass
+
+def _to_json(value: Any) -> Any:
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    return value
+
+def _from_json(column_type, value: Any) -> Any:
+    if value is None:
+        return None
+    if isinstance(column_type, DateTime):
+        return datetime.fromisoformat(value)
+    if isinstance(column_type, Date):
+        return date.fromisoformat(value)
+    if isinstance(column_type, Float):
+        return float(value)
+    if isinstance(column_type, Integer):
+        return int(value)
+    if isinstance(column_type, Boolean):
+        return bool(value)
+    return value
+
+def encode_cursor(sort_field: str, sort_direction: str, value: Any, last_id: int) -> str:
+    """Opaque cursor pointing just after the row (value, last_id) in the given ordering"""
+    payload = [sort_field, sort_direction, _to_json(value), last_id]
+    raw = json.dumps(payload, separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+def decode_cursor(cursor: str, sort_field: str, sort_direction: str, column) -> Tuple[Any, int]:
+    """Return the (sort value, id) of a cursor created for the same ordering"""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        field, direction, value, last_id = json.loads(base64.urlsafe_b64decode(padded))
+        value = _from_json(column.type, value)
+        last_id = int(last_id)
+    except Exception as e:
+        raise InvalidCursor(f"Malformed cursor: {e}") from e
+    if (field, direction) != (sort_field, sort_direction):
+        raise InvalidCursor("Cursor was created for a different sort order")
+    return value, last_id
+
+def keyset_filter(column, sort_direction: str, value: Any, last_id: int):
+    """Rows strictly after (value, last_id) in the (column, id) ordering"""
+    id_column = models.Transaction.id
+    if isinstance(column.type, DateTime):
+        # Timestamps come from SQLite's CURRENT_TIMESTAMP text; compare in
+        # that format rather than SQLAlchemy's microsecond one
+        value = literal(value.isoformat(sep=' '), String())
+    else:
+        # Bind through literal() so booleans compare like any other value
+        value = literal(value, column.type)
+    # The redundant bound on the sort column lets SQLite seek the
+    # (column, id) index instead of filtering from the first row
+    if sort_direction == 'desc':
+        return and_(column <= value, or_(column < value, and_(column == value, id_column < last_id)))
+    return and_(column >= value, or_(column > value, and_(column == value, id_column > last_id)))
+
+def order_by(column, sort_direction: str):
+    id_column = models.Transaction.id
+    if sort_direction == 'desc':
+        return column.desc(), id_column.desc()
+    return column.asc(), id_column.asc()
+
+def normalize_sort(
+    sort_field: Optional[str],
+    sort_direction: Optional[str],
+    ranked: bool = False
+) -> Tuple[str, str]:
+    """
+    Resolve the requested ordering. Ranked search results default to best
+    match first; otherwise missing or unknown fields fall back to newest first.
+    """
+    if ranked and sort_field in (None, RELEVANCE):
+        return RELEVANCE, 'asc'
+    if sort_field not in SORTABLE_FIELDS:
+        return 'date', 'desc'
+    return sort_field, 'desc' if sort_direction == 'desc' else 'asc'
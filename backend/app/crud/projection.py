@@ -0,0 +1,166 @@
+"""
+Upcoming bill occurrences.
+
+Recurring bills store only their first due date, so future obligations are
+computed: the bills are loaded once into numpy arrays and every occurrence
+in a date range is generated in one vectorized pass and rendered straight
+to JSON. Both the arrays and the rendered calendars are cached until a bill
+changes.
+"""
+from sqlalchemy import String, case, select, type_coerce
+from sqlalchemy.orm import Session
+from collections import OrderedDict
+from datetime import date, timedelta
+from threading import Lock
+from typing import NamedTuple, Optional
+import numpy as np
+import orjson
+from .. import models
+from .changes import on_commit
+
+FREQUENCY_MONTHS = {'monthly': 1, 'quarterly': 3, 'yearly': 12}
+
+class BillArrays(NamedTuple):
+    ids: np.ndarray
+    categories: np.ndarray
+    amounts: np.ndarray
+    anchor_months: np.ndarray  # Months since 1970-01 of the first due date
+    anchor_days: np.ndarray  # Its day of month
+    steps: np.ndarray  # Months between occurrences, 0 for one-off bills
+    heads: np.ndarray  # Each bill's occurrence as JSON bytes, up to the due date value
+
+class Projection(NamedTuple):
+    bills: BillArrays
+    index: np.ndarray  # Row in `bills` of every occurrence
+    dates: np.ndarray  # datetime64[D], ascending
+
+def load_bill_arrays(db: Session) -> BillArrays:
+    Bill = models.Bill
+    # Core rows with the due date as its ISO string, which numpy parses in
+    # one go; a bill marked recurring without a known frequency only occurs once
+    rows = db.connection().execute(
+        select(
+            Bill.id, Bill.amount, type_coerce(Bill.due_date, String),
+            case((Bill.is_recurring == True, case(FREQUENCY_MONTHS, value=Bill.frequency, else_=0)), else_=0),
+            Bill.name, Bill.category, Bill.frequency
+        ).order_by(Bill.id)
+    ).all()
+    ids, amounts, due_dates, steps, _, categories, _ = (
+        list(column) for column in zip(*rows)
+    ) if rows else ([] for _ in range(7))
+
+    due = np.array(due_dates, dtype='datetime64[D]')
+    anchor_months = due.astype('datetime64[M]')
+    heads = np.empty(len(rows), dtype=object)
+    heads[:] = [
+        orjson.dumps({
+            "bill_id": bill_id,
+            "name": name,
+            "amount": amount,
+            "category": category,
+            "frequency": frequency,
+        })[:-1] + b',"due_date":'
+        for bill_id, amount, _, _, name, category, frequency in rows
+    ]
+    return BillArrays(
+        ids=np.array(ids, dtype=np.int64),
+        categories=np.array(categories, dtype=object),
+        amounts=np.array(amounts, dtype=np.float64),
+        anchor_months=anchor_months.astype(np.int64),
+        anchor_days=(due - anchor_months.astype('datetime64[D]')).astype(np.int64) + 1,
+        steps=np.array(steps, dtype=np.int64),
+        heads=heads
+    )
+
+def expand(bills: BillArrays, start: date, end: date) -> Projection:
+    """Every occurrence of every bill in [start, end], sorted by date and bill id"""
+    start_day, end_day = np.datetime64(start, 'D'), np.datetime64(end, 'D')
+    start_month = start_day.astype('datetime64[M]').astype(np.int64)
+    end_month = end_day.astype('datetime64[M]').astype(np.int64)
+
+    # Occurrence numbers n (month = anchor + n * step) that can fall in the
+    # range; one-off bills (step 0) have only n = 0
+    recurring = bills.steps > 0
+    step = np.where(recurring, bills.steps, 1)
+    first = np.where(recurring, np.maximum(0, -((bills.anchor_months - start_month) // step)), 0)
+    last = np.where(recurring, (end_month - bills.anchor_months) // step, 0)
+    counts = np.maximum(0, last - first + 1)
+
+    index = np.repeat(np.arange(len(bills.ids)), counts)
+    n = first[index] + np.arange(len(index)) - np.repeat(np.cumsum(counts) - counts, counts)
+    months = bills.anchor_months[index] + n * bills.steps[index]
+
+    # Clamp the day to the month's length: the 31st is the 30th in April
+    month_starts = months.astype('datetime64[M]').astype('datetime64[D]')
+    month_lengths = ((months + 1).astype('datetime64[M]').astype('datetime64[D]') - month_starts).astype(np.int64)
+    dates = month_starts + (np.minimum(bills.anchor_days[index], month_lengths) - 1)
+
+    in_range = (dates >= start_day) & (dates <= end_day)
+    index, dates = index[in_range], dates[in_range]
+    order = np.lexsort((bills.ids[index], dates))
+    return Projection(bills, index[order], dates[order])
+
+def render(projection: Projection, start: date, end: date, category: Optional[str] = None) -> bytes:
+    """
+    The occurrences with their count and total, as the JSON response body.
+    Occurrences of a bill differ only in their due date, so every bill's
+    fields are serialized once (BillArrays.heads) and every date once.
+    """
+    bills, index, dates = projection
+    if category:
+        selected = bills.categories[index] == category
+        index, dates = index[selected], dates[selected]
+
+    days = np.empty((end - start).days + 1, dtype=object)
+    days[:] = [orjson.dumps(start + timedelta(days=offset)) + b'}' for offset in range(len(days))]
+    offsets = (dates - np.datetime64(start, 'D')).astype(np.int64)
+    occurrences = b','.join((bills.heads[index] + days[offsets]).tolist())
+    summary = orjson.dumps({
+        "start_date": start,
+        "end_date": end,
+        "count": len(index),
+        "total_amount": round(float(bills.amounts[index].sum()), 2),
+    })
+    return summary[:-1] + b',"occurrences":[' + occurrences + b']}'
+
+# Bill arrays and rendered calendars, dropped whenever bills change. The
+# generation counter keeps a load that raced with a change out of the cache.
+_CALENDAR_CACHE_SIZE = 32
+_bill_arrays: Optional[BillArrays] = None
+_calendars: "OrderedDict[tuple, bytes]" = OrderedDict()
+_generation = 0
+_cache_lock = Lock()
+
+@on_commit
+def _clear_projection_cache(scopes):
+    global _bill_arrays, _generation
+    if 'bills' in scopes:
+        with _cache_lock:
+            _bill_arrays = None
+            _calendars.clear()
+            _generation += 1
+
+def get_upcoming_bills(db: Session, start: date, end: date, category: Optional[str] = None) -> bytes:
+    """
+    Occurrences of all bills due in [start, end], with their count and
+    total, as a JSON document (see render).
+    """
+    global _bill_arrays
+    key = (start, end, category)
+    with _cache_lock:
+        if key in _calendars:
+            _calendars.move_to_end(key)
+            return _calendars[key]
+        bills, generation = _bill_arrays, _generation
+
+    if bills is None:
+        bills = load_bill_arrays(db)
+    calendar = render(expand(bills, start, end), start, end, category)
+
+    with _cache_lock:
+        if generation == _generation:
+            _bill_arrays = bills
+            _calendars[key] = calendar
+            if len(_calendars) > _CALENDAR_CACHE_SIZE:
+                _calendars.popitem(last=False)
+    return calendar
@@ -0,0 +1,245 @@
+from sqlalchemy import bindparam, or_, update
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import Session
+from datetime import date, timedelta
+from dateutil.relativedelta import relativedelta
+from typing import Dict, Iterator, List, Optional, Tuple
+from .. import models, schemas
+from .changes import on_transaction_changes, record_transaction_changes
+from .dedup import transaction_fingerprint
+
+RecurringSchedule = models.RecurringSchedule
+Transaction = models.Transaction
+
+FREQUENCY_MONTHS = {'monthly': 1, 'quarterly': 3, 'yearly': 12}
+
+# Fields a schedule copies from its template transaction
+TEMPLATE_FIELDS = ('description', 'amount', 'category', 'type', 'frequency')
+
+# Stay below SQLite's bound parameter limit in IN (...) lookups
+_IN_CHUNK = 900
+
+def occurrence_dates(schedule: RecurringSchedule, first: date, last: date) -> Iterator[date]:
+    """
+    The schedule's occurrences within [first, last]. The n-th occurrence is
+    start_date plus n periods (clamped to the month's end, so a schedule
+    starting on the 31st lands on the last day of shorter months); the loop
+    starts near `first` rather than at start_date.
+    """
+    step = FREQUENCY_MONTHS[schedule.frequency]
+    if schedule.end_date is not None:
+        last = min(last, schedule.end_date)
+    first = max(first, schedule.start_date)
+    start = schedule.start_date
+    months = (first.year - start.year) * 12 + first.month - start.month
+    n = max(0, months // step)
+    while True:
+        occurrence = start + relativedelta(months=n * step)
+        if occurrence > last:
+            return
+        if occurrence >= first:
+            yield occurrence
+        n += 1
+
+def create_schedule(db: Session, schedule: schemas.RecurringScheduleCreate) -> RecurringSchedule:
+    db_schedule = RecurringSchedule(**schedule.model_dump())
+    db.add(db_schedule)
+    db.commit()
+    db.refresh(db_schedule)
+    return db_schedule
+
+def get_schedule(db: Session, schedule_id: int) -> Optional[RecurringSchedule]:
+    return db.query(RecurringSchedule).filter(RecurringSchedule.id == schedule_id).first()
+
+def get_schedules(db: Session, active_only: bool = False) -> List[RecurringSchedule]:
+    query = db.query(RecurringSchedule)
+    if active_only:
+        query = query.filter(RecurringSchedule.is_active == True)
+    return query.order_by(RecurringSchedule.id).all()
+
+def deactivate_schedule(db: Session, schedule_id: int) -> Optional[RecurringSchedule]:
+    """Stop future occurrences; the materialized transactions are kept"""
+    db_schedule = get_schedule(db, schedule_id)
+    if db_schedule is None:
+        return None
+    db_schedule.is_active = False
+    db.commit()
+    db.refresh(db_schedule)
+    return db_schedule
+
+def _is_recurring(row: dict) -> bool:
+    return bool(row.get('is_fixed') and row.get('frequency'))
+
+def _start_schedules(db: Session, rows: List[dict]):
+    """
+    Start a schedule from each of the given transactions, which becomes its
+    first occurrence (its template)
+    """
+    schedules = [
+        RecurringSchedule(
+            description=row['description'],
+            amount=row['amount'],
+            category=row['category'],
+            type=row['type'],
+            frequency=row['frequency'],
+            start_date=row['date'],
+            transaction_id=row['id'],
+            materialized_through=row['date']
+        )
+        for row in rows
+    ]
+    db.add_all(schedules)
+    db.flush()
+    table = Transaction.__table__
+    db.execute(
+        update(table).where(table.c.id == bindparam('row_id')),
+        [
+            {'row_id': row['id'], 'schedule_id': schedule.id, 'occurrence_date': row['date']}
+            for row, schedule in zip(rows, schedules)
+        ]
+    )
+
+def _update_templates(db: Session, changes: List[Tuple[Optional[dict], dict]]):
+    """
+    Follow (new values, previous values) changes of transactions that may be
+    schedule templates, new values being None for a deletion. A schedule
+    stops when its template is deleted or stops being fixed, resumes when it
+    is fixed again, and takes over the fields of later template edits.
+    """
+    schedule_ids = list({previous['schedule_id'] for _, previous in changes})
+    schedules: Dict[int, RecurringSchedule] = {}
+    for start in range(0, len(schedule_ids), _IN_CHUNK):
+        for schedule in db.query(RecurringSchedule).filter(
+            RecurringSchedule.id.in_(schedule_ids[start:start + _IN_CHUNK])
+        ):
+            schedules[schedule.id] = schedule
+
+    for row, previous in changes:
+        schedule = schedules.get(previous['schedule_id'])
+        if schedule is None or schedule.transaction_id != previous['id']:
+            continue
+        if row is None or not _is_recurring(row):
+            if row is None or _is_recurring(previous):
+                schedule.is_active = False
+            continue
+        if not _is_recurring(previous):
+            schedule.is_active = True
+        for field in TEMPLATE_FIELDS:
+            setattr(schedule, field, row[field])
+
+@on_transaction_changes
+def _sync_schedules(db: Session, added: List[dict], removed: List[dict]):
+    """
+    Keep schedules in step with every write path: new transactions that are
+    fixed with a frequency (or become so) start a schedule, and changes to a
+    schedule's template are applied to the schedule.
+    """
+    # Rows recorded without ids (e.g. raw inserts) can't be tracked
+    previous = {row['id']: row for row in removed if row.get('id') is not None}
+    starting = []
+    templates = []
+    for row in added:
+        if row.get('id') is None:
+            continue
+        before = previous.pop(row['id'], None)
+        schedule_id = row.get('schedule_id') or (before or {}).get('schedule_id')
+        if schedule_id is not None:
+            if before is not None:
+                templates.append((row, {**before, 'schedule_id': schedule_id}))
+        elif _is_recurring(row) and (before is None or not _is_recurring(before)):
+            starting.append(row)
+    # Removed rows without a new version were deleted
+    templates.extend((None, row) for row in previous.values() if row.get('schedule_id') is not None)
+
+    if starting:
+        _start_schedules(db, starting)
+    if templates:
+        _update_templates(db, templates)
+
+def materialize_occurrences(
+    db: Session,
+    end_date: date,
+    start_date: Optional[date] = None
+) -> List[int]:
+    """
+    Insert the transactions of all occurrences due up to end_date and return
+    their ids.
+
+    Without start_date every active schedule continues after its
+    materialized_through watermark, so the work is proportional to the new
+    occurrences and a run after downtime catches up on everything missed.
+    With start_date, occurrences in [start_date, end_date] are (re)created.
+    Either way, the unique (schedule_id, occurrence_date) index with ON
+    CONFLICT DO NOTHING makes repeated and concurrent runs harmless.
+    """
+    query = db.query(RecurringSchedule).filter(
+        RecurringSchedule.is_active == True,
+        RecurringSchedule.start_date <= end_date
+    )
+    if start_date is None:
+        query = query.filter(or_(
+            RecurringSchedule.materialized_through.is_(None),
+            RecurringSchedule.materialized_through < end_date
+        ))
+    else:
+        query = query.filter(or_(
+            RecurringSchedule.end_date.is_(None),
+            RecurringSchedule.end_date >= start_date
+        ))
+
+    rows = []
+    advanced = []
+    for schedule in query:
+        resume = (
+            schedule.materialized_through + timedelta(days=1)
+            if schedule.materialized_through is not None else schedule.start_date
+        )
+        first = resume if start_date is None else start_date
+        # The watermark only moves over ranges without gaps behind it
+        if first <= resume:
+            advanced.append(schedule.id)
+        for occurrence in occurrence_dates(schedule, first, end_date):
+            rows.append({
+                'date': occurrence,
+                'description': schedule.description,
+                'amount': schedule.amount,
+                'category': schedule.category,
+                'type': schedule.type,
+                'is_fixed': True,
+                'frequency': schedule.frequency,
+                'schedule_id': schedule.id,
+                'occurrence_date': occurrence,
+                'fingerprint': transaction_fingerprint(
+                    occurrence, schedule.description, schedule.amount, schedule.type
+                ),
+            })
+
+    try:
+        inserted = []
+        if rows:
+            inserted = db.execute(
+                sqlite_insert(Transaction).on_conflict_do_nothing().returning(
+                    Transaction.id, Transaction.date, Transaction.description, Transaction.category,
+                    Transaction.type, Transaction.amount, Transaction.fingerprint,
+                    Transaction.is_fixed, Transaction.frequency,
+                    Transaction.schedule_id, Transaction.occurrence_date
+                ),
+                rows
+            ).all()
+            if inserted:
+                record_transaction_changes(db, added=[row._asdict() for row in inserted])
+        if advanced:
+            db.execute(
+                update(RecurringSchedule)
+                .where(RecurringSchedule.id.in_(advanced))
+                .where(or_(
+                    RecurringSchedule.materialized_through.is_(None),
+                    RecurringSchedule.materialized_through < end_date
+                ))
+                .values(materialized_through=end_date)
+            )
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    return [row.id for row in inserted]
@@ -0,0 +1,152 @@
+from sqlalchemy.orm import Session
+from sqlalchemy import Integer, cast, delete, func, insert, select
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from datetime import date, timedelta
+from typing import Dict, Iterable, List, Optional, Tuple
+from dateutil.relativedelta import relativedelta
+from .. import models
+
+Totals = models.MonthlyCategoryTotal
+
+def _month_index(column_year, column_month):
+    return column_year * 12 + column_month - 1
+
+def _first_of_month(value: date) -> date:
+    return value.replace(day=1)
+
+def apply_deltas(db: Session, added: Iterable[dict] = (), removed: Iterable[dict] = ()):
+    """
+    Fold added / removed transaction rows into monthly_category_totals.
+
+    Rows are mappings with date, category, type and amount. Deltas are summed
+    per (year, month, category, type) first, so a batch costs one upsert per
+    touched bucket rather than one per row. Runs inside the caller's
+    transaction.
+    """
+    deltas: Dict[Tuple[int, int, str, str], List[float]] = {}
+    for sign, rows in ((1, added), (-1, removed)):
+        for row in rows:
+            key = (row['date'].year, row['date'].month, row['category'], row['type'])
+            bucket = deltas.setdefault(key, [0.0, 0])
+            bucket[0] += sign * float(row['amount'])
+            bucket[1] += sign
+
+    deltas = {key: value for key, value in deltas.items() if value[1] != 0 or value[0] != 0}
+    if not deltas:
+        return
+
+    stmt = sqlite_insert(Totals)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[Totals.year, Totals.month, Totals.category, Totals.type],
+        set_={
+            'total': Totals.total + stmt.excluded.total,
+            'count': Totals.count + stmt.excluded.count,
+        }
+    )
+    db.execute(stmt, [
+        {'year': y, 'month': m, 'category': c, 'type': t, 'total': total, 'count': count}
+        for (y, m, c, t), (total, count) in deltas.items()
+    ])
+
+    if any(count < 0 for _, count in deltas.values()):
+        db.execute(delete(Totals).where(Totals.count <= 0))
+
+def rebuild(db: Session) -> int:
+    """Recompute monthly_category_totals from scratch. Returns the bucket count."""
+    # Imported here: crud.changes imports this module
+    from .changes import mark_changed
+    Transaction = models.Transaction
+    db.execute(delete(Totals))
+    db.execute(
+        insert(Totals).from_select(
+            ['year', 'month', 'category', 'type', 'total', 'count'],
+            select(
+                cast(func.strftime('%Y', Transaction.date), Integer),
+                cast(func.strftime('%m', Transaction.date), Integer),
+                Transaction.category,
+                Transaction.type,
+                func.sum(Transaction.amount),
+                func.count(Transaction.id)
+            ).group_by(
+                func.strftime('%Y', Transaction.date),
+                func.strftime('%m', Transaction.date),
+                Transaction.category,
+                Transaction.type
+            )
+        )
+    )
+    # Totals may have drifted, so cached reads and ETags of them are stale
+    mark_changed(db, 'transactions')
+    db.commit()
+    return db.query(func.count()).select_from(Totals).scalar()
+
+def raw_category_totals_query(db: Session, start: Optional[date], end: Optional[date]):
+    """Aggregate transactions in [start, end) directly; used for partial months"""
+    Transaction = models.Transaction
+    query = db.query(
+        Transaction.category,
+        Transaction.type,
+        func.sum(Transaction.amount),
+        func.count(Transaction.id)
+    ).group_by(Transaction.category, Transaction.type)
+    if start:
+        query = query.filter(Transaction.date >= start)
+    if end:
+        query = query.filter(Transaction.date < end)
+    return query
+
+def rollup_category_totals_query(db: Session, start: Optional[date], end: Optional[date]):
+    """Aggregate the rollup over the whole months in [start, end)"""
+    query = db.query(
+        Totals.category,
+        Totals.type,
+        func.sum(Totals.total),
+        func.sum(Totals.count)
+    ).group_by(Totals.category, Totals.type)
+    month_index = _month_index(Totals.year, Totals.month)
+    if start:
+        query = query.filter(month_index >= start.year * 12 + start.month - 1)
+    if end:
+        query = query.filter(month_index < end.year * 12 + end.month - 1)
+    return query
+
+def category_totals_between(
+    db: Session,
+    start_date: Optional[date] = None,
+    end_date: Optional[date] = None
+) -> List[Tuple[str, str, float, int]]:
+    """
+    (category, type, total, count) for transactions between start_date and
+    end_date inclusive.
+
+    Whole months are read from the rollup; only the partial months at either
+    edge of the range are aggregated from the transactions table.
+    """
+    end = end_date + timedelta(days=1) if end_date else None
+    full_start = None
+    if start_date:
+        full_start = start_date if start_date.day == 1 else _first_of_month(start_date) + relativedelta(months=1)
+    full_end = _first_of_month(end) if end else None
+
+    queries = []
+    if full_start and full_end and full_start >= full_end:
+        queries.append(raw_category_totals_query(db, start_date, end))
+    else:
+        queries.append(rollup_category_totals_query(db, full_start, full_end))
+        if start_date and start_date < full_start:
+            queries.append(raw_category_totals_query(db, start_date, full_start))
+        if end and full_end < end:
+            queries.append(raw_category_totals_query(db, full_end, end))
+
+    merged: Dict[Tuple[str, str], List[float]] = {}
+    for query in queries:
+        for category, type_, total, count in query.all():
+            bucket = merged.setdefault((category, type_), [0.0, 0])
+            bucket[0] += float(total or 0)
+            bucket[1] += int(count or 0)
+
+    return [
+        (category, type_, total, count)
+        for (category, type_), (total, count) in merged.items()
+        if count
+    ]
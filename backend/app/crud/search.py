@@ -0,0 +1,74 @@
+import re
+from typing import Dict, Optional
+from sqlalchemy import column, func, literal, literal_column, select, table, text, union_all
+from sqlalchemy.orm import Session
+
+WORD_INDEX = 'transactions_fts'
+TRIGRAM_INDEX = 'transactions_trigram'
+
+_TOKEN = re.compile(r'\w+', re.UNICODE)
+
+# The trigram tokenizer can't match terms shorter than this
+MIN_TRIGRAM_TERM = 3
+
+# Whether each full-text table exists, per database URL
+_fts_available: Dict[tuple, bool] = {}
+
+def fts_available(db: Session, index: str = WORD_INDEX) -> bool:
+    bind = db.get_bind()
+    key = (str(bind.url), index)
+    if key not in _fts_available:
+        _fts_available[key] = bind.dialect.name == 'sqlite' and db.execute(
+            text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :name"),
+            {'name': index}
+        ).first() is not None
+    return _fts_available[key]
+
+def fts_query(search: str) -> Optional[str]:
+    """
+    Turn free text into an FTS5 query on the word index: every token must
+    match, each as a prefix, so "migr zur" finds "MIGROS ZÜRICH".
+    """
+    tokens = _TOKEN.findall(search.lower())
+    if not tokens:
+        return None
+    return ' '.join(f'"{token}"*' for token in tokens)
+
+def trigram_query(search: str) -> Optional[str]:
+    """
+    Turn free text into an FTS5 query on the trigram index: every
+    whitespace-separated term must occur as a substring, so "gros" finds
+    "MIGROS". None when a term is too short for trigrams.
+    """
+    terms = search.split()
+    if not terms or any(len(term) < MIN_TRIGRAM_TERM for term in terms):
+        return None
+    return ' '.join('"' + term.replace('"', '""') + '"' for term in terms)
+
+def _index_matches(index: str, match: str, ranked: bool):
+    fts = table(index, column('rowid'), column('rank'))
+    return select(
+        fts.c.rowid.label('id'),
+        (fts.c.rank if ranked else literal(0.0)).label('rank')
+    ).where(literal_column(index).op('MATCH')(match))
+
+def fts_matches(word_match: Optional[str], trigram_match: Optional[str] = None):
+    """
+    Subquery of (id, rank) for transactions matching either FTS5 query;
+    lower rank is better. Word index hits are ranked by bm25 (always below
+    0), trigram-only hits follow with rank 0.
+    """
+    selects = []
+    if word_match:
+        selects.append(_index_matches(WORD_INDEX, word_match, ranked=True))
+    if trigram_match:
+        selects.append(_index_matches(TRIGRAM_INDEX, trigram_match, ranked=False))
+    if len(selects) == 1:
+        return selects[0].subquery('matches')
+    hits = union_all(*selects).subquery('hits')
+    return select(
+        hits.c.id, func.min(hits.c.rank).label('rank')
+    ).group_by(hits.c.id).subquery('matches')
+
+def has_match(db: Session, matches) -> bool:
+    return db.execute(select(matches.c.id).limit(1)).first() is not None
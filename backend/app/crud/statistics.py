@@ -0,0 +1,316 @@
+from sqlalchemy.orm import Session
+from sqlalchemy import String, case, func, select, type_coerce
+from datetime import date
+from typing import Optional, Tuple
+from dateutil.relativedelta import relativedelta
+import numpy as np
+import pandas as pd
+from .. import models
+from .rollup import category_totals_between
+from .changes import month_scope
+
+Totals = models.MonthlyCategoryTotal
+
+def period_bounds(year: int, month: Optional[int] = None) -> Tuple[date, date]:
+    """
+    Return the half-open [start, end) date range of a year or of one month.
+
+    Filtering with `date >= start AND date < end` lets SQLite use the date
+    indexes, unlike `extract('year', date) == year`.
+    """
+    if month:
+        start = date(year, month, 1)
+        return start, start + relativedelta(months=1)
+    return date(year, 1, 1), date(year + 1, 1, 1)
+
+def filter_rollup_period(query, year: int, month: Optional[int] = None):
+    query = query.filter(Totals.year == year)
+    if month:
+        query = query.filter(Totals.month == month)
+    return query
+
+def monthly_statistics_query(db: Session, year: int):
+    """Income and expense totals per month of the year, summed in SQL"""
+    return db.query(
+        Totals.month,
+        func.sum(case((Totals.type == 'income', Totals.total), else_=0)).label('total_income'),
+        func.sum(case((Totals.type == 'expense', Totals.total), else_=0)).label('total_expenses')
+    ).filter(
+        Totals.year == year
+    ).group_by(Totals.month)
+
+def category_statistics_query(db: Session, year: int, month: Optional[int] = None):
+    query = db.query(
+        Totals.category,
+        Totals.type,
+        func.sum(Totals.total).label('total')
+    ).group_by(Totals.category, Totals.type)
+    return filter_rollup_period(query, year, month)
+
+def _savings(total_income: float, total_expenses: float) -> dict:
+    return {
+        "total_income": total_income,
+        "total_expenses": total_expenses,
+        "net_savings": total_income - total_expenses,
+        "saving_rate": (total_income - total_expenses) / total_income if total_income > 0 else 0
+    }
+
+def get_monthly_statistics(db: Session, year: int, month: Optional[int] = None) -> dict:
+    """
+    Totals for the year (or for one month of it), plus a per-month breakdown
+    of the whole year so callers don't need one request per month.
+    """
+    rows = {row.month: row for row in monthly_statistics_query(db, year).all()}
+
+    months = []
+    for month_number in range(1, 13):
+        row = rows.get(month_number)
+        total_income = (row.total_income or 0) if row else 0
+        total_expenses = (row.total_expenses or 0) if row else 0
+        months.append({"month": month_number, **_savings(total_income, total_expenses)})
+
+    selected = [months[month - 1]] if month else months
+    stats = _savings(
+        sum(m["total_income"] for m in selected),
+        sum(m["total_expenses"] for m in selected)
+    )
+    stats["months"] = months
+    return stats
+
+def get_category_statistics(db: Session, year: int, month: Optional[int] = None) -> dict:
+    results = category_statistics_query(db, year, month).all()
+
+    stats = {
+        'expenses': {},
+        'income': {}
+    }
+
+    for category, type_, total in results:
+        if type_ == 'expense':
+            stats['expenses'][category] = float(total)
+        else:
+            stats['income'][category] = float(total)
+
+    return stats
+
+def get_income_and_expenses(
+    db: Session,
+    start_date: Optional[date] = None,
+    end_date: Optional[date] = None
+) -> Tuple[float, float]:
+    """Total (income, expenses) between start_date and end_date inclusive"""
+    income = expenses = 0.0
+    for _, type_, total, _ in category_totals_between(db, start_date, end_date):
+        if type_ == 'income':
+            income += total
+        elif type_ == 'expense':
+            expenses += total
+    return income, expenses
+
+def get_category_summary(
+    db: Session,
+    start_date: Optional[date] = None,
+    end_date: Optional[date] = None
+) -> dict:
+    summary = {
+        'expenses': {},
+        'income': {},
+        'totals': {
+            'income': 0,
+            'expenses': 0
+        }
+    }
+
+    for category, type_, total, count in category_totals_between(db, start_date, end_date):
+        if type_ == 'expense':
+            summary['expenses'][category] = {
+                'total': float(total),
+                'count': count
+            }
+            summary['totals']['expenses'] += float(total)
+        else:
+            summary['income'][category] = {
+                'total': float(total),
+                'count': count
+            }
+            summary['totals']['income'] += float(total)
+
+    return summary
+
+def budget_trend_query(db: Session, first_month: int, last_month: int):
+    """
+    Income, expenses and running rollover per month index (year * 12 + month - 1)
+    from first_month to last_month.
+
+    Everything before the window is folded into a single `first_month - 1`
+    bucket, so the window function's prefix sum starts from the initial
+    rollover and the result has at most one row per month in the window.
+    """
+    month_index = Totals.year * 12 + Totals.month - 1
+    bucket = case((month_index < first_month, first_month - 1), else_=month_index)
+    monthly = db.query(
+        bucket.label('month_index'),
+        func.sum(case((Totals.type == 'income', Totals.total), else_=0)).label('income'),
+        func.sum(case((Totals.type == 'expense', Totals.total), else_=0)).label('expenses')
+    ).filter(
+        month_index <= last_month
+    ).group_by(bucket).subquery()
+
+    return db.query(
+        monthly.c.month_index,
+        monthly.c.income,
+        monthly.c.expenses,
+        func.sum(monthly.c.income - monthly.c.expenses).over(
+            order_by=monthly.c.month_index
+        ).label('rollover')
+    ).order_by(monthly.c.month_index)
+
+def get_budget_statistics(db: Session, start_date: date, end_date: date, months: int = 6) -> dict:
+    """
+    Current period totals plus the available budget and cumulative rollover
+    for the `months` calendar months ending with the month of start_date.
+    """
+    last_month = start_date.year * 12 + start_date.month - 1
+    first_month = last_month - months + 1
+    rows = {row.month_index: row for row in budget_trend_query(db, first_month, last_month).all()}
+
+    initial = rows.get(first_month - 1)
+    running_rollover = initial.rollover if initial else 0
+
+    trend_data = []
+    for i in range(months - 1, -1, -1):
+        row = rows.get(last_month - i)
+        month_net = (row.income - row.expenses) if row else 0
+        if row:
+            running_rollover = row.rollover
+
+        trend_data.append({
+            'month': (start_date - relativedelta(months=i)).strftime('%b %Y'),
+            'available': month_net,  # This month's net without rollover
+            'rollover': running_rollover  # Cumulative including this month
+        })
+
+    # The trend already holds the current month when the requested period is
+    # exactly that calendar month
+    current = rows.get(last_month)
+    if start_date.day == 1 and end_date == start_date + relativedelta(months=1, days=-1):
+        current_income = current.income if current else 0
+        current_expenses = current.expenses if current else 0
+    else:
+        current_income, current_expenses = get_income_and_expenses(db, start_date, end_date)
+
+    return {
+        'current_month': {
+            'total_income': current_income,
+            'total_expenses': current_expenses,
+        },
+        'rollover': running_rollover,
+        'trend': trend_data
+    }
+
+def get_monthly_history(db: Session, through: Optional[date] = None, months: Optional[int] = None) -> dict:
+    """
+    Monthly totals per (category, type) for the complete months before
+    `through`'s month (at most the last `months` of them), read from the
+    rollup as a dense matrix: values[i, j] is the total of keys[j] in month
+    index first_month + i (year * 12 + month - 1). balance is the net of all
+    complete months, also those before the window.
+    """
+    through = through or date.today()
+    last_month = through.year * 12 + through.month - 2
+    month_index = Totals.year * 12 + Totals.month - 1
+
+    query = db.query(month_index, Totals.category, Totals.type, Totals.total).filter(month_index <= last_month)
+    if months:
+        query = query.filter(month_index > last_month - months)
+    rows = query.all()
+
+    balance = db.query(
+        func.sum(case((Totals.type == 'income', Totals.total), else_=-Totals.total))
+    ).filter(month_index <= last_month).scalar() or 0
+
+    keys = sorted({(category, type_) for _, category, type_, _ in rows})
+    column = {key: i for i, key in enumerate(keys)}
+    first_month = min((row[0] for row in rows), default=last_month + 1)
+    if months:
+        first_month = min(first_month, last_month - months + 1)
+
+    values = np.zeros((last_month - first_month + 1, len(keys)))
+    if rows:
+        indexes, categories, types, totals = zip(*rows)
+        np.add.at(
+            values,
+            (np.array(indexes) - first_month, [column[key] for key in zip(categories, types)]),
+            np.array(totals, dtype=np.float64)
+        )
+    return {
+        "first_month": first_month,
+        "keys": keys,
+        "values": values,
+        "balance": float(balance),
+    }
+
+def get_transactions_frame(
+    db: Session,
+    start_date: Optional[date] = None,
+    end_date: Optional[date] = None,
+    transaction_type: Optional[str] = None,
+    category: Optional[str] = None
+) -> pd.DataFrame:
+    """
+    Transactions between start_date and end_date (inclusive) as a columnar
+    frame: date (datetime64), description, amount, category, type. Dates
+    are fetched as text and parsed in one vectorized pass.
+    """
+    Transaction = models.Transaction
+    statement = select(
+        type_coerce(Transaction.date, String).label('date'),
+        Transaction.description,
+        Transaction.amount,
+        Transaction.category,
+        Transaction.type
+    )
+    if start_date:
+        statement = statement.where(Transaction.date >= start_date)
+    if end_date:
+        statement = statement.where(Transaction.date <= end_date)
+    if transaction_type:
+        statement = statement.where(Transaction.type == transaction_type)
+    if category:
+        statement = statement.where(Transaction.category == category)
+
+    result = db.execute(statement)
+    frame = pd.DataFrame(result.all(), columns=list(result.keys()))
+    frame['date'] = pd.to_datetime(frame['date'], format='%Y-%m-%d')
+    frame['amount'] = frame['amount'].astype('float64')
+    return frame
+
+def get_financial_context(db: Session, today: Optional[date] = None) -> dict:
+    """Current month totals and recurring bills, as given to the financial advisor"""
+    today = today or date.today()
+    month_start = today.replace(day=1)
+    month_end = month_start + relativedelta(months=1, days=-1)
+    total_income, total_expenses = get_income_and_expenses(db, month_start, month_end)
+
+    bills = db.query(models.Bill).filter(
+        models.Bill.is_recurring == True
+    ).all()
+
+    return {
+        "current_month": {
+            "income": float(total_income),
+            "expenses": float(total_expenses),
+            "available": float(total_income - total_expenses)
+        },
+        "recurring_bills": [
+            {
+                "name": bill.name,
+                "amount": float(bill.amount)
+            }
+            for bill in bills
+        ]
+    }
+
+def financial_context_scopes(today: Optional[date] = None) -> Tuple[str, ...]:
+    """Change scopes that invalidate get_financial_context(db, today)"""
+    return ('bills', month_scope(today or date.today()))
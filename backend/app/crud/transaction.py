@@ -1,11 +1,35 @@
 from sqlalchemy.orm import Session
+from sqlalchemy import or_
+from collections import OrderedDict
 from datetime import datetime, date
-from typing import Optional, List
+from threading import Lock
+from typing import Optional, List, Sequence
 from .. import models, schemas
+from . import pagination
+from . import search as search_index
+from .recurring import materialize_occurrences
+from .changes import on_commit, record_transaction_changes, transaction_values
+
+# Fields of a transaction in list responses, selected as plain result tuples
+# (no ORM hydration); includes every sortable field for the keyset cursor
+LIST_COLUMNS = [
+    models.Transaction.id,
+    models.Transaction.date,
+    models.Transaction.description,
+    models.Transaction.amount,
+    models.Transaction.category,
+    models.Transaction.type,
+    models.Transaction.is_fixed,
+    models.Transaction.frequency,
+    models.Transaction.created_at,
+    models.Transaction.updated_at,
+]
 
 def create_transaction(db: Session, transaction: schemas.TransactionCreate):
-    db_transaction = models.Transaction(**transaction.dict())
+    db_transaction = models.Transaction(**transaction.model_dump())
     db.add(db_transaction)
+    # A fixed transaction with a frequency starts a schedule, see crud.recurring
+    record_transaction_changes(db, added=[db_transaction])
     db.commit()
     db.refresh(db_transaction)
     return db_transaction
@@ -14,10 +38,76 @@ def get_transaction(db: Session, transaction_id: int):
     """Get a single transaction by ID"""
     return db.query(models.Transaction).filter(models.Transaction.id == transaction_id).first()
 
-# In crud.py
+def _transactions_query(db: Session, search: Optional[str], transaction_type: Optional[str]):
+    """
+    Filtered transactions query plus the search rank column when the search
+    is served by the full-text indexes (None otherwise).
+    """
+    query = db.query(models.Transaction)
+    rank = None
+    
+    # Apply search filter, served by the FTS5 indexes: token prefixes from
+    # the word index ("migr zur" finds "MIGROS ZÜRICH"), ranked first, plus
+    # substrings from the trigram index ("gros" in "MIGROS"). Terms too
+    # short for trigrams fall back to a substring scan, and only when the
+    # word index has no hit.
+    if search:
+        word_match = search_index.fts_query(search) if search_index.fts_available(db) else None
+        trigram_match = (
+            search_index.trigram_query(search)
+            if search_index.fts_available(db, search_index.TRIGRAM_INDEX) else None
+        )
+        matches = search_index.fts_matches(word_match, trigram_match) if word_match or trigram_match else None
+        if matches is not None and (trigram_match or search_index.has_match(db, matches)):
+            query = db.query(models.Transaction, matches.c.rank).join(
+                matches, matches.c.id == models.Transaction.id
+            )
+            rank = matches.c.rank
+        else:
+            search_term = f"%{search.lower()}%"
+            query = query.filter(
+                or_(
+                    models.Transaction.description.ilike(search_term),
+                    models.Transaction.category.ilike(search_term)
+                )
+            )
+    
+    # Apply type filter
+    if transaction_type:
+        query = query.filter(models.Transaction.type == transaction_type)
+    
+    return query, rank
+
+# Totals per (search, type) filter set, dropped whenever transactions change
+_TOTAL_CACHE_SIZE = 256
+_total_cache: "OrderedDict[tuple, int]" = OrderedDict()
+_total_cache_lock = Lock()
 
-from sqlalchemy import or_
-from typing import Optional
+@on_commit
+def _clear_total_cache(scopes):
+    if 'transactions' in scopes:
+        with _total_cache_lock:
+            _total_cache.clear()
+
+def count_transactions(
+    db: Session,
+    search: Optional[str] = None,
+    transaction_type: Optional[str] = None
+) -> int:
+    key = (search.lower() if search else None, transaction_type)
+    with _total_cache_lock:
+        if key in _total_cache:
+            _total_cache.move_to_end(key)
+            return _total_cache[key]
+
+    query, _ = _transactions_query(db, search, transaction_type)
+    total = query.count()
+
+    with _total_cache_lock:
+        _total_cache[key] = total
+        if len(_total_cache) > _TOTAL_CACHE_SIZE:
+            _total_cache.popitem(last=False)
+    return total
 
 def get_transactions(
     db: Session,
@@ -26,43 +116,67 @@ def get_transactions(
     search: Optional[str] = None,
     transaction_type: Optional[str] = None,
     sort_field: Optional[str] = None,
-    sort_direction: Optional[str] = 'desc'
+    sort_direction: Optional[str] = 'desc',
+    cursor: Optional[str] = None,
+    include_total: bool = True,
+    columns: Optional[Sequence] = None
 ) -> dict:
-    query = db.query(models.Transaction)
+    """
+    One page of transactions ordered by (sort_field, id).
+
+    Pass the returned `next_cursor` back as `cursor` to fetch the following
+    page with a keyset seek, which costs the same at any depth. Without a
+    cursor, `skip` is used as a plain offset. The total is cached per filter
+    set and can be skipped entirely with include_total=False.
+
+    With `columns` (e.g. LIST_COLUMNS, which must include id and the sort
+    field) the page holds result rows of those columns instead of ORM
+    objects, with the search rank as an extra last column when ranked.
+
+    Raises pagination.InvalidCursor for cursors that can't be decoded or were
+    issued for another sort order.
+    """
+    query, rank = _transactions_query(db, search, transaction_type)
+    if columns is not None:
+        query = query.with_entities(*columns, *([rank] if rank is not None else []))
+    sort_field, sort_direction = pagination.normalize_sort(sort_field, sort_direction, ranked=rank is not None)
+    if sort_field == pagination.RELEVANCE:
+        sort_column = rank
+    else:
+        sort_column = getattr(models.Transaction, sort_field)
     
-    # Apply search filter
-    if search:
-        search_term = f"%{search.lower()}%"
-        query = query.filter(
-            or_(
-                models.Transaction.description.ilike(search_term),
-                models.Transaction.category.ilike(search_term)
-            )
-        )
+    if cursor:
+        value, last_id = pagination.decode_cursor(cursor, sort_field, sort_direction, sort_column)
+        query = query.filter(pagination.keyset_filter(sort_column, sort_direction, value, last_id))
+    elif skip:
+        query = query.offset(skip)
     
-    # Apply type filter
-    if transaction_type:
-        query = query.filter(models.Transaction.type == transaction_type)
+    # Fetch one extra row to know whether there is a next page
+    query = query.order_by(*pagination.order_by(sort_column, sort_direction))
+    rows = query.limit(limit + 1).all()
     
-    # Get total before pagination
-    total = query.count()
+    has_more = limit and len(rows) > limit
+    rows = rows[:limit]
     
-    # Apply sorting
-    if sort_field and hasattr(models.Transaction, sort_field):
-        order_col = getattr(models.Transaction, sort_field)
-        if sort_direction == 'desc':
-            order_col = order_col.desc()
-        query = query.order_by(order_col)
+    if rank is not None and columns is not None:
+        transactions = rows
+        ranks = [row[-1] for row in rows]
+    elif rank is not None:
+        transactions = [transaction for transaction, _ in rows]
+        ranks = [row_rank for _, row_rank in rows]
     else:
-        # Default sort
-        query = query.order_by(models.Transaction.date.desc())
+        transactions = rows
     
-    # Apply pagination
-    transactions = query.offset(skip).limit(limit).all()
+    next_cursor = None
+    if has_more:
+        last = transactions[-1]
+        last_value = ranks[-1] if sort_field == pagination.RELEVANCE else getattr(last, sort_field)
+        next_cursor = pagination.encode_cursor(sort_field, sort_direction, last_value, last.id)
     
     return {
         "transactions": transactions,
-        "total": total
+        "total": count_transactions(db, search, transaction_type) if include_total else None,
+        "next_cursor": next_cursor
     }
 
 def get_fixed_transactions(
@@ -79,16 +193,18 @@ def get_fixed_transactions(
 def update_transaction(db: Session, transaction_id: int, transaction_update: schemas.TransactionUpdate):
     db_transaction = get_transaction(db=db, transaction_id=transaction_id)
     if db_transaction:
-        update_data = transaction_update.dict(exclude_unset=True)
+        update_data = transaction_update.model_dump(exclude_unset=True)
         
         # Handle frequency update when is_fixed changes
         if 'is_fixed' in update_data and not update_data['is_fixed']:
             update_data['frequency'] = None
             
+        previous = transaction_values(db_transaction)
         for field, value in update_data.items():
             setattr(db_transaction, field, value)
         
         try:
+            record_transaction_changes(db, added=[db_transaction], removed=[previous])
             db.commit()
             db.refresh(db_transaction)
             return db_transaction
@@ -101,43 +217,19 @@ def delete_transaction(db: Session, transaction_id: int) -> bool:
     db_transaction = get_transaction(db=db, transaction_id=transaction_id)
     if db_transaction:
         db.delete(db_transaction)
+        record_transaction_changes(db, removed=[db_transaction])
         db.commit()
         return True
     return False
 
 def process_fixed_transactions(db: Session, target_date: date) -> List[models.Transaction]:
     """
-    Process fixed transactions and create new instances for the target date
+    Materialize the recurring schedules' occurrences due up to the target
+    date. Idempotent: occurrences that already exist are not created again.
     """
-    fixed_transactions = db.query(models.Transaction).filter(
-        models.Transaction.is_fixed == True
-    ).all()
-    
-    new_transactions = []
-    for transaction in fixed_transactions:
-        # Check if we should create a new transaction based on frequency
-        should_create = False
-        if transaction.frequency == 'monthly':
-            should_create = True
-        elif transaction.frequency == 'quarterly':
-            should_create = target_date.month % 3 == 1
-        elif transaction.frequency == 'yearly':
-            should_create = target_date.month == 1
-            
-        if should_create:
-            new_transaction = models.Transaction(
-                date=target_date,
-                description=transaction.description,
-                amount=transaction.amount,
-                category=transaction.category,
-                type=transaction.type,
-                is_fixed=True,
-                frequency=transaction.frequency
-            )
-            new_transactions.append(new_transaction)
-            
-    if new_transactions:
-        db.bulk_save_objects(new_transactions)
-        db.commit()
-        
-    return new_transactions
\ No newline at end of file
+    ids = materialize_occurrences(db, target_date)
+    if not ids:
+        return []
+    return db.query(models.Transaction).filter(
+        models.Transaction.id.in_(ids)
+    ).order_by(models.Transaction.date, models.Transaction.id).all()
@@ -1,17 +1,158 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import Engine
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
 from pathlib import Path
+import os
+import uuid
 
 # Create database directory if it doesn't exist
 Path("./data").mkdir(exist_ok=True)
 
-SQLALCHEMY_DATABASE_URL = "sqlite:///./data/finance.db"
+def is_memory_database(url: str) -> bool:
+    return url in ("sqlite://", "sqlite:///:memory:") or "mode=memory" in url
 
-engine = create_engine(
-    SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False}
+def shared_memory_url(url: str) -> str:
+    """
+    A named shared-cache database for an in-memory URL. A plain in-memory
+    database lives in a single connection, so the sync engines and the
+    (aiosqlite) async engines would each see their own empty database.
+    """
+    if not is_memory_database(url) or "cache=shared" in url:
+        return url
+    return f"sqlite:///file:aequitasiq-{uuid.uuid4().hex}?mode=memory&cache=shared&uri=true"
+
+# In-memory URLs become one shared-cache database, for the sync and async engines alike
+SQLALCHEMY_DATABASE_URL = shared_memory_url(os.getenv("DATABASE_URL", "sqlite:///./data/finance.db"))
+
+# Connection settings, overridable through the environment
+SQLITE_PRAGMAS = {
+    "journal_mode": os.getenv("SQLITE_JOURNAL_MODE", "WAL"),
+    "synchronous": os.getenv("SQLITE_SYNCHRONOUS", "NORMAL"),
+    "busy_timeout": int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000")),
+    "mmap_size": int(os.getenv("SQLITE_MMAP_SIZE", str(256 * 1024 * 1024))),
+    "cache_size": int(os.getenv("SQLITE_CACHE_SIZE_KB", "-65536")),  # negative: KiB
+    "temp_store": "MEMORY",
+}
+WRITE_POOL_SIZE = int(os.getenv("DB_WRITE_POOL_SIZE", "5"))
+WRITE_MAX_OVERFLOW = int(os.getenv("DB_WRITE_MAX_OVERFLOW", "5"))
+READ_POOL_SIZE = int(os.getenv("DB_READ_POOL_SIZE", "10"))
+READ_MAX_OVERFLOW = int(os.getenv("DB_READ_MAX_OVERFLOW", "10"))
+POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+
+def _apply_sqlite_pragmas(engine: Engine, pragmas: dict, read_only: bool):
+    @event.listens_for(engine, "connect")
+    def _set_sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            for name, value in pragmas.items():
+                cursor.execute(f"PRAGMA {name}={value}")
+            if read_only:
+                cursor.execute("PRAGMA query_only=ON")
+        finally:
+            cursor.close()
+
+def create_db_engine(
+    url: str = SQLALCHEMY_DATABASE_URL,
+    read_only: bool = False,
+    pool_size: int = WRITE_POOL_SIZE,
+    max_overflow: int = WRITE_MAX_OVERFLOW,
+    pragmas: dict = SQLITE_PRAGMAS
+) -> Engine:
+    """
+    Engine with its own connection pool. SQLite connections get the pragmas
+    on connect; read-only engines additionally refuse writes (query_only).
+    """
+    if not url.startswith("sqlite"):
+        return create_engine(url, pool_size=pool_size, max_overflow=max_overflow, pool_timeout=POOL_TIMEOUT)
+
+    if is_memory_database(url):
+        # One shared connection, otherwise every connection is a new database
+        return create_engine(url, connect_args={"check_same_thread": False}, poolclass=StaticPool)
+
+    engine = create_engine(
+        url,
+        connect_args={
+            "check_same_thread": False,
+            "timeout": pragmas["busy_timeout"] / 1000,
+        },
+        pool_size=pool_size,
+        max_overflow=max_overflow,
+        pool_timeout=POOL_TIMEOUT,
+    )
+    _apply_sqlite_pragmas(engine, pragmas, read_only)
+    return engine
+
+def async_url(url: str) -> str:
+    """The asyncio driver URL for a sync database URL"""
+    if url.startswith("sqlite:"):
+        return "sqlite+aiosqlite:" + url[len("sqlite:"):]
+    if url.startswith("postgresql:"):
+        return "postgresql+asyncpg:" + url[len("postgresql:"):]
+    return url
+
+def create_async_db_engine(
+    url: str = SQLALCHEMY_DATABASE_URL,
+    read_only: bool = False,
+    pool_size: int = WRITE_POOL_SIZE,
+    max_overflow: int = WRITE_MAX_OVERFLOW,
+    pragmas: dict = SQLITE_PRAGMAS
+) -> AsyncEngine:
+    """`create_db_engine` for SQLAlchemy's asyncio extension (aiosqlite for SQLite)"""
+    if not url.startswith("sqlite"):
+        return create_async_engine(
+            async_url(url), pool_size=pool_size, max_overflow=max_overflow, pool_timeout=POOL_TIMEOUT
+        )
+
+    if is_memory_database(url):
+        engine = create_async_engine(async_url(url), poolclass=StaticPool)
+        # Shared-cache readers would otherwise fail on tables another
+        # connection is writing (SQLITE_LOCKED ignores the busy timeout)
+        _apply_sqlite_pragmas(engine.sync_engine, {"read_uncommitted": 1}, read_only=False)
+        return engine
+
+    engine = create_async_engine(
+        async_url(url),
+        connect_args={"timeout": pragmas["busy_timeout"] / 1000},
+        pool_size=pool_size,
+        max_overflow=max_overflow,
+        pool_timeout=POOL_TIMEOUT,
+    )
+    _apply_sqlite_pragmas(engine.sync_engine, pragmas, read_only)
+    return engine
+
+# Writes (and reads inside write requests) go through `engine`; dashboard
+# reads use `read_engine`, whose pool is not exhausted by long imports. With
+# WAL, readers see the last committed state while a write is in progress.
+engine = create_db_engine(SQLALCHEMY_DATABASE_URL)
+read_engine = (
+    engine if is_memory_database(SQLALCHEMY_DATABASE_URL)
+    else create_db_engine(
+        SQLALCHEMY_DATABASE_URL,
+        read_only=True,
+        pool_size=READ_POOL_SIZE,
+        max_overflow=READ_MAX_OVERFLOW
+    )
 )
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+ReadSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=read_engine)
+
+# The same pair for async routes. Objects stay loaded after commit: lazy
+# loads can't run once the response is being serialized outside a greenlet.
+async_engine = create_async_db_engine(SQLALCHEMY_DATABASE_URL)
+async_read_engine = (
+    async_engine if is_memory_database(SQLALCHEMY_DATABASE_URL)
+    else create_async_db_engine(
+        SQLALCHEMY_DATABASE_URL,
+        read_only=True,
+        pool_size=READ_POOL_SIZE,
+        max_overflow=READ_MAX_OVERFLOW
+    )
+)
+AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+AsyncReadSessionLocal = async_sessionmaker(async_read_engine, autoflush=False, expire_on_commit=False)
 
 Base = declarative_base()
 
@@ -21,4 +162,20 @@ def get_db():
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+
+def get_read_db():
+    """Session on the read-only pool, for routes that don't write"""
+    db = ReadSessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
+
+async def get_async_read_db():
+    async with AsyncReadSessionLocal() as db:
+        yield db
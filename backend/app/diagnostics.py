@@ -0,0 +1,440 @@
+# app/diagnostics.py
+"""
+Database diagnostics.
+
+Run from the backend directory, e.g.:
+
+    python -m app.diagnostics check-indexes
+    python -m app.diagnostics check-concurrency
+    python -m app.diagnostics bench-serialization
+    python -m app.diagnostics bench-bill-projection
+    python -m app.diagnostics bench-anomaly-scoring
+"""
+import argparse
+import json
+import sys
+import tempfile
+import threading
+import time
+from datetime import date, timedelta
+from typing import List
+
+import numpy as np
+import orjson
+import pandas as pd
+from fastapi.encoders import jsonable_encoder
+from sqlalchemy import insert, text
+from sqlalchemy.orm import Session
+
+from .database import SQLITE_PRAGMAS, SessionLocal, create_db_engine, engine
+from .models.base import Base
+from .models.bill import Bill
+from .models.transaction import Transaction
+from .migrations import run_migrations
+from .services import importer
+from . import crud
+
+
+def explain(db: Session, query) -> List[str]:
+    """Return the `EXPLAIN QUERY PLAN` detail lines for a query or statement"""
+    statement = getattr(query, "statement", query)
+    compiled = statement.compile(
+        dialect=db.get_bind().dialect,
+        compile_kwargs={"literal_binds": True}
+    )
+    rows = db.execute(text(f"EXPLAIN QUERY PLAN {compiled}")).all()
+    return [row[-1] for row in rows]
+
+
+def index_checks(db: Session) -> List[tuple]:
+    """(name, query, expected index) triples for the dashboard statistics queries"""
+    year = date.today().year
+    month_start, month_end = crud.period_bounds(year, 1)
+    return [
+        (
+            "statistics/monthly",
+            crud.statistics.monthly_statistics_query(db, year),
+            "sqlite_autoindex_monthly_category_totals_1",
+        ),
+        (
+            "statistics/category (year)",
+            crud.statistics.category_statistics_query(db, year),
+            "sqlite_autoindex_monthly_category_totals_1",
+        ),
+        (
+            "statistics/category (month)",
+            crud.statistics.category_statistics_query(db, year, 1),
+            "sqlite_autoindex_monthly_category_totals_1",
+        ),
+        (
+            "partial month from transactions",
+            crud.rollup.raw_category_totals_query(db, month_start, month_end),
+            "ix_transactions_date_category_type_amount",
+        ),
+    ] + [
+        (
+            f"transactions keyset page ({field})",
+            db.query(Transaction).filter(
+                crud.pagination.keyset_filter(getattr(Transaction, field), "desc", value, 0)
+            ).order_by(*crud.pagination.order_by(getattr(Transaction, field), "desc")).limit(100),
+            f"ix_transactions_{field}_id",
+        )
+        for field, value in (
+            ("date", month_end),
+            ("description", "m"),
+            ("amount", 0.0),
+            ("category", "m"),
+            ("type", "expense"),
+        )
+    ]
+
+
+def check_indexes(db: Session) -> bool:
+    """Print the plan of every statistics query and verify it uses an index"""
+    ok = True
+    for name, query, expected_index in index_checks(db):
+        plan = explain(db, query)
+        uses_index = any(expected_index in line for line in plan)
+        ok = ok and uses_index
+        print(f"[{'OK' if uses_index else 'FAIL'}] {name}")
+        for line in plan:
+            print(f"    {line}")
+    return ok
+
+
+def _transaction_rows(count: int, offset: int = 0) -> List[dict]:
+    start = date(2024, 1, 1)
+    return [
+        {
+            'date': start + timedelta(days=(offset + i) % 365),
+            'description': f"Concurrency check {offset + i}",
+            'amount': float((offset + i) % 500) + 0.5,
+            'category': 'Shopping',
+            'type': 'expense' if i % 4 else 'income',
+            'is_fixed': False,
+        }
+        for i in range(count)
+    ]
+
+
+def check_concurrency(
+    rows: int = 100000,
+    readers: int = 4,
+    journal_mode: str = "WAL",
+    max_stall: float = 1.0
+) -> bool:
+    """
+    Bulk-insert `rows` transactions in one write transaction on a scratch
+    database while reader threads poll dashboard queries on the read pool,
+    until the write has committed.
+
+    The writer gets a small page cache, so it spills dirty pages to the
+    database mid-transaction as a long import does. With a rollback journal
+    that takes the exclusive lock and readers wait until the commit; with
+    WAL the pages go to the log and readers carry on. Passes if readers
+    completed queries during the write, no read took longer than max_stall
+    seconds or failed, and none saw uncommitted rows.
+    """
+    pragmas = {**SQLITE_PRAGMAS, "journal_mode": journal_mode}
+    with tempfile.TemporaryDirectory() as directory:
+        url = f"sqlite:///{directory}/concurrency.db"
+        write_engine = create_db_engine(url, pragmas={**pragmas, "cache_size": 100})
+        read_engine = create_db_engine(url, read_only=True, pool_size=readers, pragmas=pragmas)
+        Base.metadata.create_all(bind=write_engine)
+        run_migrations(write_engine)
+
+        seed = 10000
+        with Session(bind=write_engine) as db:
+            seed_rows = _transaction_rows(seed)
+            db.execute(insert(Transaction), seed_rows)
+            crud.record_transaction_changes(db, added=seed_rows)
+            db.commit()
+
+        writing = threading.Event()
+        done = threading.Event()
+        latencies: List[float] = []
+        errors: List[str] = []
+        stale = []
+        lock = threading.Lock()
+
+        def writer():
+            try:
+                with Session(bind=write_engine) as db:
+                    for offset in range(seed, seed + rows, 10000):
+                        batch = _transaction_rows(min(10000, seed + rows - offset), offset)
+                        db.execute(insert(Transaction), batch)
+                        crud.record_transaction_changes(db, added=batch)
+                        writing.set()
+                    db.commit()
+            except Exception as e:
+                errors.append(f"writer: {str(e)}")
+            finally:
+                writing.set()
+                done.set()
+
+        def reader():
+            writing.wait()
+            while not done.is_set():
+                started = time.perf_counter()
+                try:
+                    with Session(bind=read_engine) as db:
+                        crud.get_monthly_statistics(db, 2024)
+                        count = db.query(Transaction.id).count()
+                except Exception as e:
+                    with lock:
+                        errors.append(f"reader: {str(e)}")
+                    return
+                elapsed = time.perf_counter() - started
+                with lock:
+                    latencies.append(elapsed)
+                    # Before the commit only the seed, after it everything
+                    if count not in (seed, seed + rows):
+                        stale.append(count)
+                time.sleep(0.01)  # Dashboard polling, not a busy loop
+
+        threads = [threading.Thread(target=writer)] + [threading.Thread(target=reader) for _ in range(readers)]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        write_time = time.perf_counter() - started
+
+        write_engine.dispose()
+        read_engine.dispose()
+
+    print(f"journal_mode={journal_mode}: wrote {rows} rows in one transaction in {write_time:.2f}s")
+    print(f"  reads completed during the write: {len(latencies)}")
+    if latencies:
+        latencies.sort()
+        print(f"  read latency: median {latencies[len(latencies) // 2] * 1000:.1f}ms, "
+              f"max {latencies[-1] * 1000:.1f}ms")
+    for error in errors[:5]:
+        print(f"  error: {error}")
+    if stale:
+        print(f"  readers saw uncommitted rows {len(stale)} times")
+    stalled = bool(latencies) and latencies[-1] > max_stall
+    if stalled:
+        print(f"  readers stalled for more than {max_stall:.1f}s")
+    ok = bool(latencies) and not errors and not stale and not stalled
+    print(f"[{'OK' if ok else 'FAIL'}] readers proceed during a bulk write")
+    return ok
+
+
+def bench_serialization(rows: int = 1000, repeat: int = 50) -> bool:
+    """
+    Per-row cost of a transactions page: ORM objects + hand-built dicts +
+    jsonable_encoder + json (the former read_transactions path) versus
+    result tuples + orjson (the current one). Runs on an in-memory database.
+    """
+    scratch = create_db_engine("sqlite://")
+    Base.metadata.create_all(bind=scratch)
+    with Session(bind=scratch) as db:
+        db.execute(insert(Transaction), _transaction_rows(rows))
+        db.commit()
+
+    fields = [column.key for column in crud.transaction.LIST_COLUMNS]
+
+    def orm_path(db: Session) -> bytes:
+        transactions = db.query(Transaction).limit(rows).all()
+        data = [
+            {
+                "id": t.id,
+                "date": t.date.isoformat(),
+                "description": t.description,
+                "amount": float(t.amount),
+                "category": t.category,
+                "type": t.type,
+                "is_fixed": t.is_fixed,
+                "frequency": t.frequency,
+                "created_at": t.created_at.isoformat() if t.created_at else None,
+                "updated_at": t.updated_at.isoformat() if t.updated_at else None,
+            }
+            for t in transactions
+        ]
+        return json.dumps(jsonable_encoder({"transactions": data})).encode()
+
+    def tuple_path(db: Session) -> bytes:
+        result = db.query(*crud.transaction.LIST_COLUMNS).limit(rows).all()
+        return orjson.dumps({"transactions": [dict(zip(fields, row)) for row in result]})
+
+    timings = {}
+    for name, path in (("ORM + jsonable_encoder + json", orm_path), ("tuples + orjson", tuple_path)):
+        best = float("inf")
+        for _ in range(repeat):
+            with Session(bind=scratch) as db:
+                started = time.perf_counter()
+                path(db)
+                best = min(best, time.perf_counter() - started)
+        timings[name] = best
+        print(f"{name:32} {best * 1e6 / rows:8.2f} us/row  ({best * 1000:.1f} ms per {rows}-row page)")
+
+    with Session(bind=scratch) as db:
+        same = json.loads(orm_path(db)) == json.loads(tuple_path(db))
+    scratch.dispose()
+    before, after = timings.values()
+    print(f"speedup {before / after:.1f}x, identical output: {same}")
+    return same
+
+
+def bench_bill_projection(bills: int = 5000, years: int = 2, repeat: int = 20) -> bool:
+    """
+    Time of /bills/upcoming over `years` for `bills` random bills: loading
+    the bill arrays, the vectorized expansion and rendering, and a cached
+    hit. Runs on an in-memory database.
+    """
+    scratch = create_db_engine("sqlite://")
+    Base.metadata.create_all(bind=scratch)
+    frequencies = ["monthly", "quarterly", "yearly", None]
+    with Session(bind=scratch) as db:
+        db.execute(insert(Bill), [
+            {
+                "name": f"Bill {i}",
+                "amount": 10 + i % 490,
+                "due_date": date(2020, 1, 1) + timedelta(days=(i * 7919) % 2500),
+                "category": ("Utilities", "Insurance", "Housing")[i % 3],
+                "is_recurring": frequencies[i % 4] is not None,
+                "frequency": frequencies[i % 4],
+            }
+            for i in range(bills)
+        ])
+        db.commit()
+
+    start = date.today()
+    end = start + timedelta(days=365 * years - 1)
+    projection = crud.projection
+    with Session(bind=scratch) as db:
+        timings = {}
+        for name, step in (
+            ("load bill arrays", lambda: projection.load_bill_arrays(db)),
+            ("expand + render", lambda: projection.render(projection.expand(arrays, start, end), start, end)),
+            ("cached", lambda: projection.get_upcoming_bills(db, start, end)),
+        ):
+            best = float("inf")
+            for _ in range(repeat):
+                started = time.perf_counter()
+                result = step()
+                best = min(best, time.perf_counter() - started)
+            if name == "load bill arrays":
+                arrays = result
+            timings[name] = best
+            print(f"{name:20} {best * 1000:8.2f} ms")
+        occurrences = len(projection.expand(arrays, start, end).index)
+    scratch.dispose()
+
+    total = timings["load bill arrays"] + timings["expand + render"]
+    ok = total < 0.1
+    print(f"[{'OK' if ok else 'FAIL'}] {occurrences} occurrences of {bills} bills over {years} years "
+          f"in {total * 1000:.1f} ms uncached")
+    return ok
+
+
+def bench_anomaly_scoring(rows: int = 200000, batch_size: int = 5000, max_share: float = 0.1) -> bool:
+    """
+    Share of a CSV-style import spent maintaining the anomaly statistics and
+    scoring the new rows (the crud.anomalies change hook), on a scratch
+    database. Fails above `max_share`.
+    """
+    rng = np.random.default_rng(0)
+    categories = np.array(["Food", "Shopping", "Transport", "Housing", "Leisure"])
+
+    def chunks():
+        for start in range(0, rows, batch_size):
+            index = np.arange(start, min(start + batch_size, rows))
+            yield pd.DataFrame({
+                "date": pd.Timestamp("2020-01-01") + pd.to_timedelta(index % 1500, unit="D"),
+                "description": [f"Merchant {i % 3000} ref {i}" if i % 7 == 0 else f"Merchant {i % 3000}" for i in index],
+                "amount": np.round(rng.gamma(2.0, 30.0, len(index)), 2),
+                "category": categories[index % len(categories)],
+                "type": np.where(index % 9 == 0, "income", "expense"),
+            })
+
+    hook = crud.anomalies._update_stats_and_score
+    spent = [0.0]
+
+    def timed_hook(db: Session, added, removed):
+        started = time.perf_counter()
+        hook(db, added, removed)
+        spent[0] += time.perf_counter() - started
+
+    hooks = crud.changes._change_hooks
+    position = hooks.index(hook)
+    with tempfile.TemporaryDirectory() as directory:
+        scratch = create_db_engine(f"sqlite:///{directory}/bench.db")
+        Base.metadata.create_all(bind=scratch)
+        run_migrations(scratch)
+        hooks[position] = timed_hook
+        try:
+            with Session(bind=scratch) as db:
+                started = time.perf_counter()
+                report = importer.import_chunks(db, chunks(), lambda descriptions, *_: ["Other"] * len(descriptions))
+                total = time.perf_counter() - started
+                flagged = db.query(crud.anomalies.Anomaly).count()
+        finally:
+            hooks[position] = hook
+            scratch.dispose()
+
+    share = spent[0] / total
+    ok = share <= max_share
+    print(f"imported {report.imported} rows in {total:.2f} s, {flagged} anomalies flagged")
+    print(f"[{'OK' if ok else 'FAIL'}] anomaly statistics and scoring: {spent[0]:.2f} s "
+          f"({spent[0] * 1e6 / max(report.imported, 1):.1f} us/row, {share:.0%} of the import)")
+    return ok
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Finance dashboard database diagnostics")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    subparsers.add_parser("check-indexes", help="Verify the query planner uses the statistics indexes")
+    concurrency = subparsers.add_parser(
+        "check-concurrency",
+        help="Verify dashboard reads proceed during a bulk write (on a scratch database)"
+    )
+    concurrency.add_argument("--rows", type=int, default=100000)
+    concurrency.add_argument("--readers", type=int, default=4)
+    concurrency.add_argument("--journal-mode", default=SQLITE_PRAGMAS["journal_mode"])
+    concurrency.add_argument("--max-stall", type=float, default=1.0, help="Seconds a read may take")
+    serialization = subparsers.add_parser(
+        "bench-serialization",
+        help="Compare the per-row cost of ORM vs tuple/orjson list serialization"
+    )
+    serialization.add_argument("--rows", type=int, default=1000)
+    serialization.add_argument("--repeat", type=int, default=50)
+    projection = subparsers.add_parser(
+        "bench-bill-projection",
+        help="Time the upcoming-bills projection on random bills"
+    )
+    projection.add_argument("--bills", type=int, default=5000)
+    projection.add_argument("--years", type=int, default=2)
+    scoring = subparsers.add_parser(
+        "bench-anomaly-scoring",
+        help="Time the anomaly statistics and scoring during a bulk import (on a scratch database)"
+    )
+    scoring.add_argument("--rows", type=int, default=200000)
+    scoring.add_argument("--batch-size", type=int, default=importer.DEFAULT_BATCH_SIZE)
+    scoring.add_argument("--max-share", type=float, default=0.1, help="Fraction of the import time allowed")
+    args = parser.parse_args(argv)
+
+    if args.command == "bench-anomaly-scoring":
+        return 0 if bench_anomaly_scoring(args.rows, args.batch_size, args.max_share) else 1
+    if args.command == "bench-bill-projection":
+        return 0 if bench_bill_projection(args.bills, args.years) else 1
+    if args.command == "bench-serialization":
+        return 0 if bench_serialization(args.rows, args.repeat) else 1
+    if args.command == "check-concurrency":
+        return 0 if check_concurrency(args.rows, args.readers, args.journal_mode, args.max_stall) else 1
+
+    Base.metadata.create_all(bind=engine)
+    run_migrations(engine)
+
+    db = SessionLocal()
+    try:
+        if args.command == "check-indexes":
+            return 0 if check_indexes(db) else 1
+    finally:
+        db.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
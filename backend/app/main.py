@@ -1,26 +1,47 @@
-from fastapi import Body, FastAPI, Depends, HTTPException, Query, UploadFile, File
+from fastapi import Body, FastAPI, Depends, HTTPException, Query, Request, Response, UploadFile, File
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
 from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import extract, case, func
+from sqlalchemy.exc import IntegrityError, SQLAlchemyError
 from typing import List, Optional
 from datetime import date, datetime
 
-from .database import engine, get_db
+from .database import (
+    AsyncReadSessionLocal,
+    ReadSessionLocal,
+    SessionLocal,
+    async_engine,
+    async_read_engine,
+    engine,
+    get_async_db,
+    get_async_read_db,
+    get_db,
+    get_read_db
+)
+from .migrations import run_migrations
 from .models.base import Base
 from .models.transaction import Transaction  
 from .models import transaction as models   
 from .models.bill import Bill
 from .services.llm_service import LLMService
+from .services import exporter, importer
+from .services.scheduler import RecurringScheduler
 from . import schemas
 from . import crud
+import hashlib
 import json
+import os
+from functools import partial
 import pandas as pd
+import pyarrow as pa
 from io import StringIO
 from dateutil.relativedelta import relativedelta
 import uvicorn
 from pydantic import BaseModel, ValidationError
 from fastapi import APIRouter
-from fastapi.responses import StreamingResponse
+from fastapi.responses import ORJSONResponse, StreamingResponse
 import csv
 from io import StringIO
 from typing import List, Optional
@@ -33,9 +54,46 @@ import logging
 logger = logging.getLogger(__name__)
 # Create database tables
 Base.metadata.create_all(bind=engine)
+run_migrations(engine)
 
 app = FastAPI(title="Finance Dashboard API")
 
+# GET routes whose responses depend only on the stored data and the URL
+CONDITIONAL_GET_PREFIXES = ("/statistics/", "/transactions/", "/bills/", "/analysis", "/anomalies")
+
+def data_etag(version: int, request: Request) -> str:
+    url_hash = hashlib.sha1(f"{request.url.path}?{request.url.query}".encode()).hexdigest()[:16]
+    # Some responses (e.g. /bills/upcoming) are relative to today
+    return f'W/"{version}-{date.today().isoformat()}-{url_hash}"'
+
+@app.middleware("http")
+async def conditional_get(request: Request, call_next):
+    """
+    ETag the polled read routes with the data version, and answer a matching
+    If-None-Match with 304 without running the route. The version is read
+    before the route runs, so a concurrent write can only make the ETag
+    older than the body, never newer.
+    """
+    if request.method != "GET" or not request.url.path.startswith(CONDITIONAL_GET_PREFIXES):
+        return await call_next(request)
+
+    async with AsyncReadSessionLocal() as db:
+        version = await crud.aio.get_data_version(db)
+    etag = data_etag(version, request)
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match and (
+        if_none_match.strip() == "*"
+        or etag in (tag.strip() for tag in if_none_match.split(","))
+    ):
+        return Response(status_code=304, headers=headers)
+
+    response = await call_next(request)
+    if response.status_code == 200:
+        response.headers.update(headers)
+    return response
+
 # Configure CORS
 app.add_middleware(
     CORSMiddleware,
@@ -46,7 +104,35 @@ app.add_middleware(
 )
 
 # Initialize LLM service
-llm_service = LLMService()
+llm_service = LLMService(os.getenv("LLM_MODEL", "llama3.2"))
+
+# Cached advice is stale once the transactions or bills it was based on change
+crud.on_commit(llm_service.invalidate_advice)
+
+# Materializes recurring transactions in the background; 0 disables it
+recurring_scheduler = RecurringScheduler(
+    SessionLocal,
+    interval=float(os.getenv("RECURRING_SCHEDULER_INTERVAL_SECONDS", "3600"))
+)
+
+@app.on_event("startup")
+async def start_recurring_scheduler():
+    if recurring_scheduler.interval > 0:
+        recurring_scheduler.start()
+
+@app.on_event("shutdown")
+async def stop_recurring_scheduler():
+    await recurring_scheduler.stop()
+
+@app.on_event("shutdown")
+def save_llm_caches():
+    llm_service.save_caches()
+
+@app.on_event("shutdown")
+async def close_async_engines():
+    await async_engine.dispose()
+    if async_read_engine is not async_engine:
+        await async_read_engine.dispose()
 
 class QuestionRequest(BaseModel):
     question: str
@@ -60,6 +146,17 @@ def categorize_transaction(description: str):
     category = llm_service.categorize_transaction(description)
     return {"category": category}
 
+@app.get("/categorize/cache")
+def categorization_cache_stats():
+    return llm_service.category_cache_stats()
+
+TRANSACTION_FIELDS = [column.key for column in crud.transaction.LIST_COLUMNS]
+BILL_FIELDS = [column.key for column in crud.bill.LIST_COLUMNS]
+
+def rows_to_dicts(fields: List[str], rows) -> List[dict]:
+    # zip stops at the last field, dropping extra columns such as the search rank
+    return [dict(zip(fields, row)) for row in rows]
+
 # Transaction routes
 @app.post("/transactions/", response_model=schemas.Transaction)
 def create_transaction(transaction: schemas.TransactionCreate, db: Session = Depends(get_db)):
@@ -76,75 +173,146 @@ def create_transaction(transaction: schemas.TransactionCreate, db: Session = Dep
 @app.get("/transactions/")
 async def read_transactions(
     skip: int = 0,
-    limit: int = 100,
+    limit: int = Query(100, ge=1),
     search: Optional[str] = None,
     type: Optional[str] = None,
     sort_field: Optional[str] = None,
     sort_direction: Optional[str] = None,
-    db: Session = Depends(get_db)
+    cursor: Optional[str] = Query(None, description="next_cursor of the previous page"),
+    include_total: bool = True,
+    db: AsyncSession = Depends(get_async_read_db)
 ):
-    # Start with base query
-    query = db.query(Transaction)
-    
-    # Apply search filter if provided
-    if search:
-        search_term = f"%{search.lower()}%"
-        query = query.filter(
-            or_(
-                Transaction.description.ilike(search_term),
-                Transaction.category.ilike(search_term)
-            )
+    try:
+        page = await crud.aio.get_transactions(
+            db,
+            skip=skip,
+            limit=limit,
+            search=search,
+            transaction_type=type,
+            sort_field=sort_field,
+            sort_direction=sort_direction,
+            cursor=cursor,
+            include_total=include_total,
+            columns=crud.transaction.LIST_COLUMNS
         )
-    
-    # Apply type filter if provided
-    if type:
-        query = query.filter(Transaction.type == type)
-    
-    # Get total count before pagination
-    total = query.count()
-    
-    # Apply sorting
-    if sort_field:
-        # Ensure sort_field exists in Transaction model
-        if hasattr(Transaction, sort_field):
-            order_col = getattr(Transaction, sort_field)
-            if sort_direction == 'desc':
-                order_col = order_col.desc()
-            query = query.order_by(order_col)
-        else:
-            # Default sort by date desc if invalid field
-            query = query.order_by(Transaction.date.desc())
-    else:
-        # Default sort by date desc
-        query = query.order_by(Transaction.date.desc())
-    
-    # Apply pagination
-    transactions = query.offset(skip).limit(limit).all()
-    
-    # Convert SQLAlchemy objects to dictionaries
-    transactions_list = [
-        {
-            "id": t.id,
-            "date": t.date.isoformat(),
-            "description": t.description,
-            "amount": float(t.amount),
-            "category": t.category,
-            "type": t.type,
-            "is_fixed": t.is_fixed,
-            "frequency": t.frequency,
-            "created_at": t.created_at.isoformat() if t.created_at else None,
-            "updated_at": t.updated_at.isoformat() if t.updated_at else None,
+    except crud.InvalidCursor as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    # Result tuples straight to JSON: orjson encodes dates and datetimes
+    # itself, so there is no ORM hydration or jsonable_encoder pass
+    return ORJSONResponse({
+        "transactions": rows_to_dicts(TRANSACTION_FIELDS, page["transactions"]),
+        "total": page["total"],
+        "next_cursor": page["next_cursor"]
+    })
+
+# Bulk routes; declared before /transactions/{transaction_id} so "bulk"
+# isn't taken for an id
+MAX_BULK_ITEMS = 10000
+
+def validate_bulk_item(schema, item: dict, result: dict):
+    """The item parsed with schema, or None with the errors recorded in result"""
+    try:
+        return schema(**item)
+    except ValidationError as e:
+        result["status"] = "invalid"
+        result["errors"] = [{"loc": list(error["loc"]), "msg": error["msg"]} for error in e.errors()]
+        return None
+
+def bulk_summary(results: List[dict]) -> dict:
+    counts = {}
+    for result in results:
+        counts[result["status"]] = counts.get(result["status"], 0) + 1
+    return {"results": results, "counts": counts}
+
+def bulk_write_error(db: Session, error: SQLAlchemyError, results: List[dict]) -> HTTPException:
+    """
+    The error response for a bulk write the database rejected: the batch was
+    rolled back, so every item not already reported invalid is rolled_back
+    """
+    db.rollback()
+    logger.error(f"Bulk write failed: {str(error)}")
+    for result in results:
+        result.setdefault("status", "rolled_back")
+    return HTTPException(
+        status_code=409 if isinstance(error, IntegrityError) else 500,
+        detail={
+            "message": "Bulk write failed; no item was written",
+            "error": str(getattr(error, "orig", None) or error),
+            **bulk_summary(results)
         }
-        for t in transactions
-    ]
-    
-    return {
-        "transactions": transactions_list,
-        "total": total
-    }
+    )
+
+@app.post("/transactions/bulk")
+def bulk_create_transactions(
+    items: List[dict] = Body(..., max_length=MAX_BULK_ITEMS),
+    db: Session = Depends(get_db)
+):
+    """
+    Create many transactions in one database transaction. Items are
+    validated one by one; invalid items are reported and the rest created.
+    """
+    results = [{"index": index} for index in range(len(items))]
+    valid = []
+    for item, result in zip(items, results):
+        transaction = validate_bulk_item(schemas.TransactionCreate, item, result)
+        if transaction is not None:
+            valid.append((transaction, result))
+
+    try:
+        ids = crud.bulk_create_transactions(db, [transaction for transaction, _ in valid])
+    except SQLAlchemyError as e:
+        raise bulk_write_error(db, e, results)
+    for (_, result), transaction_id in zip(valid, ids):
+        result.update(status="created", id=transaction_id)
+    return bulk_summary(results)
+
+@app.patch("/transactions/bulk")
+def bulk_update_transactions(
+    items: List[dict] = Body(..., max_length=MAX_BULK_ITEMS),
+    db: Session = Depends(get_db)
+):
+    """
+    Partially update many transactions (each item: id plus the fields to
+    change) in one database transaction.
+    """
+    results = [{"index": index, "id": item.get("id")} for index, item in enumerate(items)]
+    valid = []
+    for item, result in zip(items, results):
+        update = validate_bulk_item(schemas.TransactionBulkUpdate, item, result)
+        if update is not None:
+            valid.append((update, result))
+
+    try:
+        found = crud.bulk_update_transactions(
+            db,
+            [(update.id, schemas.TransactionUpdate(**update.model_dump(exclude_unset=True, exclude={"id"}))) for update, _ in valid]
+        )
+    except SQLAlchemyError as e:
+        raise bulk_write_error(db, e, results)
+    for (_, result), exists in zip(valid, found):
+        result["status"] = "updated" if exists else "not_found"
+    return bulk_summary(results)
+
+@app.delete("/transactions/bulk")
+def bulk_delete_transactions(
+    request: schemas.TransactionBulkDelete,
+    db: Session = Depends(get_db)
+):
+    """Delete many transactions by id in one database transaction"""
+    if len(request.ids) > MAX_BULK_ITEMS:
+        raise HTTPException(status_code=422, detail=f"At most {MAX_BULK_ITEMS} ids per request")
+    results = [{"index": index, "id": transaction_id} for index, transaction_id in enumerate(request.ids)]
+    try:
+        found = crud.bulk_delete_transactions(db, request.ids)
+    except SQLAlchemyError as e:
+        raise bulk_write_error(db, e, results)
+    for result, exists in zip(results, found):
+        result["status"] = "deleted" if exists else "not_found"
+    return bulk_summary(results)
 
 @app.get("/transactions/{transaction_id}", response_model=schemas.Transaction)
-def read_transaction(transaction_id: int, db: Session = Depends(get_db)):
+def read_transaction(transaction_id: int, db: Session = Depends(get_read_db)):
     transaction = crud.get_transaction(db, transaction_id=transaction_id)
     if transaction is None:
         raise HTTPException(status_code=404, detail="Transaction not found")
@@ -154,19 +322,19 @@ def read_transaction(transaction_id: int, db: Session = Depends(get_db)):
 async def update_transaction(
     transaction_id: int, 
     transaction: schemas.TransactionUpdate,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     try:
         # Log the incoming data
         logger.info(f"Updating transaction {transaction_id}")
-        logger.info(f"Received data: {transaction.dict(exclude_unset=True)}")
+        logger.info(f"Received data: {transaction.model_dump(exclude_unset=True)}")
         
         # Validate the data
-        transaction_dict = transaction.dict(exclude_unset=True)
+        transaction_dict = transaction.model_dump(exclude_unset=True)
         logger.info(f"Validated data: {transaction_dict}")
         
         # Attempt to update
-        updated_transaction = crud.update_transaction(db, transaction_id, transaction)
+        updated_transaction = await crud.aio.update_transaction(db, transaction_id, transaction)
         
         if updated_transaction is None:
             logger.error(f"Transaction {transaction_id} not found")
@@ -200,14 +368,15 @@ def delete_transaction(transaction_id: int, db: Session = Depends(get_db)):
 def create_bill(bill: schemas.BillCreate, db: Session = Depends(get_db)):
     return crud.create_bill(db=db, bill=bill)
 
-@app.get("/bills/", response_model=List[schemas.Bill])
+# Rows go straight to orjson, unvalidated; the model only documents them
+@app.get("/bills/", responses={200: {"model": List[schemas.Bill]}})
 def read_bills(
     skip: int = 0,
     limit: int = 100,
     start_date: Optional[date] = None,
     end_date: Optional[date] = None,
     category: Optional[str] = None,
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
     bills = crud.get_bills(
         db, 
@@ -215,12 +384,25 @@ def read_bills(
         limit=limit,
         start_date=start_date,
         end_date=end_date,
-        category=category
+        category=category,
+        columns=crud.bill.LIST_COLUMNS
     )
-    return bills
+    return ORJSONResponse(rows_to_dicts(BILL_FIELDS, bills))
+
+@app.get("/bills/upcoming")
+def read_upcoming_bills(
+    horizon: int = Query(30, ge=1, le=3660, description="Days ahead, counting today"),
+    start_date: Optional[date] = Query(None, description="Defaults to today"),
+    category: Optional[str] = None,
+    db: Session = Depends(get_read_db)
+):
+    """Due dates of all bills, recurring ones expanded, over the horizon"""
+    start_date = start_date or date.today()
+    end_date = start_date + relativedelta(days=horizon - 1)
+    return Response(crud.get_upcoming_bills(db, start_date, end_date, category=category), media_type="application/json")
 
 @app.get("/bills/{bill_id}", response_model=schemas.Bill)
-def read_bill(bill_id: int, db: Session = Depends(get_db)):
+def read_bill(bill_id: int, db: Session = Depends(get_read_db)):
     bill = crud.get_bill(db, bill_id=bill_id)
     if bill is None:
         raise HTTPException(status_code=404, detail="Bill not found")
@@ -237,81 +419,56 @@ def update_bill_route(
         raise HTTPException(status_code=404, detail="Bill not found")
     return updated_bill
 
+# Recurring schedule routes
+@app.post("/schedules/", response_model=schemas.RecurringSchedule)
+def create_schedule(schedule: schemas.RecurringScheduleCreate, db: Session = Depends(get_db)):
+    return crud.create_schedule(db=db, schedule=schedule)
+
+@app.get("/schedules/", response_model=List[schemas.RecurringSchedule])
+def read_schedules(active_only: bool = False, db: Session = Depends(get_read_db)):
+    return crud.get_schedules(db, active_only=active_only)
+
+@app.post("/schedules/materialize")
+def materialize_schedules(
+    end_date: Optional[date] = None,
+    start_date: Optional[date] = None,
+    db: Session = Depends(get_db)
+):
+    """
+    Create the transactions of all occurrences due up to end_date (default
+    today). With start_date, the occurrences in [start_date, end_date] are
+    created even if earlier runs already covered them; existing ones are
+    never duplicated.
+    """
+    end_date = end_date or date.today()
+    if start_date and start_date > end_date:
+        raise HTTPException(status_code=400, detail="start_date must not be after end_date")
+    ids = crud.materialize_occurrences(db, end_date, start_date=start_date)
+    return {"created": len(ids), "transaction_ids": ids}
+
+@app.delete("/schedules/{schedule_id}", response_model=schemas.RecurringSchedule)
+def deactivate_schedule(schedule_id: int, db: Session = Depends(get_db)):
+    schedule = crud.deactivate_schedule(db, schedule_id)
+    if schedule is None:
+        raise HTTPException(status_code=404, detail="Schedule not found")
+    return schedule
+
 # Statistics routes
 @app.get("/statistics/monthly")
 def get_monthly_statistics(
     year: int = Query(..., description="Year to get statistics for"),
     month: Optional[int] = Query(None, description="Month to get statistics for"),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
-    # Create base query for transactions
-    query = db.query(Transaction)
-    
-    # Filter by year
-    query = query.filter(extract('year', Transaction.date) == year)
-    
-    # Filter by month if provided
-    if month:
-        query = query.filter(extract('month', Transaction.date) == month)
-    
-    # Get transactions
-    transactions = query.all()
-    
-    # Calculate statistics
-    total_income = sum(t.amount for t in transactions if t.type == 'income')
-    total_expenses = sum(t.amount for t in transactions if t.type == 'expense')
-    
-    # Calculate monthly stats
-    monthly_stats = {
-        "total_income": total_income,
-        "total_expenses": total_expenses,
-        "net_savings": total_income - total_expenses,
-        "saving_rate": (total_income - total_expenses) / total_income if total_income > 0 else 0
-    }
-    
-    return monthly_stats
+    return ORJSONResponse(crud.get_monthly_statistics(db, year=year, month=month))
 
 @app.get("/statistics/category")
 def get_category_statistics(
     year: int = Query(..., description="Year to get statistics for"),
     month: Optional[int] = Query(None, description="Month to get statistics for"),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
-    # Create base query
-    query = db.query(
-        Transaction.category,
-        Transaction.type,
-        func.sum(Transaction.amount).label('total')
-    ).group_by(Transaction.category, Transaction.type)
-    
-    # Filter by year
-    query = query.filter(extract('year', Transaction.date) == year)
-    
-    # Filter by month if provided
-    if month:
-        query = query.filter(extract('month', Transaction.date) == month)
-    
-    # Execute query
-    results = query.all()
-    
-    # Organize results by category and type
-    stats = {
-        'expenses': {},
-        'income': {}
-    }
-    
-    for category, type_, total in results:
-        if type_ == 'expense':
-            stats['expenses'][category] = float(total)
-        else:
-            stats['income'][category] = float(total)
-    
-    return stats
-
-def end_month(date_obj: date) -> date:
-    """Return the last day of the given month"""
-    next_month = date_obj.replace(day=28) + relativedelta(days=4)
-    return next_month - relativedelta(days=next_month.day)
+    return ORJSONResponse(crud.get_category_statistics(db, year=year, month=month))
 
 def validate_csv_columns(df: pd.DataFrame) -> bool:
     """Validate that the CSV has the required columns"""
@@ -323,62 +480,70 @@ def validate_csv_columns(df: pd.DataFrame) -> bool:
 def get_budget_statistics(
     start_date: date,
     end_date: date,
-    db: Session = Depends(get_db)
+    months: int = Query(6, ge=1, le=240, description="Number of months in the budget trend"),
+    db: Session = Depends(get_read_db)
 ):
-    # Get current month stats
-    current_month = db.query(
-        func.sum(case((Transaction.type == 'income', Transaction.amount), else_=0)).label('total_income'),
-        func.sum(case((Transaction.type == 'expense', Transaction.amount), else_=0)).label('total_expenses')
-    ).filter(
-        Transaction.date.between(start_date, end_date)
-    ).first()
-    
-    # Calculate initial rollover from all previous months
-    initial_rollover = db.query(
-        func.sum(case((Transaction.type == 'income', Transaction.amount), else_=-Transaction.amount))
-    ).filter(
-        Transaction.date < start_date - relativedelta(months=5)  # Start before the 6-month window
-    ).scalar() or 0
-    
-    # Get trend data for the last 6 months
-    trend_data = []
-    running_rollover = initial_rollover
-    
-    for i in range(5, -1, -1):
-        month_start = start_date - relativedelta(months=i)
-        month_end = end_month(month_start)
-        
-        month_stats = db.query(
-            func.sum(case((Transaction.type == 'income', Transaction.amount), else_=0)).label('income'),
-            func.sum(case((Transaction.type == 'expense', Transaction.amount), else_=0)).label('expenses')
-        ).filter(
-            Transaction.date.between(month_start, month_end)
-        ).first()
-        
-        month_income = month_stats.income or 0
-        month_expenses = month_stats.expenses or 0
-        month_net = month_income - month_expenses
-        
-        # Update running rollover
-        running_rollover += month_net
-        
-        trend_data.append({
-            'month': month_start.strftime('%b %Y'),
-            'available': month_net,  # This month's net without rollover
-            'rollover': running_rollover  # Cumulative including this month
-        })
-    
-    # Current rollover is the last running_rollover value
-    current_rollover = running_rollover
-    
-    return {
-        'current_month': {
-            'total_income': current_month.total_income or 0,
-            'total_expenses': current_month.total_expenses or 0,
-        },
-        'rollover': current_rollover,
-        'trend': trend_data
-    }
+    return ORJSONResponse(crud.get_budget_statistics(db, start_date=start_date, end_date=end_date, months=months))
+
+@app.get("/statistics/forecast")
+def get_forecast(
+    months: int = Query(12, ge=1, le=60, description="Months to forecast, starting with the current one"),
+    history_months: Optional[int] = Query(None, ge=1, le=600, description="Months of history to fit (default: all)"),
+    db: Session = Depends(get_read_db)
+):
+    """Forecast monthly income, expenses, balance and category totals"""
+    history = crud.get_monthly_history(db, months=history_months)
+    result = llm_service.forecast_cash_flow(history, months=months)
+    if "error" in result:
+        raise HTTPException(status_code=500, detail=result["error"])
+    return ORJSONResponse(result)
+
+@app.get("/analysis")
+def get_analysis(
+    analysis_type: str = Query(
+        "general",
+        pattern="^(all|general|spending_patterns|category_distribution|month_over_month|top_merchants|seasonality)$"
+    ),
+    start_date: Optional[date] = None,
+    end_date: Optional[date] = None,
+    category: Optional[str] = None,
+    limit: int = Query(10, ge=1, le=100, description="Merchants in top_merchants"),
+    db: Session = Depends(get_read_db)
+):
+    """Spending analyses over the transactions in a date range"""
+    frame = crud.get_transactions_frame(db, start_date=start_date, end_date=end_date, category=category)
+    result = llm_service.analyze_transactions(frame, analysis_type=analysis_type, limit=limit)
+    if "error" in result:
+        raise HTTPException(status_code=500, detail=result["error"])
+    return ORJSONResponse(result)
+
+@app.get("/anomalies", response_model=List[schemas.Anomaly])
+def read_anomalies(
+    start_date: Optional[date] = None,
+    end_date: Optional[date] = None,
+    reason: Optional[str] = Query(None, pattern="^(category|merchant|duplicate)$"),
+    include_dismissed: bool = False,
+    skip: int = Query(0, ge=0),
+    limit: int = Query(100, ge=1, le=1000),
+    db: Session = Depends(get_read_db)
+):
+    """Transactions flagged as unusual for their category or merchant, or as duplicates"""
+    return crud.get_anomalies(
+        db,
+        start_date=start_date,
+        end_date=end_date,
+        reason=reason,
+        include_dismissed=include_dismissed,
+        skip=skip,
+        limit=limit
+    )
+
+@app.post("/anomalies/{anomaly_id}/dismiss", response_model=schemas.Anomaly)
+def dismiss_anomaly(anomaly_id: int, db: Session = Depends(get_db)):
+    anomaly = crud.dismiss_anomaly(db, anomaly_id)
+    if anomaly is None:
+        raise HTTPException(status_code=404, detail="Anomaly not found")
+    return anomaly
 
 @app.post("/transactions/import")
 async def import_transactions(
@@ -387,192 +552,98 @@ async def import_transactions(
         False,
         description="Toggle between manual categories (false) and AI categorization (true)"
     ),
+    batch_size: int = Query(
+        importer.DEFAULT_BATCH_SIZE,
+        ge=1,
+        le=100000,
+        description="Rows parsed, inserted and committed per batch"
+    ),
+    skip_duplicates: bool = Query(
+        True,
+        description="Skip rows matching an existing transaction (same date, description, amount and type)"
+    ),
     db: Session = Depends(get_db)
 ):
     if not file.filename.endswith('.csv'):
         raise HTTPException(400, "File must be a CSV")
     
     try:
-        # Read CSV content
-        contents = await file.read()
-        df = pd.read_csv(StringIO(contents.decode('utf-8')))
-        
-        # Validate required columns
-        required_columns = {'date', 'description', 'amount', 'type'}
-        if not required_columns.issubset(set(map(str.lower, df.columns))):
-            raise HTTPException(
-                400, 
-                f"CSV must contain these columns: {', '.join(required_columns)}"
-            )
-        
-        # Normalize column names
-        df.columns = df.columns.str.lower()
-        
-        # Convert date strings to datetime
-        df['date'] = pd.to_datetime(df['date']).dt.date
-        
-        # Process transactions
-        new_transactions = []
-        categorization_results = []
-        failed_rows = []
-        
-        for i, row in df.iterrows():
-            try:
-                # Prepare base transaction data
-                transaction_data = {
-                    'date': row['date'],
-                    'description': str(row['description']),
-                    'amount': abs(float(row['amount'])),
-                    'type': str(row['type']).lower(),
-                    'is_fixed': bool(row.get('is_fixed', False))
-                }
-                
-                # Determine category based on toggle
-                if use_ai_categories:
-                    # Use AI categorization
-                    ai_category = llm_service.categorize_transaction(
-                        transaction_data['description'],
-                        transaction_data['is_fixed'],
-                        transaction_data['type']
-                    )
-                    transaction_data['category'] = ai_category
-                    original_category = row.get('category', 'Other')
-                else:
-                    # Use manual category from CSV
-                    transaction_data['category'] = row.get('category', 'Other')
-                    ai_category = llm_service.categorize_transaction(
-                        transaction_data['description'],
-                        transaction_data['is_fixed'],
-                        transaction_data['type']
-                    )
-                
-                # Store categorization result for response
-                categorization_results.append({
-                    'row': i + 2,  # +2 for header row and 1-based indexing
-                    'description': transaction_data['description'],
-                    'manual_category': row.get('category', 'Other'),
-                    'ai_category': ai_category,
-                    'used_category': ai_category if use_ai_categories else row.get('category', 'Other')
-                })
-                
-                # Create transaction using the Transaction model
-                db_transaction = Transaction(**transaction_data)
-                new_transactions.append(db_transaction)
-                
-            except Exception as e:
-                error_msg = str(e)
-                print(f"Error processing row {i + 2}: {error_msg}")
-                failed_rows.append({
-                    'row': i + 2,
-                    'error': error_msg
-                })
-        
-        # Batch insert transactions
-        if new_transactions:
-            try:
-                db.bulk_save_objects(new_transactions)
-                db.commit()
-                print(f"Successfully imported {len(new_transactions)} transactions")
-            except Exception as e:
-                db.rollback()
-                error_msg = str(e)
-                print(f"Error during batch insert: {error_msg}")
-                raise HTTPException(
-                    500, 
-                    f"Error importing transactions: {error_msg}"
-                )
-        
-        # Prepare category summary
-        categories_summary = {
-            'manual': {},
-            'ai': {},
-            'used': {}
-        }
-        
-        for result in categorization_results:
-            man_cat = result['manual_category']
-            ai_cat = result['ai_category']
-            used_cat = result['used_category']
-            
-            categories_summary['manual'][man_cat] = categories_summary['manual'].get(man_cat, 0) + 1
-            categories_summary['ai'][ai_cat] = categories_summary['ai'].get(ai_cat, 0) + 1
-            categories_summary['used'][used_cat] = categories_summary['used'].get(used_cat, 0) + 1
-        
-        response_data = {
-            "status": "success",
-            "imported": len(new_transactions),
-            "message": f"Successfully imported {len(new_transactions)} transactions",
-            "categorization": {
-                "total": len(categorization_results),
-                "using_ai_categories": use_ai_categories,
-                "results": categorization_results[:10],  # First 10 results for verification
-                "categories_summary": categories_summary,
-                "different_categories": sum(
-                    1 for r in categorization_results 
-                    if r['manual_category'] != r['ai_category']
-                )
-            }
-        }
-        
-        if failed_rows:
-            response_data["failed_rows"] = failed_rows
-            response_data["message"] += f" ({len(failed_rows)} rows failed)"
-        
-        return response_data
+        # Blocking work (and the model fallback's own event loop) runs in a worker thread
+        report = await run_in_threadpool(
+            importer.import_csv,
+            db,
+            file.file,
+            categorize=partial(llm_service.categorize_many, use_llm=use_ai_categories),
+            use_ai_categories=use_ai_categories,
+            batch_size=batch_size,
+            skip_existing=skip_duplicates
+        )
+        return report.to_response()
         
+    except importer.InvalidImportFile as e:
+        raise HTTPException(400, str(e))
     except pd.errors.EmptyDataError:
         raise HTTPException(400, "The CSV file is empty")
     except pd.errors.ParserError:
         raise HTTPException(400, "Error parsing CSV file. Please check the format")
+    except UnicodeDecodeError:
+        raise HTTPException(400, "The CSV file must be UTF-8 encoded")
+    except Exception as e:
+        db.rollback()
+        logger.error(f"Error importing transactions: {str(e)}")
+        raise HTTPException(500, f"Error importing transactions: {str(e)}")
+
+@app.post("/transactions/import/parquet")
+async def import_transactions_parquet(
+    file: UploadFile = File(...),
+    use_ai_categories: bool = Query(
+        False,
+        description="Toggle between manual categories (false) and AI categorization (true)"
+    ),
+    batch_size: int = Query(
+        importer.DEFAULT_BATCH_SIZE,
+        ge=1,
+        le=100000,
+        description="Rows inserted and committed per batch"
+    ),
+    skip_duplicates: bool = Query(
+        True,
+        description="Skip rows matching an existing transaction (same date, description, amount and type)"
+    ),
+    db: Session = Depends(get_db)
+):
+    if not file.filename.endswith('.parquet'):
+        raise HTTPException(400, "File must be a Parquet file")
+    
+    try:
+        report = await run_in_threadpool(
+            importer.import_parquet,
+            db,
+            file.file,
+            categorize=partial(llm_service.categorize_many, use_llm=use_ai_categories),
+            use_ai_categories=use_ai_categories,
+            batch_size=batch_size,
+            skip_existing=skip_duplicates
+        )
+        return report.to_response()
+        
+    except importer.InvalidImportFile as e:
+        raise HTTPException(400, str(e))
+    except pa.ArrowException:
+        raise HTTPException(400, "Error reading Parquet file. Please check the format")
     except Exception as e:
         db.rollback()
+        logger.error(f"Error importing transactions: {str(e)}")
         raise HTTPException(500, f"Error importing transactions: {str(e)}")
 
 @app.get("/statistics/category-summary")
 def get_category_summary(
     start_date: Optional[date] = None,
     end_date: Optional[date] = None,
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
     """Get summary of transactions by category"""
-    query = db.query(
-        Transaction.category,
-        Transaction.type,
-        func.sum(Transaction.amount).label('total'),
-        func.count(Transaction.id).label('count')
-    ).group_by(Transaction.category, Transaction.type)
-    
-    if start_date:
-        query = query.filter(Transaction.date >= start_date)
-    if end_date:
-        query = query.filter(Transaction.date <= end_date)
-    
-    results = query.all()
-    
-    summary = {
-        'expenses': {},
-        'income': {},
-        'totals': {
-            'income': 0,
-            'expenses': 0
-        }
-    }
-    
-    for category, type_, total, count in results:
-        if type_ == 'expense':
-            summary['expenses'][category] = {
-                'total': float(total),
-                'count': count
-            }
-            summary['totals']['expenses'] += float(total)
-        else:
-            summary['income'][category] = {
-                'total': float(total),
-                'count': count
-            }
-            summary['totals']['income'] += float(total)
-    
-    return summary
+    return ORJSONResponse(crud.get_category_summary(db, start_date=start_date, end_date=end_date))
 
 
 #### testing LLM service 
@@ -594,50 +665,8 @@ def test_categorize(description: str):
         }
     
 ### Advisor page 
-@app.post("/finance/ask")
-async def ask_financial_question(
-    request: QuestionRequest,
-    db: Session = Depends(get_db)
-):
-    try:
-        current_date = datetime.now()
-        month_start = current_date.replace(day=1)
-        month_end = (month_start + relativedelta(months=1)) - relativedelta(days=1)
-        
-        # Get financial data
-        stats = db.query(
-            func.sum(case((Transaction.type == 'income', Transaction.amount), else_=0)).label('total_income'),
-            func.sum(case((Transaction.type == 'expense', Transaction.amount), else_=0)).label('total_expenses')
-        ).filter(
-            Transaction.date.between(month_start, month_end)
-        ).first()
-
-        # Handle None values
-        total_income = float(stats.total_income if stats.total_income is not None else 0)
-        total_expenses = float(stats.total_expenses if stats.total_expenses is not None else 0)
-        
-        # Get recurring bills
-        bills = db.query(Bill).filter(
-            Bill.is_recurring == True
-        ).all()
-        
-        # Format data for LLM
-        financial_context = {
-            "current_month": {
-                "income": total_income,
-                "expenses": total_expenses,
-                "available": total_income - total_expenses
-            },
-            "recurring_bills": [
-                {
-                    "name": bill.name,
-                    "amount": float(bill.amount)
-                }
-                for bill in bills
-            ]
-        }
-        
-        prompt = f"""
+def build_advice_prompt(financial_context: dict, question: str) -> str:
+    return f"""
         You are a financial advisor. Based on the following financial information:
         
         Current Month:
@@ -648,7 +677,7 @@ async def ask_financial_question(
         Recurring Bills:
         {json.dumps(financial_context['recurring_bills'], indent=2)}
         
-        Question: {request.question}
+        Question: {question}
         
         Provide advice considering:
         1. Current financial situation
@@ -658,8 +687,31 @@ async def ask_financial_question(
         
         Format your response in a clear, structured way with specific recommendations.
         """
-        
-        response = llm_service.get_financial_advice(prompt)
+
+def sse_event(event: str, data: dict) -> str:
+    """Format one Server-Sent Events message"""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+@app.get("/finance/ask/cache")
+def advice_cache_stats():
+    return llm_service.advice_cache_stats()
+
+@app.post("/finance/ask")
+async def ask_financial_question(
+    request: QuestionRequest,
+    db: AsyncSession = Depends(get_async_read_db)
+):
+    try:
+        # Neither the database nor the model call blocks the event loop
+        financial_context = await crud.aio.get_financial_context(db)
+        prompt = build_advice_prompt(financial_context, request.question)
+        
+        response = await llm_service.aget_financial_advice(
+            prompt,
+            question=request.question,
+            context=financial_context,
+            scopes=crud.financial_context_scopes()
+        )
         
         return {
             "response": response,
@@ -672,83 +724,120 @@ async def ask_financial_question(
             status_code=500, 
             detail=f"Error processing question: {str(e)}"
         )
+
+@app.post("/finance/ask/stream")
+async def stream_financial_question(
+    request: QuestionRequest,
+    http_request: Request,
+    db: AsyncSession = Depends(get_async_read_db)
+):
+    """
+    Stream the advisor's answer as Server-Sent Events: one `context` event,
+    then a `token` event per generated chunk, then `done` (or `error`).
+    Generation stops as soon as the client disconnects.
+    """
+    financial_context = await crud.aio.get_financial_context(db)
+    prompt = build_advice_prompt(financial_context, request.question)
+
+    async def events():
+        yield sse_event("context", financial_context)
+        stream = llm_service.stream_financial_advice(
+            prompt,
+            question=request.question,
+            context=financial_context,
+            scopes=crud.financial_context_scopes()
+        )
+        try:
+            async for token in stream:
+                if await http_request.is_disconnected():
+                    return
+                yield sse_event("token", {"token": token})
+            yield sse_event("done", {})
+        except Exception as e:
+            print(f"Error in financial advisor: {str(e)}")
+            yield sse_event("error", {"detail": f"Error processing question: {str(e)}"})
+        finally:
+            # Cancels the model request if we stopped early
+            await stream.aclose()
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
     
 
 ### Export data to CSV route 
-def generate_csv(data: List[dict], filename: str) -> StreamingResponse:
-    output = StringIO()
-    writer = csv.DictWriter(output, fieldnames=data[0].keys() if data else [])
-    writer.writeheader()
-    writer.writerows(data)
-    
-    output.seek(0)
-    
+def generate_csv(
+    http_request: Request,
+    statement,
+    columns: List[str],
+    filename: str
+) -> StreamingResponse:
+    """Stream the statement's rows as CSV, gzipped when the client accepts it"""
+    chunks = exporter.csv_chunks(columns, exporter.iter_batches(ReadSessionLocal, statement))
+    headers = {
+        "Content-Disposition": f"attachment; filename={filename}",
+        "Vary": "Accept-Encoding"
+    }
+    if exporter.accepts_gzip(http_request.headers.get("accept-encoding")):
+        headers["Content-Encoding"] = "gzip"
+        chunks = exporter.gzip_chunks(chunks)
+
     return StreamingResponse(
-        iter([output.getvalue()]),
+        chunks,
         media_type="text/csv",
-        headers={"Content-Disposition": f"attachment; filename={filename}"}
+        headers=headers
     )
 
 @app.get("/export/transactions")
 def export_transactions(
-    db: Session = Depends(get_db),
+    http_request: Request,
     start_date: Optional[date] = None,
     end_date: Optional[date] = None,
     category: Optional[str] = None,
     transaction_type: Optional[str] = None
 ):
-    query = db.query(Transaction)
-    
-    if start_date:
-        query = query.filter(Transaction.date >= start_date)
-    if end_date:
-        query = query.filter(Transaction.date <= end_date)
-    if category:
-        query = query.filter(Transaction.category == category)
-    if transaction_type:
-        query = query.filter(Transaction.type == transaction_type)
-    
-    transactions = query.all()
-    
-    data = [{
-        'date': t.date,
-        'description': t.description,
-        'amount': t.amount,
-        'category': t.category,
-        'type': t.type,
-        'is_fixed': t.is_fixed
-    } for t in transactions]
-    
-    return generate_csv(data, 'transactions.csv')
+    statement = exporter.transactions_statement(start_date, end_date, category, transaction_type)
+    return generate_csv(http_request, statement, exporter.TRANSACTION_COLUMNS, 'transactions.csv')
 
 @app.get("/export/bills")
 def export_bills(
-    db: Session = Depends(get_db),
+    http_request: Request,
     start_date: Optional[date] = None,
     end_date: Optional[date] = None,
     category: Optional[str] = None
 ):
-    query = db.query(Bill)
-    
-    if start_date:
-        query = query.filter(Bill.due_date >= start_date)
-    if end_date:
-        query = query.filter(Bill.due_date <= end_date)
-    if category:
-        query = query.filter(Bill.category == category)
-    
-    bills = query.all()
-    
-    data = [{
-        'name': b.name,
-        'amount': b.amount,
-        'due_date': b.due_date,
-        'category': b.category,
-        'is_recurring': b.is_recurring,
-        'frequency': b.frequency
-    } for b in bills]
-    
-    return generate_csv(data, 'bills.csv')
+    statement = exporter.bills_statement(start_date, end_date, category)
+    return generate_csv(http_request, statement, exporter.BILL_COLUMNS, 'bills.csv')
+
+def generate_parquet(statement, schema, filename: str) -> StreamingResponse:
+    """Stream the statement's rows as a Parquet file, one row group per batch"""
+    batches = exporter.iter_batches(ReadSessionLocal, statement, exporter.PARQUET_BATCH_SIZE)
+    return StreamingResponse(
+        exporter.parquet_chunks(schema, batches),
+        media_type="application/vnd.apache.parquet",
+        headers={"Content-Disposition": f"attachment; filename={filename}"}
+    )
+
+@app.get("/export/transactions.parquet")
+def export_transactions_parquet(
+    start_date: Optional[date] = None,
+    end_date: Optional[date] = None,
+    category: Optional[str] = None,
+    transaction_type: Optional[str] = None
+):
+    statement = exporter.transactions_statement(start_date, end_date, category, transaction_type)
+    return generate_parquet(statement, exporter.TRANSACTION_SCHEMA, 'transactions.parquet')
+
+@app.get("/export/bills.parquet")
+def export_bills_parquet(
+    start_date: Optional[date] = None,
+    end_date: Optional[date] = None,
+    category: Optional[str] = None
+):
+    statement = exporter.bills_statement(start_date, end_date, category)
+    return generate_parquet(statement, exporter.BILL_SCHEMA, 'bills.parquet')
 
 if __name__ == "__main__":
     uvicorn.run(app, host="0.0.0.0", port=8000)
\ No newline at end of file
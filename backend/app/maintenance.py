@@ -0,0 +1,77 @@
+# app/maintenance.py
+"""
+Data maintenance commands.
+
+Run from the backend directory, e.g.:
+
+    python -m app.maintenance rebuild-rollups
+"""
+import argparse
+import sys
+
+from .database import SessionLocal, engine
+from .models.base import Base
+from .migrations import rebuild_transactions_fts, run_migrations
+from . import crud
+
+
+def rebuild_rollups(db) -> None:
+    """Recompute monthly_category_totals from the transactions table"""
+    buckets = crud.rebuild_monthly_totals(db)
+    print(f"Rebuilt monthly_category_totals: {buckets} buckets")
+
+
+def rebuild_search_index(db) -> None:
+    """Re-index all transactions in the full-text search table"""
+    if not crud.search.fts_available(db):
+        print("Full-text search is not available on this database")
+        return
+    rebuild_transactions_fts(engine)
+    print("Rebuilt the full-text search indexes")
+
+
+def merge_duplicate_transactions(db) -> None:
+    """Fill missing fingerprints, then keep only the oldest of each duplicate group"""
+    backfilled = crud.backfill_fingerprints(db)
+    if backfilled:
+        print(f"Computed {backfilled} missing fingerprints")
+    removed = crud.merge_duplicates(db)
+    print(f"Removed {removed} duplicate transactions")
+
+
+def rebuild_amount_stats(db) -> None:
+    """Recompute the per-category / per-merchant amount statistics"""
+    keys = crud.rebuild_amount_stats(db)
+    print(f"Rebuilt amount_stats: {keys} keys")
+
+
+COMMANDS = {
+    "rebuild-rollups": rebuild_rollups,
+    "rebuild-search-index": rebuild_search_index,
+    "merge-duplicates": merge_duplicate_transactions,
+    "rebuild-amount-stats": rebuild_amount_stats,
+}
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Finance dashboard data maintenance")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    subparsers.add_parser("rebuild-rollups", help="Repair drift in the monthly category rollup")
+    subparsers.add_parser("rebuild-search-index", help="Rebuild the transactions full-text index")
+    subparsers.add_parser("merge-duplicates", help="Delete transactions duplicating an older one")
+    subparsers.add_parser("rebuild-amount-stats", help="Repair drift in the anomaly detection statistics")
+    args = parser.parse_args(argv)
+
+    Base.metadata.create_all(bind=engine)
+    run_migrations(engine)
+
+    db = SessionLocal()
+    try:
+        COMMANDS[args.command](db)
+    finally:
+        db.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,272 @@
+# app/migrations.py
+"""
+Lightweight, idempotent schema migrations.
+
+`Base.metadata.create_all` only creates missing tables, so indexes and
+columns added to existing tables have to be applied here. Every step must
+be safe to run on each startup.
+"""
+import logging
+
+from sqlalchemy import func, inspect, select, text
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.engine import Engine
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import Session
+
+from .models.transaction import Transaction
+from .models.monthly_category_total import MonthlyCategoryTotal
+from .models.data_version import DataVersion
+from .models.recurring_schedule import RecurringSchedule
+from .models.amount_stat import AmountStat
+from .crud import anomalies, changes, dedup, rollup
+
+logger = logging.getLogger(__name__)
+
+# External-content FTS5 index over transactions.description / category,
+# kept in sync by triggers so every write path (ORM, Core, raw SQL) is covered.
+TRANSACTIONS_FTS_DDL = [
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS transactions_fts USING fts5(
+        description, category,
+        content='transactions', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2', prefix='2 3'
+    )
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS transactions_fts_ai AFTER INSERT ON transactions BEGIN
+        INSERT INTO transactions_fts(rowid, description, category)
+        VALUES (new.id, new.description, new.category);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS transactions_fts_ad AFTER DELETE ON transactions BEGIN
+        INSERT INTO transactions_fts(transactions_fts, rowid, description, category)
+        VALUES ('delete', old.id, old.description, old.category);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS transactions_fts_au AFTER UPDATE OF description, category ON transactions BEGIN
+        INSERT INTO transactions_fts(transactions_fts, rowid, description, category)
+        VALUES ('delete', old.id, old.description, old.category);
+        INSERT INTO transactions_fts(rowid, description, category)
+        VALUES (new.id, new.description, new.category);
+    END
+    """,
+]
+
+# Trigram index over the same columns: serves substring search ("gros" in
+# "MIGROS") from the index instead of a LIKE scan. Needs SQLite 3.34+.
+TRANSACTIONS_TRIGRAM_DDL = [
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS transactions_trigram USING fts5(
+        description, category,
+        content='transactions', content_rowid='id',
+        tokenize='trigram'
+    )
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS transactions_trigram_ai AFTER INSERT ON transactions BEGIN
+        INSERT INTO transactions_trigram(rowid, description, category)
+        VALUES (new.id, new.description, new.category);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS transactions_trigram_ad AFTER DELETE ON transactions BEGIN
+        INSERT INTO transactions_trigram(transactions_trigram, rowid, description, category)
+        VALUES ('delete', old.id, old.description, old.category);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS transactions_trigram_au AFTER UPDATE OF description, category ON transactions BEGIN
+        INSERT INTO transactions_trigram(transactions_trigram, rowid, description, category)
+        VALUES ('delete', old.id, old.description, old.category);
+        INSERT INTO transactions_trigram(rowid, description, category)
+        VALUES (new.id, new.description, new.category);
+    END
+    """,
+]
+
+# Full-text tables and the DDL that creates each
+SEARCH_INDEXES = {
+    "transactions_fts": TRANSACTIONS_FTS_DDL,
+    "transactions_trigram": TRANSACTIONS_TRIGRAM_DDL,
+}
+
+
+def add_transaction_fingerprint(engine: Engine):
+    """Add and backfill transactions.fingerprint on databases created before it"""
+    columns = {column["name"] for column in inspect(engine).get_columns("transactions")}
+    if "fingerprint" in columns:
+        return
+    with engine.begin() as conn:
+        conn.execute(text("ALTER TABLE transactions ADD COLUMN fingerprint VARCHAR(40)"))
+    with Session(bind=engine) as db:
+        updated = dedup.backfill_fingerprints(db)
+    logger.info(f"Backfilled {updated} transaction fingerprints")
+
+
+def add_transaction_schedule_columns(engine: Engine):
+    """Add transactions.schedule_id / occurrence_date on databases created before them"""
+    columns = {column["name"] for column in inspect(engine).get_columns("transactions")}
+    with engine.begin() as conn:
+        if "schedule_id" not in columns:
+            conn.execute(text("ALTER TABLE transactions ADD COLUMN schedule_id INTEGER"))
+        if "occurrence_date" not in columns:
+            conn.execute(text("ALTER TABLE transactions ADD COLUMN occurrence_date DATE"))
+
+
+def add_schedule_transaction_column(engine: Engine):
+    """Add recurring_schedules.transaction_id on databases created before it"""
+    columns = {column["name"] for column in inspect(engine).get_columns("recurring_schedules")}
+    if "transaction_id" not in columns:
+        with engine.begin() as conn:
+            conn.execute(text("ALTER TABLE recurring_schedules ADD COLUMN transaction_id INTEGER"))
+
+
+def schedules_from_fixed_transactions(engine: Engine):
+    """
+    Turn the fixed transactions of databases from before recurring schedules
+    into schedules. Earlier runs copied the templates, so rows with the same
+    fields form one schedule, starting at the first and materialized through
+    the last of them. The first row becomes the schedule's template.
+    """
+    with Session(bind=engine) as db:
+        if db.query(RecurringSchedule.id).first() is not None:
+            return
+        groups = db.execute(
+            select(
+                Transaction.description, Transaction.amount, Transaction.category,
+                Transaction.type, Transaction.frequency,
+                func.min(Transaction.date), func.max(Transaction.date)
+            )
+            .where(Transaction.is_fixed == True, Transaction.frequency.is_not(None))
+            .group_by(
+                Transaction.description, Transaction.amount, Transaction.category,
+                Transaction.type, Transaction.frequency
+            )
+        ).all()
+        for description, amount, category, transaction_type, frequency, first, last in groups:
+            template = db.query(Transaction).filter(
+                Transaction.is_fixed == True,
+                Transaction.description == description,
+                Transaction.amount == amount,
+                Transaction.category == category,
+                Transaction.type == transaction_type,
+                Transaction.frequency == frequency,
+                Transaction.date == first
+            ).order_by(Transaction.id).first()
+            schedule = RecurringSchedule(
+                description=description,
+                amount=amount,
+                category=category,
+                type=transaction_type,
+                frequency=frequency,
+                start_date=first,
+                transaction_id=template.id,
+                materialized_through=last
+            )
+            db.add(schedule)
+            db.flush()
+            template.schedule_id = schedule.id
+            template.occurrence_date = first
+        db.commit()
+    if groups:
+        logger.info(f"Created {len(groups)} recurring schedules from fixed transactions")
+
+
+def create_data_version_row(engine: Engine):
+    """The data_version counter row that every write bumps"""
+    with engine.begin() as conn:
+        conn.execute(
+            sqlite_insert(DataVersion).values(id=1, version=0).on_conflict_do_nothing()
+        )
+
+
+def create_missing_indexes(engine: Engine):
+    """Create the indexes declared on the models that don't exist yet"""
+    with engine.begin() as conn:
+        for index in Transaction.__table__.indexes:
+            index.create(bind=conn, checkfirst=True)
+
+
+# Indexes once declared on the models that no query uses any more; each costs
+# every write. ix_transactions_date_type_amount served the monthly statistics,
+# which read monthly_category_totals since the rollup.
+DROPPED_INDEXES = ["ix_transactions_date_type_amount"]
+
+
+def drop_unused_indexes(engine: Engine):
+    """Drop the DROPPED_INDEXES left on existing databases"""
+    with engine.begin() as conn:
+        for index in DROPPED_INDEXES:
+            conn.execute(text(f"DROP INDEX IF EXISTS {index}"))
+
+
+def backfill_monthly_totals(engine: Engine):
+    """Populate monthly_category_totals for databases created before the rollup"""
+    with Session(bind=engine) as db:
+        if db.query(MonthlyCategoryTotal).first() is None and db.query(Transaction.id).first() is not None:
+            rollup.rebuild(db)
+
+
+def backfill_amount_stats(engine: Engine):
+    """Populate amount_stats for databases created before anomaly detection"""
+    with Session(bind=engine) as db:
+        if db.query(AmountStat.kind).first() is None and db.query(Transaction.id).first() is not None:
+            anomalies.rebuild_stats(db)
+
+
+def rebuild_transactions_fts(engine: Engine, tables=None):
+    """
+    Re-index every transaction in the full-text tables (all existing ones by
+    default). Bumps the data version, as search results may change.
+    """
+    if tables is None:
+        tables = [table for table in SEARCH_INDEXES if inspect(engine).has_table(table)]
+    with engine.begin() as conn:
+        for table in tables:
+            conn.execute(text(f"INSERT INTO {table}({table}) VALUES ('rebuild')"))
+        conn.execute(changes.bump_data_version())
+
+
+def create_transactions_fts(engine: Engine):
+    """
+    Create the full-text search indexes; search falls back to LIKE without
+    FTS5, and to the word index alone without the trigram tokenizer
+    """
+    if engine.dialect.name != "sqlite":
+        return
+    created = []
+    for table, statements in SEARCH_INDEXES.items():
+        is_new = not inspect(engine).has_table(table)
+        try:
+            with engine.begin() as conn:
+                for statement in statements:
+                    conn.execute(text(statement))
+        except OperationalError as e:
+            logger.warning(f"Full-text index {table} disabled: {str(e)}")
+            continue
+        if is_new:
+            created.append(table)
+    if created:
+        rebuild_transactions_fts(engine, created)
+
+
+MIGRATIONS = [
+    add_transaction_fingerprint,
+    add_transaction_schedule_columns,
+    add_schedule_transaction_column,
+    create_missing_indexes,
+    drop_unused_indexes,
+    backfill_monthly_totals,
+    backfill_amount_stats,
+    create_transactions_fts,
+    create_data_version_row,
+    schedules_from_fixed_transactions,
+]
+
+
+def run_migrations(engine: Engine):
+    for migration in MIGRATIONS:
+        migration(engine)
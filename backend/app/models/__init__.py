@@ -1,3 +1,8 @@
 from . base import Base
 from . transaction import Transaction
-from . bill import Bill
\ No newline at end of file
+from . bill import Bill
+from . monthly_category_total import MonthlyCategoryTotal
+from . data_version import DataVersion
+from . recurring_schedule import RecurringSchedule
+from . amount_stat import AmountStat
+from . anomaly import Anomaly
\ No newline at end of file
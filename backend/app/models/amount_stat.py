@@ -0,0 +1,16 @@
+from sqlalchemy import Column, Integer, String, Float
+from .base import Base
+
+class AmountStat(Base):
+    """
+    Running count / mean / sum of squared deviations (Welford) of transaction
+    amounts per category or merchant, see crud.anomalies
+    """
+    __tablename__ = "amount_stats"
+
+    kind = Column(String, primary_key=True)  # 'category' or 'merchant'
+    key = Column(String, primary_key=True)  # Category, or normalized description
+    type = Column(String, primary_key=True)  # 'expense' or 'income'
+    count = Column(Integer, nullable=False, default=0)
+    mean = Column(Float, nullable=False, default=0)
+    m2 = Column(Float, nullable=False, default=0)
@@ -0,0 +1,27 @@
+from sqlalchemy import Column, Integer, String, Float, Date, DateTime, Boolean, Index
+from sqlalchemy.sql import func
+from .base import Base
+
+class Anomaly(Base):
+    """A transaction flagged as unusual when it was written, see crud.anomalies"""
+    __tablename__ = "anomalies"
+
+    id = Column(Integer, primary_key=True, index=True)
+    transaction_id = Column(Integer, nullable=False)
+    reason = Column(String, nullable=False)  # 'category', 'merchant' or 'duplicate'
+    key = Column(String, nullable=False)  # The category, merchant or fingerprint compared against
+    date = Column(Date, nullable=False)
+    description = Column(String, nullable=False)
+    category = Column(String, nullable=False)
+    type = Column(String, nullable=False)
+    amount = Column(Float, nullable=False)
+    expected = Column(Float, nullable=True)  # Mean of the other amounts
+    std = Column(Float, nullable=True)
+    z_score = Column(Float, nullable=True)
+    is_dismissed = Column(Boolean, default=False, nullable=False)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+    __table_args__ = (
+        Index("ux_anomalies_transaction_reason", "transaction_id", "reason", unique=True),
+        Index("ix_anomalies_date", "date"),
+    )
@@ -0,0 +1,12 @@
+from sqlalchemy import Column, Integer
+from .base import Base
+
+class DataVersion(Base):
+    """
+    Single row (id 1) counting committed data changes. Bumped in the same
+    database transaction as every write, so it identifies a data state.
+    """
+    __tablename__ = "data_version"
+
+    id = Column(Integer, primary_key=True)
+    version = Column(Integer, nullable=False, default=0)
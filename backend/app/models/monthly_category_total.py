@@ -0,0 +1,13 @@
+from sqlalchemy import Column, Integer, String, Float
+from .base import Base
+
+class MonthlyCategoryTotal(Base):
+    """Per (year, month, category, type) rollup of the transactions table"""
+    __tablename__ = "monthly_category_totals"
+
+    year = Column(Integer, primary_key=True)
+    month = Column(Integer, primary_key=True)
+    category = Column(String, primary_key=True)
+    type = Column(String, primary_key=True)  # 'expense' or 'income'
+    total = Column(Float, nullable=False, default=0)
+    count = Column(Integer, nullable=False, default=0)
@@ -0,0 +1,32 @@
+from sqlalchemy import Column, Integer, String, Float, Date, DateTime, Boolean, Index
+from sqlalchemy.sql import func
+from .base import Base
+
+class RecurringSchedule(Base):
+    """
+    A recurring transaction. Its occurrences are materialized as ordinary
+    transactions carrying (schedule_id, occurrence_date), see crud.recurring.
+    """
+    __tablename__ = "recurring_schedules"
+
+    id = Column(Integer, primary_key=True, index=True)
+    description = Column(String, nullable=False)
+    amount = Column(Float, nullable=False)
+    category = Column(String, nullable=False)
+    type = Column(String, nullable=False)  # 'expense' or 'income'
+    frequency = Column(String, nullable=False)  # monthly, quarterly, yearly
+    start_date = Column(Date, nullable=False)  # First occurrence; fixes the day of month
+    end_date = Column(Date, nullable=True)
+    is_active = Column(Boolean, default=True, nullable=False)
+    # The fixed transaction the schedule was started from (its first
+    # occurrence); deleting or un-fixing it ends the schedule
+    transaction_id = Column(Integer, nullable=True)
+    # Every occurrence up to this date has been materialized
+    materialized_through = Column(Date, nullable=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), onupdate=func.now())
+
+    __table_args__ = (
+        # The scheduler only looks at active schedules behind the target date
+        Index("ix_recurring_schedules_active_materialized", "is_active", "materialized_through"),
+    )
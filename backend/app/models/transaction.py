@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Float, Date, DateTime, Boolean
+from sqlalchemy import Column, Integer, String, Float, Date, DateTime, Boolean, Index
 from sqlalchemy.sql import func
 from .base import Base
 
@@ -14,4 +14,26 @@ class Transaction(Base):
     is_fixed = Column(Boolean, default=False, nullable=False)  # Add this line
     frequency = Column(String, nullable=True)  # Add this line
     created_at = Column(DateTime(timezone=True), server_default=func.now())
-    updated_at = Column(DateTime(timezone=True), onupdate=func.now())
\ No newline at end of file
+    updated_at = Column(DateTime(timezone=True), onupdate=func.now())
+    # Hash of (date, normalized description, amount, type), see crud.dedup
+    fingerprint = Column(String(40), nullable=True)
+    # Set on occurrences materialized from a recurring schedule
+    schedule_id = Column(Integer, nullable=True)
+    occurrence_date = Column(Date, nullable=True)
+
+    # Covering index for the partial-month statistics query, which filters on
+    # a date range and aggregates amount per category / type (whole months
+    # are read from monthly_category_totals).
+    __table_args__ = (
+        Index("ix_transactions_date_category_type_amount", "date", "category", "type", "amount"),
+        # Keyset pagination seeks on (sort column, id), one per sortable field
+        Index("ix_transactions_date_id", "date", "id"),
+        Index("ix_transactions_amount_id", "amount", "id"),
+        Index("ix_transactions_description_id", "description", "id"),
+        Index("ix_transactions_category_id", "category", "id"),
+        Index("ix_transactions_type_id", "type", "id"),
+        # Duplicate detection on import looks up a batch of fingerprints
+        Index("ix_transactions_fingerprint", "fingerprint"),
+        # One transaction per schedule occurrence, however often it runs
+        Index("ux_transactions_schedule_occurrence", "schedule_id", "occurrence_date", unique=True),
+    )
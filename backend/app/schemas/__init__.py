@@ -1,2 +1,10 @@
-from .transaction import Transaction, TransactionCreate, TransactionUpdate
-from .bill import Bill, BillCreate, BillUpdate
\ No newline at end of file
+from .transaction import (
+    Transaction,
+    TransactionCreate,
+    TransactionUpdate,
+    TransactionBulkUpdate,
+    TransactionBulkDelete
+)
+from .bill import Bill, BillCreate, BillUpdate
+from .recurring_schedule import RecurringSchedule, RecurringScheduleCreate
+from .anomaly import Anomaly
\ No newline at end of file
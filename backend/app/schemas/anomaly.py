@@ -0,0 +1,22 @@
+from pydantic import BaseModel
+from datetime import date, datetime
+from typing import Optional
+
+class Anomaly(BaseModel):
+    id: int
+    transaction_id: int
+    reason: str
+    key: str
+    date: date
+    description: str
+    category: str
+    type: str
+    amount: float
+    expected: Optional[float] = None
+    std: Optional[float] = None
+    z_score: Optional[float] = None
+    is_dismissed: bool
+    created_at: Optional[datetime] = None
+
+    class Config:
+        from_attributes = True
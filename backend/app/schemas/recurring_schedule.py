@@ -0,0 +1,41 @@
+from pydantic import BaseModel, Field, validator
+from datetime import date, datetime
+from typing import Optional
+
+class RecurringScheduleBase(BaseModel):
+    description: str = Field(min_length=1)
+    amount: float = Field(gt=0)
+    category: str = Field(min_length=1)
+    type: str = Field(pattern="^(expense|income)$")
+    frequency: str = Field(pattern="^(monthly|quarterly|yearly)$")
+    start_date: date
+    end_date: Optional[date] = None
+
+    @validator("amount", pre=True)
+    def validate_amount(cls, v):
+        if v is not None:
+            return round(float(v), 2)
+        return v
+
+    @validator("end_date")
+    def validate_end_date(cls, v, values):
+        if v is not None and "start_date" in values and v < values["start_date"]:
+            raise ValueError("end_date must not be before start_date")
+        return v
+
+    class Config:
+        from_attributes = True
+
+class RecurringScheduleCreate(RecurringScheduleBase):
+    pass
+
+class RecurringSchedule(RecurringScheduleBase):
+    id: int
+    is_active: bool
+    transaction_id: Optional[int] = None
+    materialized_through: Optional[date] = None
+    created_at: datetime
+    updated_at: Optional[datetime] = None
+
+    class Config:
+        from_attributes = True
@@ -1,7 +1,7 @@
 # app/schemas/transaction.py
 from pydantic import BaseModel, Field, validator
 from datetime import date, datetime
-from typing import Optional
+from typing import List, Optional
 
 class TransactionBase(BaseModel):
     date: date
@@ -36,6 +36,12 @@ class TransactionUpdate(BaseModel):
     class Config:
         from_attributes = True
 
+class TransactionBulkUpdate(TransactionUpdate):
+    id: int
+
+class TransactionBulkDelete(BaseModel):
+    ids: List[int] = Field(min_length=1)
+
 class Transaction(TransactionBase):
     id: int
     created_at: datetime
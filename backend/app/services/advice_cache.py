@@ -0,0 +1,131 @@
+# services/advice_cache.py
+"""
+Persistent cache of financial advisor answers.
+
+Answers are keyed on the normalized question plus a fingerprint of the
+financial context the prompt was built from, so the same question against
+unchanged data is answered from disk instead of by the model. Entries also
+record the change scopes their context depends on (see
+`crud.financial_context_scopes`) and are deleted when one of them changes.
+"""
+import hashlib
+import json
+import re
+import sqlite3
+import time
+from pathlib import Path
+from threading import Lock
+from typing import Dict, Iterable, Optional
+
+_WHITESPACE = re.compile(r'\s+')
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS advice_cache (
+    key TEXT PRIMARY KEY,
+    question TEXT NOT NULL,
+    fingerprint TEXT NOT NULL,
+    scopes TEXT NOT NULL,
+    response TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    last_used REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS ix_advice_cache_last_used ON advice_cache (last_used);
+"""
+
+def normalize_question(question: str) -> str:
+    """Case, whitespace and trailing punctuation don't change the answer"""
+    return _WHITESPACE.sub(' ', question.lower()).strip().rstrip('?!. ')
+
+def context_fingerprint(context: Dict) -> str:
+    return hashlib.sha256(
+        json.dumps(context, sort_keys=True, default=str).encode()
+    ).hexdigest()
+
+class AdviceCache:
+    """
+    SQLite-backed LRU of advisor responses with a time-to-live.
+
+    `maxsize` bounds the number of entries (least recently used are evicted
+    first) and entries older than `ttl` seconds are treated as misses.
+    """
+
+    def __init__(self, path: str = "./data/advice_cache.db", maxsize: int = 1000, ttl: float = 86400):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        if path != ":memory:":
+            Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.executescript(SCHEMA)
+        self._lock = Lock()
+
+    @staticmethod
+    def key(question: str, context: Dict) -> str:
+        fingerprint = context_fingerprint(context)
+        return hashlib.sha256(f"{normalize_question(question)}\n{fingerprint}".encode()).hexdigest()
+
+    def get(self, question: str, context: Dict) -> Optional[str]:
+        key = self.key(question, context)
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT response, created_at FROM advice_cache WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None or now - row[1] > self.ttl:
+                if row is not None:
+                    self._conn.execute("DELETE FROM advice_cache WHERE key = ?", (key,))
+                    self.evictions += 1
+                self.misses += 1
+                return None
+            self._conn.execute("UPDATE advice_cache SET last_used = ? WHERE key = ?", (now, key))
+            self.hits += 1
+            return row[0]
+
+    def put(self, question: str, context: Dict, response: str, scopes: Iterable[str] = ()):
+        now = time.time()
+        # Delimited so invalidate() can match whole scope names
+        scope_list = ''.join(f"|{scope}|" for scope in scopes)
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO advice_cache VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (
+                    self.key(question, context), normalize_question(question),
+                    context_fingerprint(context), scope_list, response, now, now
+                )
+            )
+            evicted = self._conn.execute(
+                "DELETE FROM advice_cache WHERE key IN ("
+                "SELECT key FROM advice_cache ORDER BY last_used DESC LIMIT -1 OFFSET ?)",
+                (self.maxsize,)
+            ).rowcount
+            self.evictions += evicted
+
+    def invalidate(self, scopes: Iterable[str]):
+        """Drop the entries whose context depends on any of the changed scopes"""
+        with self._lock:
+            for scope in scopes:
+                self.invalidations += self._conn.execute(
+                    "DELETE FROM advice_cache WHERE instr(scopes, ?) > 0", (f"|{scope}|",)
+                ).rowcount
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM advice_cache")
+
+    def stats(self) -> Dict:
+        with self._lock:
+            size = self._conn.execute("SELECT count(*) FROM advice_cache").fetchone()[0]
+        lookups = self.hits + self.misses
+        return {
+            "size": size,
+            "maxsize": self.maxsize,
+            "ttl": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations
+        }
@@ -0,0 +1,201 @@
+# services/exporter.py
+"""
+Streaming CSV and Parquet export.
+
+Rows are read with `yield_per` in batches of `batch_size` and each batch is
+written out as one CSV chunk (optionally gzip-compressed) or one Parquet row
+group, so memory use does not depend on the size of the export and the
+first bytes are sent immediately.
+"""
+import csv
+import zlib
+from datetime import date
+from io import StringIO
+from typing import Callable, Iterable, Iterator, Optional, Sequence
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from ..models.bill import Bill
+from ..models.transaction import Transaction
+
+DEFAULT_BATCH_SIZE = 1000
+PARQUET_BATCH_SIZE = 50000  # Rows per Parquet row group
+
+TRANSACTION_COLUMNS = ['date', 'description', 'amount', 'category', 'type', 'is_fixed']
+BILL_COLUMNS = ['name', 'amount', 'due_date', 'category', 'is_recurring', 'frequency']
+
+TRANSACTION_SCHEMA = pa.schema([
+    ('date', pa.date32()),
+    ('description', pa.string()),
+    ('amount', pa.float64()),
+    ('category', pa.string()),
+    ('type', pa.string()),
+    ('is_fixed', pa.bool_()),
+])
+BILL_SCHEMA = pa.schema([
+    ('name', pa.string()),
+    ('amount', pa.float64()),
+    ('due_date', pa.date32()),
+    ('category', pa.string()),
+    ('is_recurring', pa.bool_()),
+    ('frequency', pa.string()),
+])
+
+
+def transactions_statement(
+    start_date: Optional[date] = None,
+    end_date: Optional[date] = None,
+    category: Optional[str] = None,
+    transaction_type: Optional[str] = None
+):
+    statement = select(*(getattr(Transaction, column) for column in TRANSACTION_COLUMNS))
+    if start_date:
+        statement = statement.where(Transaction.date >= start_date)
+    if end_date:
+        statement = statement.where(Transaction.date <= end_date)
+    if category:
+        statement = statement.where(Transaction.category == category)
+    if transaction_type:
+        statement = statement.where(Transaction.type == transaction_type)
+    return statement.order_by(Transaction.id)
+
+
+def bills_statement(
+    start_date: Optional[date] = None,
+    end_date: Optional[date] = None,
+    category: Optional[str] = None
+):
+    statement = select(*(getattr(Bill, column) for column in BILL_COLUMNS))
+    if start_date:
+        statement = statement.where(Bill.due_date >= start_date)
+    if end_date:
+        statement = statement.where(Bill.due_date <= end_date)
+    if category:
+        statement = statement.where(Bill.category == category)
+    return statement.order_by(Bill.id)
+
+
+def iter_batches(
+    session_factory: Callable[[], Session],
+    statement,
+    batch_size: int = DEFAULT_BATCH_SIZE
+) -> Iterator[Sequence]:
+    """
+    Yield the statement's rows in batches from a session of our own; the
+    request's session is closed before a streaming response is sent.
+    """
+    db = session_factory()
+    try:
+        result = db.execute(statement.execution_options(yield_per=batch_size))
+        for partition in result.partitions():
+            yield partition
+    finally:
+        db.close()
+
+
+def csv_chunks(columns: Sequence[str], batches: Iterable[Sequence]) -> Iterator[str]:
+    """The header, then one chunk of CSV text per batch of rows"""
+    buffer = StringIO()
+    writer = csv.writer(buffer)
+
+    def flush() -> str:
+        chunk = buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+        return chunk
+
+    writer.writerow(columns)
+    yield flush()
+    for batch in batches:
+        writer.writerows(batch)
+        yield flush()
+
+
+def accepts_gzip(accept_encoding: Optional[str]) -> bool:
+    """
+    Whether an Accept-Encoding header allows gzip: listed (or covered by
+    "*") with a non-zero q-value, so "gzip;q=0" is a refusal.
+    """
+    qualities = {}
+    for coding in (accept_encoding or '').split(','):
+        name, *params = (part.strip() for part in coding.split(';'))
+        quality = 1.0
+        for param in params:
+            key, _, value = param.partition('=')
+            if key.strip().lower() == 'q':
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        if name:
+            qualities[name.lower()] = quality
+    for name in ('gzip', 'x-gzip', '*'):
+        if name in qualities:
+            return qualities[name] > 0
+    return False
+
+
+def gzip_chunks(chunks: Iterable[str], level: int = 6) -> Iterator[bytes]:
+    """
+    Gzip a stream of text chunks. Every chunk is sync-flushed so the client
+    receives data as each batch is written instead of when the export ends.
+    """
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31)  # wbits=31: gzip container
+    for chunk in chunks:
+        yield compressor.compress(chunk.encode('utf-8')) + compressor.flush(zlib.Z_SYNC_FLUSH)
+    yield compressor.flush()
+
+
+class _ChunkSink:
+    """Write-only file object that collects bytes until they are drained"""
+
+    def __init__(self):
+        self.chunks = []
+        self.position = 0
+        self.closed = False
+
+    def write(self, data) -> int:
+        self.chunks.append(bytes(data))
+        self.position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self.position
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def drain(self) -> bytes:
+        data = b''.join(self.chunks)
+        self.chunks.clear()
+        return data
+
+
+def record_batch(schema: pa.Schema, rows: Sequence) -> pa.RecordBatch:
+    columns = list(zip(*rows)) if rows else [[] for _ in schema]
+    return pa.RecordBatch.from_arrays(
+        [pa.array(column, type=field.type) for column, field in zip(columns, schema)],
+        schema=schema
+    )
+
+
+def parquet_chunks(
+    schema: pa.Schema,
+    batches: Iterable[Sequence],
+    compression: str = 'zstd'
+) -> Iterator[bytes]:
+    """A Parquet file as bytes chunks: one row group per batch, then the footer"""
+    sink = _ChunkSink()
+    with pq.ParquetWriter(sink, schema, compression=compression) as writer:
+        for batch in batches:
+            writer.write_batch(record_batch(schema, batch))
+            chunk = sink.drain()
+            if chunk:
+                yield chunk
+    yield sink.drain()
@@ -0,0 +1,299 @@
+# services/importer.py
+"""
+Streaming transaction import from CSV or Parquet.
+
+Uploads are parsed in chunks of `batch_size` rows. Each chunk is validated
+and converted column-wise with pandas, inserted with a single executemany
+and committed on its own, so memory stays bounded by the batch size rather
+than the file size.
+"""
+import logging
+from typing import BinaryIO, Callable, Dict, Iterable, Iterator, List, Optional
+
+import pandas as pd
+import pyarrow.parquet as pq
+from sqlalchemy import insert
+from sqlalchemy.orm import Session
+
+from .. import crud
+from ..models.transaction import Transaction
+
+logger = logging.getLogger(__name__)
+
+REQUIRED_COLUMNS = {'date', 'description', 'amount', 'type'}
+TRANSACTION_TYPES = {'expense', 'income'}
+TRUE_VALUES = {'true', '1', 'yes', 'y'}
+DEFAULT_BATCH_SIZE = 5000
+SAMPLE_RESULTS = 10  # Categorization results echoed back for verification
+SAMPLE_ROWS = 100  # Failed / duplicate rows echoed back; the rest are only counted
+
+# Categorizes whole columns: (descriptions, is_fixed, types) -> categories
+Categorizer = Callable[[List[str], List[bool], List[str]], List[str]]
+
+
+class InvalidImportFile(ValueError):
+    pass
+
+
+class ImportReport:
+    """Running summary of an import, independent of the number of rows"""
+
+    def __init__(self, use_ai_categories: bool):
+        self.use_ai_categories = use_ai_categories
+        self.imported = 0
+        self.total = 0
+        self.different_categories = 0
+        self.results: List[dict] = []
+        self.categories_summary: Dict[str, Dict[str, int]] = {'manual': {}, 'ai': {}, 'used': {}}
+        self.failed = 0
+        self.failed_rows: List[dict] = []  # The first SAMPLE_ROWS failures
+        self.duplicates = 0
+        self.duplicate_rows: List[dict] = []  # The first SAMPLE_ROWS duplicates
+
+    def add_failure(self, row: int, error: str):
+        self.failed += 1
+        if len(self.failed_rows) < SAMPLE_ROWS:
+            self.failed_rows.append({'row': row, 'error': error})
+
+    def _count(self, kind: str, values: pd.Series):
+        summary = self.categories_summary[kind]
+        for category, count in values.value_counts().items():
+            summary[category] = summary.get(category, 0) + int(count)
+
+    def add_categorization(self, batch: pd.DataFrame):
+        self.total += len(batch)
+        self.different_categories += int((batch['manual_category'] != batch['ai_category']).sum())
+        self._count('manual', batch['manual_category'])
+        self._count('ai', batch['ai_category'])
+        self._count('used', batch['category'])
+
+        missing = SAMPLE_RESULTS - len(self.results)
+        if missing > 0:
+            for row in batch.head(missing).itertuples():
+                self.results.append({
+                    'row': int(row.row),
+                    'description': row.description,
+                    'manual_category': row.manual_category,
+                    'ai_category': row.ai_category,
+                    'used_category': row.category
+                })
+
+    def to_response(self) -> dict:
+        response_data = {
+            "status": "success",
+            "imported": self.imported,
+            "message": f"Successfully imported {self.imported} transactions",
+            "categorization": {
+                "total": self.total,
+                "using_ai_categories": self.use_ai_categories,
+                "results": self.results,
+                "categories_summary": self.categories_summary,
+                "different_categories": self.different_categories
+            }
+        }
+
+        if self.failed:
+            response_data["failed_rows"] = sorted(self.failed_rows, key=lambda failed: failed['row'])
+            response_data["failed_rows_truncated"] = self.failed > len(self.failed_rows)
+            response_data["message"] += f" ({self.failed} rows failed)"
+
+        response_data["duplicates"] = self.duplicates
+        if self.duplicates:
+            response_data["duplicate_rows"] = self.duplicate_rows
+            response_data["duplicate_rows_truncated"] = self.duplicates > len(self.duplicate_rows)
+            response_data["message"] += f" ({self.duplicates} duplicates skipped)"
+
+        return response_data
+
+
+def _check_columns(chunk: pd.DataFrame, file_type: str) -> pd.DataFrame:
+    chunk.columns = chunk.columns.str.lower()
+    if not REQUIRED_COLUMNS.issubset(chunk.columns):
+        raise InvalidImportFile(
+            f"{file_type} must contain these columns: {', '.join(REQUIRED_COLUMNS)}"
+        )
+    return chunk
+
+
+def read_csv_chunks(file: BinaryIO, batch_size: int = DEFAULT_BATCH_SIZE) -> Iterator[pd.DataFrame]:
+    """
+    Yield the CSV as DataFrames of at most batch_size rows, all columns as
+    text, indexed by line number (+2 for header row and 1-based indexing)
+    """
+    reader = pd.read_csv(file, chunksize=batch_size, dtype=str, encoding='utf-8')
+    for chunk in reader:
+        chunk.index = chunk.index + 2
+        yield _check_columns(chunk, "CSV")
+
+
+def read_parquet_chunks(file: BinaryIO, batch_size: int = DEFAULT_BATCH_SIZE) -> Iterator[pd.DataFrame]:
+    """
+    Yield a Parquet file as DataFrames of at most batch_size rows, keeping
+    its column types, indexed by 1-based record number
+    """
+    parquet_file = pq.ParquetFile(file)
+    first_row = 1
+    for record_batch in parquet_file.iter_batches(batch_size=batch_size):
+        chunk = record_batch.to_pandas()
+        chunk.index = pd.RangeIndex(first_row, first_row + len(chunk))
+        first_row += len(chunk)
+        yield _check_columns(chunk, "Parquet file")
+
+
+def _fail(report: ImportReport, rows: pd.Series, mask: pd.Series, message: str, values: Optional[pd.Series] = None):
+    for index in mask[mask].index:
+        error = f"{message}: {values[index]!r}" if values is not None else message
+        report.add_failure(int(rows[index]), error)
+
+
+def validate_batch(chunk: pd.DataFrame, report: ImportReport) -> pd.DataFrame:
+    """
+    Validate and convert one chunk column-wise. Invalid rows are recorded in
+    the report; the returned frame holds the insertable rows.
+    """
+    # The readers index chunks by the row number reported back to the user
+    rows = pd.Series(chunk.index, index=chunk.index)
+
+    dates = pd.to_datetime(chunk['date'], errors='coerce')
+    amounts = pd.to_numeric(chunk['amount'], errors='coerce').abs()
+    descriptions = chunk['description'].astype('string').str.strip()
+    types = chunk['type'].astype('string').str.strip().str.lower()
+
+    invalid_date = dates.isna()
+    invalid_amount = ~invalid_date & amounts.isna()
+    invalid_description = ~invalid_date & ~invalid_amount & (descriptions.isna() | (descriptions == ''))
+    invalid_type = ~invalid_date & ~invalid_amount & ~invalid_description & ~types.isin(TRANSACTION_TYPES)
+
+    _fail(report, rows, invalid_date, "Invalid date", chunk['date'])
+    _fail(report, rows, invalid_amount, "Invalid amount", chunk['amount'])
+    _fail(report, rows, invalid_description, "Missing description")
+    _fail(report, rows, invalid_type, "Invalid type", chunk['type'])
+
+    valid = ~(invalid_date | invalid_amount | invalid_description | invalid_type)
+    if 'category' in chunk.columns:
+        manual_categories = chunk['category'].fillna('Other')
+    else:
+        manual_categories = pd.Series('Other', index=chunk.index)
+    if 'is_fixed' in chunk.columns and pd.api.types.is_bool_dtype(chunk['is_fixed']):
+        is_fixed = chunk['is_fixed']
+    elif 'is_fixed' in chunk.columns:
+        is_fixed = chunk['is_fixed'].astype('string').fillna('').str.strip().str.lower().isin(TRUE_VALUES)
+    else:
+        is_fixed = pd.Series(False, index=chunk.index)
+
+    batch = pd.DataFrame({
+        'row': rows[valid],
+        'date': dates[valid].dt.date,
+        'description': descriptions[valid],
+        'amount': amounts[valid],
+        'type': types[valid],
+        'is_fixed': is_fixed[valid],
+        'manual_category': manual_categories[valid],
+    })
+    batch['fingerprint'] = [
+        crud.transaction_fingerprint(*row)
+        for row in zip(batch['date'], batch['description'], batch['amount'], batch['type'])
+    ]
+    return batch
+
+
+def skip_duplicates(db: Session, batch: pd.DataFrame, report: ImportReport) -> pd.DataFrame:
+    """
+    Drop (and count) rows already stored or repeated within the batch, with
+    one indexed lookup per batch
+    """
+    if batch.empty:
+        return batch
+    duplicates = pd.Series(crud.duplicate_mask(db, batch['fingerprint'].tolist()), index=batch.index)
+    report.duplicates += int(duplicates.sum())
+    missing = SAMPLE_ROWS - len(report.duplicate_rows)
+    for row in batch[duplicates].head(max(missing, 0)).itertuples():
+        report.duplicate_rows.append({
+            'row': int(row.row),
+            'date': row.date.isoformat(),
+            'description': row.description,
+            'amount': float(row.amount)
+        })
+    return batch[~duplicates]
+
+
+def categorize_batch(batch: pd.DataFrame, report: ImportReport, categorize: Categorizer) -> pd.DataFrame:
+    batch = batch.copy()
+    batch['ai_category'] = categorize(
+        batch['description'].tolist(),
+        batch['is_fixed'].tolist(),
+        batch['type'].tolist()
+    )
+    batch['category'] = batch['ai_category'] if report.use_ai_categories else batch['manual_category']
+    return batch
+
+
+def write_batch(db: Session, batch: pd.DataFrame) -> int:
+    """Insert one prepared batch with executemany and commit it"""
+    if batch.empty:
+        return 0
+    records = batch[['date', 'description', 'amount', 'category', 'type', 'is_fixed', 'fingerprint']].to_dict('records')
+    try:
+        ids = db.execute(
+            insert(Transaction).returning(Transaction.id, sort_by_parameter_order=True),
+            records
+        ).scalars().all()
+        for record, transaction_id in zip(records, ids):
+            record['id'] = transaction_id
+        crud.record_transaction_changes(db, added=records)
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    return len(records)
+
+
+def import_chunks(
+    db: Session,
+    chunks: Iterable[pd.DataFrame],
+    categorize: Categorizer,
+    use_ai_categories: bool = False,
+    skip_existing: bool = True
+) -> ImportReport:
+    """
+    Validate, deduplicate, categorize and insert parsed chunks, one commit
+    per chunk. With skip_existing, rows whose fingerprint is already stored
+    are reported as duplicates instead of inserted.
+    """
+    report = ImportReport(use_ai_categories)
+    for chunk in chunks:
+        batch = validate_batch(chunk, report)
+        if skip_existing:
+            batch = skip_duplicates(db, batch, report)
+        batch = categorize_batch(batch, report, categorize)
+        report.add_categorization(batch)
+        report.imported += write_batch(db, batch)
+    logger.info(
+        f"Imported {report.imported} transactions ({report.failed} rows failed, "
+        f"{report.duplicates} duplicates skipped)"
+    )
+    return report
+
+
+def import_csv(
+    db: Session,
+    file: BinaryIO,
+    categorize: Categorizer,
+    use_ai_categories: bool = False,
+    batch_size: int = DEFAULT_BATCH_SIZE,
+    skip_existing: bool = True
+) -> ImportReport:
+    """Stream a CSV upload into the transactions table, one commit per batch"""
+    return import_chunks(db, read_csv_chunks(file, batch_size), categorize, use_ai_categories, skip_existing)
+
+
+def import_parquet(
+    db: Session,
+    file: BinaryIO,
+    categorize: Categorizer,
+    use_ai_categories: bool = False,
+    batch_size: int = DEFAULT_BATCH_SIZE,
+    skip_existing: bool = True
+) -> ImportReport:
+    """Stream a Parquet upload into the transactions table, one commit per record batch"""
+    return import_chunks(db, read_parquet_chunks(file, batch_size), categorize, use_ai_categories, skip_existing)
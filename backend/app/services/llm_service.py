@@ -1,9 +1,20 @@
 # services/llm_service.py
 from langchain_ollama import OllamaLLM
-from typing import List, Dict, Optional, Union
+from collections import OrderedDict
+from typing import AsyncIterator, Iterable, List, Dict, Optional, Sequence, Tuple, Union
+import asyncio
+from pathlib import Path
+from threading import Lock
+import hashlib
 import json
+import os
 import re
 from datetime import datetime
+import numpy as np
+import pandas as pd
+from ..crud.dedup import normalize_description
+from .advice_cache import AdviceCache
+from .stub_llm import StubLLM
 
 class BaseAgent:
     def __init__(self, name: str, llm=None):
@@ -17,6 +28,15 @@ class BaseAgent:
     def process(self, task: Dict) -> Dict:
         raise NotImplementedError("Each agent must implement process method")
 
+    async def aprocess(self, task: Dict) -> Dict:
+        """Async entry point; by default runs `process` in a worker thread"""
+        return await asyncio.to_thread(self.process, task)
+
+    async def astream(self, task: Dict) -> AsyncIterator[str]:
+        """Yield the response in chunks as it is generated"""
+        raise NotImplementedError(f"{self.name} does not support streaming")
+        yield  # pragma: no cover
+
 class DelegatorAgent(BaseAgent):
     def __init__(self, llm=None):
         super().__init__("Delegator Agent", llm)
@@ -33,19 +53,26 @@ class DelegatorAgent(BaseAgent):
     def register_agent(self, agent: BaseAgent):
         self.agents[agent.__class__.__name__] = agent
 
+    def resolve(self, task: Dict) -> Union[BaseAgent, Dict]:
+        """The agent for a task, or an error dict when there is none"""
+        task_type = task.get("type", "unknown")
+        agent_name = self.task_mapping.get(task_type)
+        
+        if not agent_name:
+            return {"error": f"Unknown task type: {task_type}"}
+            
+        agent = self.agents.get(agent_name)
+        if not agent:
+            return {"error": f"No agent available for task: {task_type}"}
+            
+        print(f"Delegating {task_type} task to {agent_name}")
+        return agent
+
     def process(self, task: Dict) -> Dict:
         try:
-            task_type = task.get("type", "unknown")
-            agent_name = self.task_mapping.get(task_type)
-            
-            if not agent_name:
-                return {"error": f"Unknown task type: {task_type}"}
-                
-            agent = self.agents.get(agent_name)
-            if not agent:
-                return {"error": f"No agent available for task: {task_type}"}
-                
-            print(f"Delegating {task_type} task to {agent_name}")
+            agent = self.resolve(task)
+            if isinstance(agent, dict):
+                return agent
             return agent.process(task)
             
         except Exception as e:
@@ -54,9 +81,125 @@ class DelegatorAgent(BaseAgent):
                 "task_type": task.get("type", "unknown")
             })
 
+    async def aprocess(self, task: Dict) -> Dict:
+        try:
+            agent = self.resolve(task)
+            if isinstance(agent, dict):
+                return agent
+            return await agent.aprocess(task)
+            
+        except Exception as e:
+            return self.handle_error(e, {
+                "error": f"Delegation failed: {str(e)}",
+                "task_type": task.get("type", "unknown")
+            })
+
+    async def astream(self, task: Dict) -> AsyncIterator[str]:
+        agent = self.resolve(task)
+        if isinstance(agent, dict):
+            raise ValueError(agent["error"])
+        async for chunk in agent.astream(task):
+            yield chunk
+
+CacheKey = Tuple[str, bool, str]
+
+class CategorizationCache:
+    """
+    Bounded LRU of categorization results keyed on
+    (normalized description, is_fixed, type).
+
+    Entries are tagged with the fingerprint of the keyword map they were
+    computed from and dropped when it changes. With a path, the cache can be
+    saved to and restored from a JSON file.
+    """
+
+    def __init__(self, maxsize: int = 50000, path: Optional[str] = None):
+        self.maxsize = maxsize
+        self.path = Path(path) if path else None
+        self.fingerprint: Optional[str] = None
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[CacheKey, str]" = OrderedDict()
+        self._lock = Lock()
+
+    def get(self, key: CacheKey) -> Optional[str]:
+        with self._lock:
+            category = self._entries.get(key)
+            if category is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return category
+
+    def put(self, key: CacheKey, category: str):
+        with self._lock:
+            self._entries[key] = category
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, fingerprint: Optional[str] = None):
+        """Drop every entry; new entries belong to `fingerprint`"""
+        with self._lock:
+            self._entries.clear()
+            self.fingerprint = fingerprint
+
+    def stats(self) -> Dict:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0
+        }
+
+    def save(self):
+        if not self.path:
+            return
+        with self._lock:
+            data = {
+                "fingerprint": self.fingerprint,
+                "entries": [[*key, category] for key, category in self._entries.items()]
+            }
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_suffix(self.path.suffix + ".tmp")
+        tmp_path.write_text(json.dumps(data))
+        tmp_path.replace(self.path)
+
+    def load(self):
+        """Restore saved entries if they were computed from the current keyword map"""
+        if not self.path or not self.path.exists():
+            return
+        try:
+            data = json.loads(self.path.read_text())
+        except (OSError, ValueError) as e:
+            print(f"Ignoring unreadable categorization cache: {str(e)}")
+            return
+        if data.get("fingerprint") != self.fingerprint:
+            return
+        with self._lock:
+            for description, is_fixed, transaction_type, category in data.get("entries", [])[-self.maxsize:]:
+                self._entries[(description, bool(is_fixed), transaction_type)] = category
+
 class CategoryAgent(BaseAgent):
-    def __init__(self, llm=None):
+    def __init__(
+        self,
+        llm=None,
+        cache: Optional[CategorizationCache] = None,
+        llm_cache: Optional[CategorizationCache] = None,
+        llm_batch_size: int = 25,
+        llm_concurrency: int = 4,
+        llm_timeout: float = 60
+    ):
         super().__init__("Category Agent", llm)
+        self.cache = cache or CategorizationCache()
+        # Model answers for rule misses, keyed like `cache`
+        self.llm_cache = llm_cache or CategorizationCache()
+        self.llm_batch_size = llm_batch_size
+        self.llm_concurrency = llm_concurrency
+        self.llm_timeout = llm_timeout
         self.categories = {
             "Fixed Income": [
                 "salary", "wage", "pension", "rental income", "fixed interest", 
@@ -112,20 +255,191 @@ class CategoryAgent(BaseAgent):
             ],
         }
         
+        self.compile_patterns()
+
+    def keywords_fingerprint(self) -> str:
+        return hashlib.sha1(json.dumps(self.categories, sort_keys=True).encode()).hexdigest()
+
+    def compile_patterns(self):
+        """(Re)build the keyword regexes; call after changing self.categories"""
+        fingerprint = self.keywords_fingerprint()
+        if self.cache.fingerprint != fingerprint:
+            self.cache.invalidate(fingerprint)
+        if self.llm_cache.fingerprint != fingerprint:
+            self.llm_cache.invalidate(fingerprint)
+
+        self.category_names = list(self.categories)
         self.category_patterns = {
             category: re.compile('|'.join(rf'\b{keyword}\b' 
                 for keyword in keywords), re.IGNORECASE)
             for category, keywords in self.categories.items()
         }
+        # One pattern for all categories. The zero-width lookahead is tried at
+        # every word boundary and its alternatives are in priority order, so
+        # the smallest group index over all matches is the first category
+        # whose own pattern would match.
+        self.combined_pattern = re.compile(
+            r'\b(?=' + '|'.join(
+                f'(?P<c{index}>{self.category_patterns[category].pattern})'
+                for index, category in enumerate(self.category_names)
+            ) + ')',
+            re.IGNORECASE
+        )
+
+    def match_category(self, description: str) -> str:
+        """Highest priority category whose keywords occur in the description"""
+        best = None
+        for match in self.combined_pattern.finditer(description):
+            index = int(match.lastgroup[1:])
+            if best is None or index < best:
+                best = index
+                if best == 0:
+                    break
+        return self.category_names[best] if best is not None else "Other"
 
     def categorize_by_rules(self, description: str, is_fixed: bool = False, transaction_type: str = 'expense') -> str:
-        if is_fixed:
-            return "Fixed Income" if transaction_type == 'income' else "Fixed Expenses"
-        
-        for category, pattern in self.category_patterns.items():
-            if pattern.search(description):
-                return category
-        return "Other"
+        key = (normalize_description(description), bool(is_fixed), transaction_type)
+        category = self.cache.get(key)
+        if category is None:
+            if is_fixed:
+                category = "Fixed Income" if transaction_type == 'income' else "Fixed Expenses"
+            else:
+                category = self.match_category(key[0])
+            self.cache.put(key, category)
+        return category
+
+    def categorize_many(
+        self,
+        descriptions: Sequence[str],
+        is_fixed: Optional[Sequence[bool]] = None,
+        transaction_types: Optional[Sequence[str]] = None,
+        use_llm: bool = False
+    ) -> List[str]:
+        """
+        Categorize whole columns at once. Each distinct row is looked up only
+        once, and repeated merchants are served from the LRU cache, which is
+        what makes large imports cheap.
+
+        With use_llm, rows no keyword matched are sent to the model in
+        batches (see `categorize_with_llm`); rows it can't place stay "Other".
+        """
+        count = len(descriptions)
+        is_fixed = is_fixed if is_fixed is not None else [False] * count
+        transaction_types = transaction_types if transaction_types is not None else ['expense'] * count
+
+        matched: Dict[Tuple[str, bool, str], str] = {}
+        categories = []
+        for row in zip(descriptions, is_fixed, transaction_types):
+            category = matched.get(row)
+            if category is None:
+                category = matched[row] = self.categorize_by_rules(*row)
+            categories.append(category)
+
+        if use_llm and self.llm:
+            self.fill_rule_misses(matched)
+            categories = [matched[row] for row in zip(descriptions, is_fixed, transaction_types)]
+        return categories
+
+    def fill_rule_misses(self, matched: Dict[Tuple[str, bool, str], str]):
+        """Replace "Other" in a row -> category map with the model's answers"""
+        misses: Dict[Tuple[str, bool, str], CacheKey] = {}
+        pending: Dict[CacheKey, None] = {}  # Ordered set of keys to ask about
+        for row, category in matched.items():
+            description, fixed, transaction_type = row
+            if category != "Other" or fixed:
+                continue
+            key = (normalize_description(description), False, transaction_type)
+            if not key[0]:
+                continue
+            misses[row] = key
+            cached = self.llm_cache.get(key)
+            if cached is not None:
+                matched[row] = cached
+            else:
+                pending[key] = None
+
+        if not pending:
+            return
+        answers = self.categorize_with_llm(list(pending))
+        for key, category in answers.items():
+            self.llm_cache.put(key, category)
+        for row, key in misses.items():
+            if key in answers:
+                matched[row] = answers[key]
+
+    def create_categorize_prompt(self, rows: Sequence[CacheKey]) -> str:
+        items = [
+            {"id": index, "description": description, "type": transaction_type}
+            for index, (description, _, transaction_type) in enumerate(rows)
+        ]
+        return f"""
+        Categorize each bank transaction into exactly one of these categories:
+        {json.dumps(self.category_names + ["Other"])}
+
+        Transactions (JSON):
+{json.dumps(items)}
+
+        Respond with only a JSON object of the form
+        {{"categories": ["<category of id 0>", "<category of id 1>", ...]}}
+        with one entry per transaction, in the same order.
+        """
+
+    def parse_categories(self, response: str, count: int) -> List[Optional[str]]:
+        """
+        Categories from a model response, None where an entry is missing or
+        not one of the known categories.
+        """
+        start, end = response.find('{'), response.rfind('}')
+        if start == -1 or end < start:
+            raise ValueError(f"No JSON object in model response: {response[:200]!r}")
+        values = json.loads(response[start:end + 1]).get("categories", [])
+        if not isinstance(values, list):
+            raise ValueError("Model response 'categories' is not a list")
+
+        known = {name.lower(): name for name in self.category_names + ["Other"]}
+        parsed = [known.get(str(value).strip().lower()) for value in values[:count]]
+        return parsed + [None] * (count - len(parsed))
+
+    async def acategorize_with_llm(self, rows: Sequence[CacheKey]) -> Dict[CacheKey, str]:
+        """
+        Ask the model for the categories of (normalized description, is_fixed,
+        type) rows, `llm_batch_size` rows per prompt, at most
+        `llm_concurrency` prompts in flight and `llm_timeout` seconds each.
+        Rows of failed or timed out calls are left out of the result.
+        """
+        semaphore = asyncio.Semaphore(self.llm_concurrency)
+
+        async def run(batch: Sequence[CacheKey]) -> Dict[CacheKey, str]:
+            async with semaphore:
+                try:
+                    response = await asyncio.wait_for(
+                        self.llm.ainvoke(self.create_categorize_prompt(batch)),
+                        timeout=self.llm_timeout
+                    )
+                    categories = self.parse_categories(response, len(batch))
+                except asyncio.TimeoutError:
+                    return self.handle_error(
+                        TimeoutError(f"categorization timed out after {self.llm_timeout}s"), {}
+                    )
+                except Exception as e:
+                    return self.handle_error(e, {})
+            # An answer outside the category set counts as "Other"
+            return {row: category or "Other" for row, category in zip(batch, categories)}
+
+        batches = [
+            rows[start:start + self.llm_batch_size]
+            for start in range(0, len(rows), self.llm_batch_size)
+        ]
+        results: Dict[CacheKey, str] = {}
+        for answers in await asyncio.gather(*(run(batch) for batch in batches)):
+            results.update(answers)
+        return results
+
+    def categorize_with_llm(self, rows: Sequence[CacheKey]) -> Dict[CacheKey, str]:
+        """Blocking `acategorize_with_llm`; call it from sync code, not from an event loop"""
+        if not self.llm or not rows:
+            return {}
+        return asyncio.run(self.acategorize_with_llm(rows))
 
     def process(self, task: Dict) -> Dict:
         try:
@@ -138,37 +452,59 @@ class CategoryAgent(BaseAgent):
                 return {"category": category}
                 
             elif task["type"] == "categorize_batch":
-                results = []
-                for transaction in task["transactions"]:
-                    category = self.categorize_by_rules(
-                        transaction["description"],
-                        transaction.get("is_fixed", False),
-                        transaction.get("type", "expense")
-                    )
-                    results.append({
-                        "description": transaction["description"],
-                        "category": category
-                    })
-                return {"results": results}
+                if "descriptions" in task:
+                    return {"categories": self.categorize_many(
+                        task["descriptions"],
+                        task.get("is_fixed"),
+                        task.get("transaction_types"),
+                        task.get("use_llm", False)
+                    )}
+
+                transactions = task["transactions"]
+                categories = self.categorize_many(
+                    [transaction["description"] for transaction in transactions],
+                    [transaction.get("is_fixed", False) for transaction in transactions],
+                    [transaction.get("type", "expense") for transaction in transactions]
+                )
+                return {"results": [
+                    {"description": transaction["description"], "category": category}
+                    for transaction, category in zip(transactions, categories)
+                ]}
                 
         except Exception as e:
             return self.handle_error(e, {"category": "Other"})
 
 class AnalysisAgent(BaseAgent):
+    """
+    Spending analyses over a columnar frame of transactions (date, description,
+    amount, category, type), e.g. from crud.get_transactions_frame. Every
+    analysis is a pandas group-by, so multi-year ranges don't cost a Python
+    loop per transaction.
+    """
+    ANALYSES = (
+        "general",
+        "spending_patterns",
+        "category_distribution",
+        "month_over_month",
+        "top_merchants",
+        "seasonality",
+    )
+    WEEKDAYS = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday"]
+    MONTHS = ["January", "February", "March", "April", "May", "June", "July",
+              "August", "September", "October", "November", "December"]
+
     def __init__(self, llm=None):
         super().__init__("Analysis Agent", llm)
 
     def process(self, task: Dict) -> Dict:
         try:
-            transactions = task.get("transactions", [])
+            frame = self.as_frame(task.get("frame", task.get("transactions", [])))
             analysis_type = task.get("analysis_type", "general")
-            
-            if analysis_type == "spending_patterns":
-                return self.analyze_spending_patterns(transactions)
-            elif analysis_type == "category_distribution":
-                return self.analyze_category_distribution(transactions)
-            else:
-                return self.general_analysis(transactions)
+            limit = int(task.get("limit", 10))
+
+            if analysis_type == "all":
+                return {name: self.analyze(name, frame, limit) for name in self.ANALYSES}
+            return self.analyze(analysis_type, frame, limit)
                 
         except Exception as e:
             return self.handle_error(e, {
@@ -177,23 +513,292 @@ class AnalysisAgent(BaseAgent):
                 "insights": []
             })
 
-    def analyze_spending_patterns(self, transactions: List[Dict]) -> Dict:
-        try:
-            # Group by category and calculate totals
-            category_totals = {}
-            for t in transactions:
-                category = t.get("category", "Other")
-                amount = float(t.get("amount", 0))
-                category_totals[category] = category_totals.get(category, 0) + amount
-
-            return {
-                "patterns": {
-                    "category_totals": category_totals,
-                    "total_spend": sum(category_totals.values())
-                }
+    def analyze(self, analysis_type: str, frame: pd.DataFrame, limit: int = 10) -> Dict:
+        if analysis_type == "spending_patterns":
+            return self.analyze_spending_patterns(frame)
+        elif analysis_type == "category_distribution":
+            return self.analyze_category_distribution(frame)
+        elif analysis_type == "month_over_month":
+            return self.month_over_month(frame)
+        elif analysis_type == "top_merchants":
+            return self.top_merchants(frame, limit)
+        elif analysis_type == "seasonality":
+            return self.seasonality(frame)
+        else:
+            return self.general_analysis(frame)
+
+    @staticmethod
+    def as_frame(transactions) -> pd.DataFrame:
+        """The transactions as a frame with typed columns; accepts a list of dicts"""
+        frame = transactions if isinstance(transactions, pd.DataFrame) else pd.DataFrame.from_records(transactions)
+        frame = frame.reindex(columns=["date", "description", "amount", "category", "type"])
+        return frame.assign(
+            date=pd.to_datetime(frame["date"]),
+            description=frame["description"].fillna("").astype(str),
+            amount=pd.to_numeric(frame["amount"], errors="coerce").fillna(0.0).astype("float64"),
+            category=frame["category"].fillna("Other").astype(str),
+            type=frame["type"].fillna("expense").astype(str),
+        )
+
+    @staticmethod
+    def expenses(frame: pd.DataFrame) -> pd.DataFrame:
+        return frame[frame["type"] == "expense"]
+
+    def general_analysis(self, frame: pd.DataFrame) -> Dict:
+        totals = frame.groupby("type")["amount"].sum()
+        income = float(totals.get("income", 0.0))
+        expenses = float(totals.get("expense", 0.0))
+        # Calendar months spanned, including months without transactions
+        if len(frame):
+            first, last = frame["date"].min(), frame["date"].max()
+            months = (last.year - first.year) * 12 + last.month - first.month + 1
+        else:
+            months = 0
+        spending = self.expenses(frame)
+        largest = spending.loc[spending["amount"].idxmax()] if len(spending) else None
+        return {
+            "transaction_count": int(len(frame)),
+            "first_date": frame["date"].min().date().isoformat() if len(frame) else None,
+            "last_date": frame["date"].max().date().isoformat() if len(frame) else None,
+            "months": int(months),
+            "total_income": round(income, 2),
+            "total_expenses": round(expenses, 2),
+            "net": round(income - expenses, 2),
+            "saving_rate": round((income - expenses) / income * 100, 2) if income > 0 else 0,
+            "average_monthly_income": round(income / months, 2) if months else 0,
+            "average_monthly_expenses": round(expenses / months, 2) if months else 0,
+            "average_expense": round(float(spending["amount"].mean()), 2) if len(spending) else 0,
+            "largest_expense": {
+                "date": largest["date"].date().isoformat(),
+                "description": largest["description"],
+                "category": largest["category"],
+                "amount": round(float(largest["amount"]), 2),
+            } if largest is not None else None,
+        }
+
+    def analyze_spending_patterns(self, frame: pd.DataFrame) -> Dict:
+        category_totals = self.expenses(frame).groupby("category")["amount"].sum().round(2)
+        return {
+            "patterns": {
+                "category_totals": category_totals.to_dict(),
+                "total_spend": round(float(category_totals.sum()), 2)
             }
+        }
+
+    def analyze_category_distribution(self, frame: pd.DataFrame) -> Dict:
+        """Total, count, mean, median and share of the type's total per category"""
+        grouped = frame.groupby(["type", "category"])["amount"].agg(["sum", "count", "mean", "median"])
+        grouped["share"] = grouped["sum"] / grouped.groupby(level="type")["sum"].transform("sum") * 100
+        grouped = grouped.sort_values("sum", ascending=False).round(2)
+
+        distribution = {"income": [], "expense": []}
+        for (type_, category), row in zip(grouped.index, grouped.itertuples(index=False)):
+            distribution.setdefault(type_, []).append({
+                "category": category,
+                "total": row.sum,
+                "count": int(row.count),
+                "average": row.mean,
+                "median": row.median,
+                "share": row.share,
+            })
+        return {"distribution": distribution}
+
+    def month_over_month(self, frame: pd.DataFrame) -> Dict:
+        """Monthly spending per category with the change from the previous month"""
+        spending = self.expenses(frame)
+        if spending.empty:
+            return {"months": [], "categories": {}}
+        monthly = spending.groupby(
+            [spending["date"].dt.to_period("M"), "category"]
+        )["amount"].sum().unstack(fill_value=0.0)
+        monthly = monthly.reindex(
+            pd.period_range(monthly.index.min(), monthly.index.max(), freq="M"), fill_value=0.0
+        )
+        change = monthly.diff()
+        change_pct = (change / monthly.shift()).replace([np.inf, -np.inf], np.nan) * 100
+
+        months = [str(period) for period in monthly.index]
+        totals, changes, percents = (
+            table.round(2).astype(object).where(table.notna(), None)
+            for table in (monthly, change, change_pct)
+        )
+        return {
+            "months": months,
+            "categories": {
+                category: [
+                    {"month": month, "total": total, "change": delta, "change_pct": pct}
+                    for month, total, delta, pct in zip(
+                        months, totals[category], changes[category], percents[category]
+                    )
+                ]
+                for category in monthly.columns
+            }
+        }
+
+    def top_merchants(self, frame: pd.DataFrame, limit: int = 10) -> Dict:
+        """
+        Largest total spend per merchant; descriptions are grouped by their
+        normalized text (reference numbers and digits removed), which is
+        computed once per distinct description.
+        """
+        spending = self.expenses(frame)
+        codes, uniques = pd.factorize(spending["description"])
+        merchants = pd.Series([normalize_description(description) or description for description in uniques])
+        spending = spending.assign(merchant=merchants.to_numpy()[codes])
+        grouped = spending.groupby("merchant").agg(
+            total=("amount", "sum"),
+            count=("amount", "size"),
+            last_date=("date", "max"),
+        ).nlargest(limit, "total")
+        # Each merchant's most frequent category
+        categories = spending.groupby(["merchant", "category"]).size().sort_values(
+            ascending=False, kind="stable"
+        ).reset_index().drop_duplicates("merchant").set_index("merchant")["category"]
+        grouped["category"] = categories.reindex(grouped.index)
+        return {
+            "merchants": [
+                {
+                    "merchant": merchant,
+                    "total": round(float(row.total), 2),
+                    "count": int(row.count),
+                    "average": round(float(row.total / row.count), 2),
+                    "category": row.category,
+                    "last_date": row.last_date.date().isoformat(),
+                }
+                for merchant, row in zip(grouped.index, grouped.itertuples(index=False))
+            ]
+        }
+
+    def seasonality(self, frame: pd.DataFrame) -> Dict:
+        """
+        Spending by weekday, day of month and calendar month. Transactions
+        have no time of day, so days are the finest grain. Averages are per
+        calendar day of that kind in the analyzed range, days without
+        spending included.
+        """
+        spending = self.expenses(frame)
+        if spending.empty:
+            return {"weekday": [], "day_of_month": [], "month": []}
+        days = pd.Series(pd.date_range(spending["date"].min(), spending["date"].max(), freq="D"))
+
+        def profile(keys: pd.Series, day_keys: pd.Series, labels) -> List[Dict]:
+            totals = spending["amount"].groupby(keys).agg(["sum", "count"])
+            occurrences = day_keys.value_counts()
+            return [
+                {
+                    "label": label,
+                    "total": round(float(totals["sum"].get(key, 0.0)), 2),
+                    "count": int(totals["count"].get(key, 0)),
+                    "average_per_day": round(float(totals["sum"].get(key, 0.0)) / int(occurrences[key]), 2)
+                    if occurrences.get(key) else 0,
+                }
+                for key, label in labels
+            ]
+
+        return {
+            "weekday": profile(
+                spending["date"].dt.dayofweek, days.dt.dayofweek, enumerate(self.WEEKDAYS)
+            ),
+            "day_of_month": profile(
+                spending["date"].dt.day, days.dt.day, ((day, day) for day in range(1, 32))
+            ),
+            "month": profile(
+                spending["date"].dt.month, days.dt.month, enumerate(self.MONTHS, start=1)
+            ),
+        }
+
+class PredictionAgent(BaseAgent):
+    """
+    Cash-flow forecasts from monthly aggregates, computed with NumPy rather
+    than by the LLM.
+
+    Every (category, type) series is deseasonalized with its average
+    deviation per calendar month (given two years of history) and smoothed
+    with damped-trend exponential smoothing (Holt); the forecast is the
+    damped trend continued from the last level plus the seasonal deviation.
+    All series are updated together, one vector operation per month.
+    """
+    def __init__(self, llm=None, alpha: float = 0.3, beta: float = 0.1, phi: float = 0.9):
+        super().__init__("Prediction Agent", llm)
+        self.alpha = alpha  # Level smoothing
+        self.beta = beta  # Trend smoothing
+        self.phi = phi  # Trend damping per month
+
+    def process(self, task: Dict) -> Dict:
+        try:
+            history = task["history"]
+            months = int(task.get("months", 12))
+            forecast = self.forecast(history["values"], history["first_month"], months)
+            return self.summarize(history, forecast, months)
         except Exception as e:
-            return self.handle_error(e, {"patterns": {}})
+            return self.handle_error(e, {"error": f"Forecast failed: {str(e)}", "forecast": []})
+
+    def seasonal_deviations(self, values: np.ndarray, first_month: int) -> np.ndarray:
+        """(12, series) mean deviation from the series mean per calendar month"""
+        seasonal = np.zeros((12, values.shape[1]))
+        whole_years = values.shape[0] // 12 * 12
+        if whole_years < 24:
+            return seasonal
+        # The last whole years, so every calendar month is weighted equally
+        recent = values[-whole_years:]
+        calendar_months = (first_month + values.shape[0] - whole_years + np.arange(whole_years)) % 12
+        np.add.at(seasonal, calendar_months, recent)
+        seasonal /= whole_years // 12
+        return seasonal - recent.mean(axis=0)
+
+    def forecast(self, values: np.ndarray, first_month: int, months: int) -> np.ndarray:
+        """(months, series) forecast for the months after the history"""
+        count, series = values.shape
+        if count == 0:
+            return np.zeros((months, series))
+
+        seasonal = self.seasonal_deviations(values, first_month)
+        calendar_months = (first_month + np.arange(count)) % 12
+        adjusted = values - seasonal[calendar_months]
+
+        level = adjusted[0].copy()
+        trend = adjusted[1] - adjusted[0] if count > 1 else np.zeros(series)
+        for observed in adjusted[1:]:
+            previous = level
+            level = self.alpha * observed + (1 - self.alpha) * (previous + self.phi * trend)
+            trend = self.beta * (level - previous) + (1 - self.beta) * self.phi * trend
+
+        # Damped trend: h steps ahead add phi + phi^2 + ... + phi^h trends
+        damping = np.cumsum(self.phi ** np.arange(1, months + 1))
+        future_months = (first_month + count + np.arange(months)) % 12
+        forecast = level + damping[:, None] * trend + seasonal[future_months]
+        return np.maximum(forecast, 0)
+
+    def summarize(self, history: Dict, forecast: np.ndarray, months: int) -> Dict:
+        keys = history["keys"]
+        income = np.array([type_ == "income" for _, type_ in keys], dtype=bool)
+        income_totals = forecast[:, income].sum(axis=1)
+        expense_totals = forecast[:, ~income].sum(axis=1)
+        net = income_totals - expense_totals
+        balance = history["balance"] + np.cumsum(net)
+
+        start = history["first_month"] + history["values"].shape[0]
+        rounded = np.round(forecast, 2).tolist()
+        result = []
+        for i in range(months):
+            month = start + i
+            categories = {"income": {}, "expense": {}}
+            for (category, type_), amount in zip(keys, rounded[i]):
+                categories.setdefault(type_, {})[category] = amount
+            result.append({
+                "month": f"{month // 12:04d}-{month % 12 + 1:02d}",
+                "income": round(float(income_totals[i]), 2),
+                "expenses": round(float(expense_totals[i]), 2),
+                "net": round(float(net[i]), 2),
+                "balance": round(float(balance[i]), 2),
+                "categories": categories,
+            })
+        return {
+            "history_months": int(history["values"].shape[0]),
+            "starting_balance": round(float(history["balance"]), 2),
+            "method": {"alpha": self.alpha, "beta": self.beta, "phi": self.phi},
+            "forecast": result,
+        }
 
 class AdvisorAgent(BaseAgent):
     def __init__(self, llm=None):
@@ -202,14 +807,39 @@ class AdvisorAgent(BaseAgent):
     def process(self, task: Dict) -> Dict:
         if not self.llm:
             return self.handle_error(Exception("No LLM available"), 
-                {"advice": "Unable to provide advice without LLM"})
+                {"advice": "Unable to provide advice without LLM", "error": "No LLM available"})
 
         try:
             prompt = self.create_advice_prompt(task)
             response = self.llm.invoke(prompt).strip()
             return {"advice": response}
         except Exception as e:
-            return self.handle_error(e, {"advice": "Failed to generate advice"})
+            return self.handle_error(e, {"advice": "Failed to generate advice", "error": str(e)})
+
+    async def aprocess(self, task: Dict) -> Dict:
+        """Like `process`, but awaits the model without blocking the event loop"""
+        if not self.llm:
+            return self.handle_error(Exception("No LLM available"), 
+                {"advice": "Unable to provide advice without LLM", "error": "No LLM available"})
+
+        try:
+            prompt = self.create_advice_prompt(task)
+            response = (await self.llm.ainvoke(prompt)).strip()
+            return {"advice": response}
+        except Exception as e:
+            return self.handle_error(e, {"advice": "Failed to generate advice", "error": str(e)})
+
+    async def astream(self, task: Dict) -> AsyncIterator[str]:
+        """
+        Yield advice tokens as the model produces them. Closing the generator
+        (e.g. when the client disconnects) cancels the generation.
+        """
+        if not self.llm:
+            raise RuntimeError("Unable to provide advice without LLM")
+
+        prompt = self.create_advice_prompt(task)
+        async for chunk in self.llm.astream(prompt):
+            yield chunk
 
     def create_advice_prompt(self, task: Dict) -> str:
         return f"""
@@ -226,18 +856,40 @@ class AdvisorAgent(BaseAgent):
         """
 
 class LLMService:
-    def __init__(self, model_name: str = "llama3.2"):
+    def __init__(
+        self,
+        model_name: str = "llama3.2",
+        category_cache_path: Optional[str] = None,
+        advice_cache_path: Optional[str] = None
+    ):
         try:
-            llm = OllamaLLM(model=model_name)
+            llm = StubLLM() if model_name == "stub" else OllamaLLM(model=model_name)
         except Exception as e:
             print(f"Warning: Could not initialize LLM: {str(e)}")
             llm = None
 
         # Initialize agents
         self.delegator = DelegatorAgent(llm)
-        self.delegator.register_agent(CategoryAgent(llm))
+        self.category_cache = CategorizationCache(
+            maxsize=int(os.getenv("CATEGORY_CACHE_SIZE", "50000")),
+            path=category_cache_path or os.getenv("CATEGORY_CACHE_PATH")
+        )
+        self.delegator.register_agent(CategoryAgent(
+            llm,
+            cache=self.category_cache,
+            llm_batch_size=int(os.getenv("LLM_CATEGORY_BATCH_SIZE", "25")),
+            llm_concurrency=int(os.getenv("LLM_CATEGORY_CONCURRENCY", "4")),
+            llm_timeout=float(os.getenv("LLM_CATEGORY_TIMEOUT", "60"))
+        ))
+        self.category_cache.load()
         self.delegator.register_agent(AnalysisAgent(llm))
         self.delegator.register_agent(AdvisorAgent(llm))
+        self.delegator.register_agent(PredictionAgent(llm))
+        self.advice_cache = AdviceCache(
+            path=advice_cache_path or os.getenv("ADVICE_CACHE_PATH", "./data/advice_cache.db"),
+            maxsize=int(os.getenv("ADVICE_CACHE_SIZE", "1000")),
+            ttl=float(os.getenv("ADVICE_CACHE_TTL", "86400"))
+        )
 
     def process_task(self, task_type: str, **kwargs) -> Dict:
         task = {"type": task_type, **kwargs}
@@ -252,6 +904,33 @@ class LLMService:
         )
         return result.get("category", "Other")
 
+    def categorize_many(
+        self,
+        descriptions: Sequence[str],
+        is_fixed: Optional[Sequence[bool]] = None,
+        transaction_types: Optional[Sequence[str]] = None,
+        use_llm: bool = False
+    ) -> List[str]:
+        """
+        Categorize columns of descriptions / is_fixed flags / types in one
+        task; with use_llm, keyword misses are categorized by the model.
+        """
+        result = self.process_task(
+            "categorize_batch",
+            descriptions=descriptions,
+            is_fixed=is_fixed,
+            transaction_types=transaction_types,
+            use_llm=use_llm
+        )
+        return result.get("categories", ["Other"] * len(descriptions))
+
+    def category_cache_stats(self) -> Dict:
+        return self.category_cache.stats()
+
+    def save_caches(self):
+        """Persist warm caches (no-op unless a cache path is configured)"""
+        self.category_cache.save()
+
     def batch_categorize(self, transactions: List[Dict]) -> List[str]:
         result = self.process_task(
             "categorize_batch",
@@ -259,13 +938,79 @@ class LLMService:
         )
         return [r.get("category", "Other") for r in result.get("results", [])]
 
-    def analyze_transactions(self, transactions: List[Dict], analysis_type: str = "general") -> Dict:
+    def analyze_transactions(
+        self,
+        transactions: Union[List[Dict], pd.DataFrame],
+        analysis_type: str = "general",
+        limit: int = 10
+    ) -> Dict:
+        """Run one of AnalysisAgent.ANALYSES (or "all") over a list or frame of transactions"""
         return self.process_task(
             "analyze",
             transactions=transactions,
-            analysis_type=analysis_type
+            analysis_type=analysis_type,
+            limit=limit
         )
 
+    def forecast_cash_flow(self, history: Dict, months: int = 12) -> Dict:
+        """Forecast of the months after `history` (see crud.get_monthly_history)"""
+        return self.process_task("predict", history=history, months=months)
+
     def get_financial_advice(self, data: Dict) -> str:
         result = self.process_task("advise", data=data)
-        return result.get("advice", "Unable to provide advice at this time")
\ No newline at end of file
+        return result.get("advice", "Unable to provide advice at this time")
+
+    async def aget_financial_advice(
+        self,
+        data: Dict,
+        question: Optional[str] = None,
+        context: Optional[Dict] = None,
+        scopes: Sequence[str] = ()
+    ) -> str:
+        """
+        Advice for a prompt. With a question and the context the prompt was
+        built from, answers are served from / stored in the advice cache;
+        `scopes` are the data changes that invalidate the cached answer.
+        """
+        cacheable = question is not None and context is not None
+        if cacheable:
+            cached = self.advice_cache.get(question, context)
+            if cached is not None:
+                return cached
+
+        result = await self.delegator.aprocess({"type": "advise", "data": data})
+        advice = result.get("advice", "Unable to provide advice at this time")
+        if cacheable and "error" not in result:
+            self.advice_cache.put(question, context, advice, scopes)
+        return advice
+
+    async def stream_financial_advice(
+        self,
+        data: Dict,
+        question: Optional[str] = None,
+        context: Optional[Dict] = None,
+        scopes: Sequence[str] = ()
+    ) -> AsyncIterator[str]:
+        """
+        Stream advice tokens. A cached answer is yielded in one piece; a
+        completed stream is cached like `aget_financial_advice`.
+        """
+        cacheable = question is not None and context is not None
+        if cacheable:
+            cached = self.advice_cache.get(question, context)
+            if cached is not None:
+                yield cached
+                return
+
+        chunks = []
+        async for chunk in self.delegator.astream({"type": "advise", "data": data}):
+            chunks.append(chunk)
+            yield chunk
+        if cacheable:
+            self.advice_cache.put(question, context, "".join(chunks).strip(), scopes)
+
+    def advice_cache_stats(self) -> Dict:
+        return self.advice_cache.stats()
+
+    def invalidate_advice(self, scopes: Iterable[str]):
+        self.advice_cache.invalidate(scopes)
@@ -0,0 +1,64 @@
+# services/scheduler.py
+"""
+In-process scheduler for recurring transactions.
+
+Every `interval` seconds (and once at startup) it materializes all
+occurrences due up to today. Schedules remember how far they have been
+materialized, so the first run after downtime catches up on every missed
+occurrence, and the unique occurrence key makes overlapping runs (several
+workers, a manual call) harmless.
+"""
+import asyncio
+import logging
+from datetime import date
+from typing import Callable, Optional
+
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy.orm import Session
+
+from .. import crud
+
+logger = logging.getLogger(__name__)
+
+
+class RecurringScheduler:
+    def __init__(
+        self,
+        session_factory: Callable[[], Session],
+        interval: float = 3600,
+        today: Callable[[], date] = date.today
+    ):
+        self.session_factory = session_factory
+        self.interval = interval
+        self.today = today
+        self._task: Optional[asyncio.Task] = None
+
+    def run_once(self) -> int:
+        """Materialize everything due; returns the number of new transactions"""
+        with self.session_factory() as db:
+            created = len(crud.materialize_occurrences(db, self.today()))
+        if created:
+            logger.info(f"Materialized {created} recurring transactions")
+        return created
+
+    async def _run(self):
+        while True:
+            try:
+                await run_in_threadpool(self.run_once)
+            except Exception as e:
+                # Retried on the next tick; nothing is lost, the watermark didn't move
+                logger.error(f"Error materializing recurring transactions: {str(e)}")
+            await asyncio.sleep(self.interval)
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
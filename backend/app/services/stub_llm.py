@@ -0,0 +1,59 @@
+# services/stub_llm.py
+"""
+Deterministic stand-in for the Ollama model, for tests and benchmarks.
+
+Select it with `LLMService("stub")` (or LLM_MODEL=stub). It implements the
+subset of the LangChain LLM interface the agents use: invoke, ainvoke and
+astream.
+"""
+import asyncio
+import json
+import re
+import time
+from typing import AsyncIterator, Callable, List, Optional
+
+# The JSON list of transactions in a CategoryAgent prompt
+_TRANSACTIONS = re.compile(r'^\s*(\[\{.*\}\])\s*$', re.MULTILINE)
+
+class StubLLM:
+    """
+    Answers categorization prompts with `category_for(description, type)`
+    for every transaction and anything else with a fixed `advice` text,
+    after sleeping `latency` seconds to mimic inference time.
+    """
+
+    def __init__(
+        self,
+        category_for: Optional[Callable[[str, str], str]] = None,
+        advice: str = "Keep your fixed costs below half of your income.",
+        latency: float = 0.0
+    ):
+        self.category_for = category_for or (lambda description, transaction_type: "Shopping")
+        self.advice = advice
+        self.latency = latency
+        self.calls = 0
+
+    def respond(self, prompt: str) -> str:
+        self.calls += 1
+        match = _TRANSACTIONS.search(prompt)
+        if not match:
+            return self.advice
+        items = json.loads(match.group(1))
+        return json.dumps({"categories": [
+            self.category_for(item["description"], item.get("type", "expense"))
+            for item in items
+        ]})
+
+    def invoke(self, prompt: str) -> str:
+        time.sleep(self.latency)
+        return self.respond(prompt)
+
+    async def ainvoke(self, prompt: str) -> str:
+        await asyncio.sleep(self.latency)
+        return self.respond(prompt)
+
+    async def astream(self, prompt: str) -> AsyncIterator[str]:
+        await asyncio.sleep(self.latency)
+        words: List[str] = self.respond(prompt).split(' ')
+        for index, word in enumerate(words):
+            yield word if index == len(words) - 1 else word + ' '
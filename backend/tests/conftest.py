@@ -0,0 +1,46 @@
+import os
+import tempfile
+
+# The app creates its engines and caches on import, so they are pointed at a
+# scratch directory before anything from it is imported
+_data_dir = tempfile.mkdtemp(prefix="aequitasiq-tests-")
+os.environ["DATABASE_URL"] = f"sqlite:///{_data_dir}/finance.db"
+os.environ["ADVICE_CACHE_PATH"] = os.path.join(_data_dir, "advice_cache.db")
+os.environ["RECURRING_SCHEDULER_INTERVAL_SECONDS"] = "0"
+# The deterministic stand-in for the Ollama model, see app.services.stub_llm
+os.environ["LLM_MODEL"] = "stub"
+
+import pytest
+from sqlalchemy.orm import Session
+
+from app.crud import changes
+from app.database import create_db_engine
+from app.migrations import run_migrations
+from app.models.base import Base
+
+
+@pytest.fixture
+def engine(tmp_path):
+    """A fresh, migrated database file"""
+    engine = create_db_engine(f"sqlite:///{tmp_path}/finance.db")
+    Base.metadata.create_all(bind=engine)
+    run_migrations(engine)
+    yield engine
+    engine.dispose()
+
+
+@pytest.fixture
+def db(engine):
+    # Module-level caches outlive the previous test's database
+    for listener in changes._commit_listeners:
+        listener({"transactions", "bills"})
+    with Session(bind=engine) as session:
+        yield session
+
+
+@pytest.fixture(scope="session")
+def client():
+    """The app on the scratch database of the test session"""
+    from fastapi.testclient import TestClient
+    from app.main import app
+    return TestClient(app)
@@ -0,0 +1,70 @@
+import json
+from datetime import date
+
+import pytest
+
+from app.main import llm_service
+from app.services.stub_llm import StubLLM
+
+QUESTION = {"question": "Can I afford a holiday?"}
+ADVICE = StubLLM().advice
+
+
+@pytest.fixture(autouse=True)
+def empty_advice_cache():
+    llm_service.advice_cache.clear()
+
+
+def cache_stats(client):
+    return client.get("/finance/ask/cache").json()
+
+
+def sse_events(body: str):
+    for message in body.strip().split("\n\n"):
+        event, data = message.split("\n", 1)
+        yield event[len("event: "):], json.loads(data[len("data: "):])
+
+
+def test_ask_is_deterministic_and_cached(client):
+    before = cache_stats(client)
+    first = client.post("/finance/ask", json=QUESTION).json()
+    second = client.post("/finance/ask", json=QUESTION).json()
+
+    assert first["response"] == second["response"] == ADVICE
+    assert first["context"] == second["context"]
+    after = cache_stats(client)
+    assert (after["misses"] - before["misses"], after["hits"] - before["hits"]) == (1, 1)
+
+
+def test_stream_yields_the_answer_then_serves_it_from_cache(client):
+    before = cache_stats(client)
+    events = list(sse_events(client.post("/finance/ask/stream", json=QUESTION).text))
+    assert events[0][0] == "context" and events[-1] == ("done", {})
+    tokens = [data["token"] for event, data in events if event == "token"]
+    assert len(tokens) > 1 and "".join(tokens) == ADVICE
+
+    cached = list(sse_events(client.post("/finance/ask/stream", json=QUESTION).text))
+    assert [event for event, _ in cached] == ["context", "token", "done"]
+    assert cached[1][1]["token"] == ADVICE
+    assert cache_stats(client)["hits"] - before["hits"] == 1
+    # Streamed and plain answers share the cache
+    assert client.post("/finance/ask", json=QUESTION).json()["response"] == ADVICE
+    assert cache_stats(client)["hits"] - before["hits"] == 2
+
+
+def test_writes_invalidate_only_the_scopes_they_touch(client):
+    def transaction(day: date) -> dict:
+        return {"date": day.isoformat(), "description": "Coop", "amount": 20.5, "category": "Food", "type": "expense"}
+
+    client.post("/finance/ask", json=QUESTION)
+    before = cache_stats(client)
+
+    # Another month: the current month's context and its cached answer stay
+    client.post("/transactions/", json=transaction(date(2020, 1, 15)))
+    assert cache_stats(client)["invalidations"] == before["invalidations"]
+    client.post("/finance/ask", json=QUESTION)
+    assert cache_stats(client)["hits"] == before["hits"] + 1
+
+    client.post("/transactions/", json=transaction(date.today()))
+    after = cache_stats(client)
+    assert after["invalidations"] == before["invalidations"] + 1 and after["size"] == 0
@@ -0,0 +1,28 @@
+from app.services.llm_service import AnalysisAgent
+
+
+def transaction(day, amount, type="expense", category="Food", description="Coop"):
+    return {"date": day, "description": description, "amount": amount, "category": category, "type": type}
+
+
+def test_monthly_averages_span_months_without_transactions():
+    agent = AnalysisAgent()
+    frame = agent.as_frame([
+        transaction("2024-01-10", 3000, type="income", category="Salary"),
+        transaction("2024-01-15", 300),
+        # Nothing in February
+        transaction("2024-03-20", 600),
+    ])
+    general = agent.analyze("general", frame)
+    assert general["months"] == 3
+    assert general["average_monthly_income"] == 1000
+    assert general["average_monthly_expenses"] == 300
+
+    month_over_month = agent.analyze("month_over_month", frame)
+    assert month_over_month["months"] == ["2024-01", "2024-02", "2024-03"]
+
+
+def test_empty_frame():
+    agent = AnalysisAgent()
+    general = agent.analyze("general", agent.as_frame([]))
+    assert general["months"] == 0 and general["average_monthly_income"] == 0
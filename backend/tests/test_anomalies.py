@@ -0,0 +1,45 @@
+from datetime import date, timedelta
+
+from app import crud, models, schemas
+
+
+def item(day: int, amount: float, description: str = "Migros 4521", category: str = "Food") -> schemas.TransactionCreate:
+    return schemas.TransactionCreate(
+        date=date(2024, 1, 1) + timedelta(days=day),
+        description=description,
+        amount=amount,
+        category=category,
+        type="expense",
+    )
+
+
+def stored_stats(db):
+    return sorted(
+        (stat.kind, stat.key, stat.type, stat.count, round(stat.mean, 6), round(stat.m2, 6))
+        for stat in db.query(models.AmountStat)
+    )
+
+
+def test_incremental_stats_match_a_rebuild(db):
+    ids = crud.bulk_create_transactions(db, [
+        item(day, 20 + day % 7, description=f"Shop {day % 3}", category=("Food", "Fun")[day % 2])
+        for day in range(60)
+    ])
+    crud.bulk_update_transactions(db, [(i, schemas.TransactionUpdate(amount=99, category="Fun")) for i in ids[:10]])
+    crud.bulk_delete_transactions(db, ids[10:25])
+    crud.delete_transaction(db, ids[30])
+
+    incremental = stored_stats(db)
+    crud.anomalies.rebuild_stats(db)
+    assert stored_stats(db) == incremental
+    assert {(kind, key, count) for kind, key, _, count, _, _ in incremental} >= {("merchant", "shop", 44)}
+
+
+def test_outliers_and_repeats_are_flagged(db):
+    crud.bulk_create_transactions(db, [item(day, 40 + day % 5) for day in range(20)])
+    spike, repeat = crud.bulk_create_transactions(db, [item(25, 900), item(3, 43)])
+
+    flagged = {(anomaly.transaction_id, anomaly.reason) for anomaly in crud.get_anomalies(db)}
+    assert flagged == {(spike, "category"), (spike, "merchant"), (repeat, "duplicate")}
+    [merchant] = crud.get_anomalies(db, reason="merchant")
+    assert merchant.key == "migros" and merchant.expected == 42.05 and merchant.z_score > 4
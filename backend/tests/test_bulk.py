@@ -0,0 +1,53 @@
+from sqlalchemy.exc import OperationalError
+
+from app import crud
+
+
+def item(**fields):
+    return {"date": "2024-01-01", "description": "Bulk", "amount": 10, "category": "Other", "type": "expense", **fields}
+
+
+def test_create_reports_each_item(client):
+    response = client.post("/transactions/bulk", json=[item(), item(amount=-5), item(description="Bulk 2")])
+    assert response.status_code == 200
+    body = response.json()
+    assert [result["status"] for result in body["results"]] == ["created", "invalid", "created"]
+    assert body["counts"] == {"created": 2, "invalid": 1}
+    assert body["results"][1]["errors"][0]["loc"] == ["amount"]
+
+
+def test_update_and_delete_report_missing_ids(client):
+    ids = [result["id"] for result in client.post("/transactions/bulk", json=[item(), item()]).json()["results"]]
+    updated = client.patch("/transactions/bulk", json=[{"id": ids[0], "amount": 20}, {"id": 10 ** 9, "amount": 1}])
+    assert [result["status"] for result in updated.json()["results"]] == ["updated", "not_found"]
+    assert client.get(f"/transactions/{ids[0]}").json()["amount"] == 20
+
+    deleted = client.request("DELETE", "/transactions/bulk", json={"ids": [ids[1], 10 ** 9]})
+    assert [result["status"] for result in deleted.json()["results"]] == ["deleted", "not_found"]
+
+
+def test_constraint_violation_rolls_back_the_batch(client):
+    ids = [result["id"] for result in client.post("/transactions/bulk", json=[item(), item()]).json()["results"]]
+    response = client.patch("/transactions/bulk", json=[
+        {"id": ids[0], "amount": 99},
+        {"id": ids[1], "category": None},  # NOT NULL in the database
+        {"id": ids[1], "amount": "x"},
+    ])
+    assert response.status_code == 409
+    detail = response.json()["detail"]
+    assert "NOT NULL" in detail["error"]
+    assert [result["status"] for result in detail["results"]] == ["rolled_back", "rolled_back", "invalid"]
+    # Nothing of the batch was written
+    assert client.get(f"/transactions/{ids[0]}").json()["amount"] == 10
+
+
+def test_database_error_is_reported_per_item(client, monkeypatch):
+    def fail(db, items):
+        raise OperationalError("INSERT", {}, Exception("database is locked"))
+
+    monkeypatch.setattr(crud, "bulk_create_transactions", fail)
+    response = client.post("/transactions/bulk", json=[item(), item(type="transfer")])
+    assert response.status_code == 500
+    detail = response.json()["detail"]
+    assert detail["error"] == "database is locked"
+    assert detail["counts"] == {"rolled_back": 1, "invalid": 1}
@@ -0,0 +1,11 @@
+from app.diagnostics import check_concurrency
+
+
+def test_wal_readers_proceed_during_bulk_write():
+    assert check_concurrency(rows=40000, readers=2, journal_mode="WAL", max_stall=0.5)
+
+
+def test_rollback_journal_readers_stall_during_bulk_write():
+    # The control: without WAL the writer's cache spill locks readers out
+    # until the commit
+    assert not check_concurrency(rows=40000, readers=2, journal_mode="DELETE", max_stall=0.5)
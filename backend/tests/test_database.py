@@ -0,0 +1,47 @@
+import os
+import subprocess
+import sys
+import textwrap
+from pathlib import Path
+
+from app.database import is_memory_database, shared_memory_url
+
+BACKEND = Path(__file__).resolve().parents[1]
+
+# Run in a fresh interpreter: the app builds its engines from DATABASE_URL on import
+IN_MEMORY_APP = textwrap.dedent("""
+    from fastapi.testclient import TestClient
+    from app.main import app
+
+    client = TestClient(app)
+    created = client.post("/transactions/", json={
+        "date": "2024-02-01", "description": "Coop", "amount": 20.5, "category": "Food", "type": "expense",
+    })
+    assert created.status_code == 200, created.text
+    # read_transactions and update_transaction run on the async engines
+    updated = client.put(f"/transactions/{created.json()['id']}", json={"amount": 25.0})
+    assert updated.status_code == 200, updated.text
+    page = client.get("/transactions/").json()
+    assert [t["amount"] for t in page["transactions"]] == [25.0], page
+""")
+
+
+def test_memory_urls_become_one_shared_database():
+    url = shared_memory_url("sqlite://")
+    assert is_memory_database(url) and "cache=shared" in url
+    assert shared_memory_url(url) == url
+    assert shared_memory_url("sqlite:///./data/finance.db") == "sqlite:///./data/finance.db"
+
+
+def test_async_routes_share_an_in_memory_database(tmp_path):
+    env = dict(
+        os.environ,
+        DATABASE_URL="sqlite://",
+        ADVICE_CACHE_PATH=str(tmp_path / "advice_cache.db"),
+        RECURRING_SCHEDULER_INTERVAL_SECONDS="0",
+        PYTHONPATH=str(BACKEND),
+    )
+    result = subprocess.run(
+        [sys.executable, "-c", IN_MEMORY_APP], cwd=tmp_path, env=env, capture_output=True, text=True, timeout=120
+    )
+    assert result.returncode == 0, result.stderr[-2000:]
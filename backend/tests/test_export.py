@@ -0,0 +1,34 @@
+import pytest
+
+from app.services.exporter import TRANSACTION_COLUMNS, accepts_gzip
+
+
+@pytest.mark.parametrize("header, accepted", [
+    (None, False),
+    ("", False),
+    ("gzip", True),
+    ("gzip, deflate, br", True),
+    ("br;q=1.0, gzip;q=0.8", True),
+    ("GZIP", True),
+    ("x-gzip", True),
+    ("*", True),
+    ("gzip;q=0", False),
+    ("gzip; q=0.000", False),
+    ("deflate, gzip;q=0", False),
+    ("*;q=0", False),
+    ("*, gzip;q=0", False),
+    ("identity", False),
+])
+def test_accepts_gzip(header, accepted):
+    assert accepts_gzip(header) is accepted
+
+
+def test_export_honours_gzip_refusal(client):
+    refused = client.get("/export/transactions", headers={"Accept-Encoding": "gzip;q=0"})
+    assert refused.status_code == 200
+    assert "content-encoding" not in refused.headers
+    assert refused.text.splitlines()[0] == ",".join(TRANSACTION_COLUMNS)
+
+    accepted = client.get("/export/transactions", headers={"Accept-Encoding": "gzip"})
+    assert accepted.headers["content-encoding"] == "gzip"
+    assert accepted.content == refused.content  # httpx decodes the gzip body
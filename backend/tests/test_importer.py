@@ -0,0 +1,65 @@
+import io
+
+from app import models
+from app.services import importer
+
+
+def categorize(descriptions, is_fixed, types):
+    return ["Other"] * len(descriptions)
+
+
+def import_csv(db, text, **kwargs):
+    return importer.import_csv(db, io.BytesIO(text.encode()), categorize, **kwargs)
+
+
+def test_amounts_are_stored_as_parsed(db):
+    report = import_csv(db, "date,description,amount,type\n2024-02-01,Fuel,-12.345,expense\n2024-02-02,Rent,1500,expense\n")
+    assert report.imported == 2
+    assert sorted(amount for (amount,) in db.query(models.Transaction.amount)) == [12.345, 1500.0]
+
+
+def test_invalid_rows_are_reported_and_the_rest_imported(db):
+    report = import_csv(
+        db,
+        "date,description,amount,type,category\n"
+        "2024-02-01,Coop,20.5,expense,Food\n"
+        "bad,x,1,expense,Other\n"
+        "2024-02-03,y,abc,expense,Other\n"
+        "2024-02-04,,3,expense,\n"
+        "2024-02-05,z,4,transfer,Other\n",
+        batch_size=2
+    )
+    assert report.imported == 1
+    assert [failure["row"] for failure in report.failed_rows] == [3, 4, 5, 6]
+    assert db.query(models.Transaction).one().category == "Food"
+
+
+def test_rows_already_stored_are_skipped(db):
+    csv = "date,description,amount,type\n2024-02-01,Coop 4521,20.5,expense\n"
+    import_csv(db, csv)
+    report = import_csv(db, csv)
+    assert report.imported == 0 and report.duplicates == 1 and len(report.duplicate_rows) == 1
+    assert db.query(models.Transaction).count() == 1
+
+
+def test_rows_repeated_within_a_batch_are_skipped(db):
+    report = import_csv(
+        db,
+        "date,description,amount,type\n"
+        "2024-02-01,Coop 4521,20.5,expense\n"
+        "2024-02-01,Coop 4521,20.5,expense\n"
+        "2024-02-02,Coop 4521,20.5,expense\n"
+    )
+    assert report.imported == 2 and report.duplicates == 1
+    assert report.duplicate_rows[0]["row"] == 3
+    assert db.query(models.Transaction).count() == 2
+
+
+def test_duplicate_report_is_capped(db):
+    rows = "".join(f"2024-02-01,Shop {i},{i},expense\n" for i in range(importer.SAMPLE_ROWS + 20))
+    csv = "date,description,amount,type\n" + rows
+    import_csv(db, csv, batch_size=50)
+    response = import_csv(db, csv, batch_size=50).to_response()
+    assert response["duplicates"] == importer.SAMPLE_ROWS + 20
+    assert len(response["duplicate_rows"]) == importer.SAMPLE_ROWS
+    assert response["duplicate_rows_truncated"]
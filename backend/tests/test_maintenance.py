@@ -0,0 +1,16 @@
+import pytest
+
+from app import maintenance
+from app.database import SessionLocal
+
+
+@pytest.mark.parametrize("command", ["rebuild-rollups", "rebuild-search-index"])
+def test_rebuild_changes_the_etag(client, command):
+    before = client.get("/transactions/").headers["etag"]
+    assert client.get("/transactions/", headers={"If-None-Match": before}).status_code == 304
+
+    with SessionLocal() as db:
+        maintenance.COMMANDS[command](db)
+
+    after = client.get("/transactions/", headers={"If-None-Match": before})
+    assert after.status_code == 200 and after.headers["etag"] != before
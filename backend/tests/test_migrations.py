@@ -0,0 +1,18 @@
+from sqlalchemy import inspect, text
+
+from app.migrations import DROPPED_INDEXES, run_migrations
+
+
+def index_names(engine):
+    return {index["name"] for index in inspect(engine).get_indexes("transactions")}
+
+
+def test_unused_indexes_are_dropped_and_declared_ones_created(engine):
+    with engine.begin() as conn:
+        conn.execute(text("CREATE INDEX ix_transactions_date_type_amount ON transactions (date, type, amount)"))
+        conn.execute(text("DROP INDEX ix_transactions_category_id"))
+
+    run_migrations(engine)
+    names = index_names(engine)
+    assert not names & set(DROPPED_INDEXES)
+    assert "ix_transactions_category_id" in names
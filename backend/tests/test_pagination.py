@@ -0,0 +1,44 @@
+from datetime import date, timedelta
+
+import pytest
+
+from app import crud, models
+from app.crud import pagination
+from app.diagnostics import explain, index_checks
+
+
+def test_every_keyset_page_seeks_an_index(db):
+    for name, query, expected_index in index_checks(db):
+        plan = explain(db, query)
+        assert any(expected_index in line for line in plan), (name, plan)
+        if name.startswith("transactions keyset page"):
+            assert not any("TEMP B-TREE" in line for line in plan), (name, plan)
+
+
+@pytest.mark.parametrize("field", pagination.SORTABLE_FIELDS)
+def test_cursor_pages_cover_every_row_once(db, field):
+    db.add_all([
+        models.Transaction(
+            date=date(2024, 1, 1) + timedelta(days=i % 4),
+            description=f"Shop {i % 3}",
+            amount=float(i % 5),
+            category=("Food", "Fun")[i % 2],
+            type=("expense", "income")[i % 3 == 0],
+        )
+        for i in range(23)
+    ])
+    db.commit()
+
+    seen, cursor = [], None
+    while True:
+        page = crud.get_transactions(db, limit=5, sort_field=field, sort_direction="desc", cursor=cursor)
+        seen += [(getattr(transaction, field), transaction.id) for transaction in page["transactions"]]
+        cursor = page["next_cursor"]
+        if not cursor:
+            break
+    assert seen == sorted(seen, reverse=True) and len(set(seen)) == 23
+
+
+@pytest.mark.parametrize("field", ["created_at", "is_fixed", "frequency"])
+def test_fields_without_a_seek_index_are_not_sortable(field):
+    assert pagination.normalize_sort(field, "asc") == ("date", "desc")
@@ -0,0 +1,101 @@
+from datetime import date, timedelta
+
+import orjson
+from dateutil.relativedelta import relativedelta
+
+from app import models
+from app.crud import projection
+
+
+def add_bills(db, *bills):
+    db.add_all(models.Bill(**bill) for bill in bills)
+    db.commit()
+
+
+def upcoming(db, start, end, category=None):
+    return orjson.loads(projection.get_upcoming_bills(db, start, end, category))
+
+
+def naive_occurrences(bills, start, end):
+    occurrences = []
+    for bill in bills:
+        step = projection.FREQUENCY_MONTHS.get(bill.frequency, 0) if bill.is_recurring else 0
+        n = 0
+        while True:
+            due = bill.due_date + relativedelta(months=n * step)
+            if due > end:
+                break
+            if due >= start:
+                occurrences.append((due.isoformat(), bill.id))
+            if not step:
+                break
+            n += 1
+    return sorted(occurrences)
+
+
+def test_matches_naive_expansion(db):
+    frequencies = ["monthly", "quarterly", "yearly", None, "weekly"]
+    add_bills(db, *(
+        {
+            "name": f"Bill {i}",
+            "amount": 10 + i % 7,
+            "due_date": date(2023, 1, 1) + timedelta(days=i * 37 % 700),
+            "category": ("Utilities", "Housing")[i % 2],
+            "is_recurring": frequencies[i % 5] is not None,
+            "frequency": frequencies[i % 5],
+        }
+        for i in range(60)
+    ))
+    start, end = date(2024, 2, 10), date(2025, 3, 9)
+    calendar = upcoming(db, start, end)
+
+    expected = naive_occurrences(db.query(models.Bill).all(), start, end)
+    assert [(o["due_date"], o["bill_id"]) for o in calendar["occurrences"]] == expected
+    assert calendar["count"] == len(expected)
+    assert calendar["start_date"] == start.isoformat() and calendar["end_date"] == end.isoformat()
+    assert calendar["total_amount"] == round(sum(o["amount"] for o in calendar["occurrences"]), 2)
+
+
+def test_clamps_to_month_end_and_filters_category(db):
+    add_bills(
+        db,
+        {"name": "Rent", "amount": 1500.5, "due_date": date(2024, 1, 31), "category": "Housing",
+         "is_recurring": True, "frequency": "monthly"},
+        {"name": "Power", "amount": 80, "due_date": date(2024, 1, 5), "category": "Utilities",
+         "is_recurring": True, "frequency": "monthly"},
+    )
+    calendar = upcoming(db, date(2024, 2, 1), date(2024, 4, 30), category="Housing")
+    assert [o["due_date"] for o in calendar["occurrences"]] == ["2024-02-29", "2024-03-31", "2024-04-30"]
+    assert calendar["occurrences"][0] == {
+        "bill_id": 1, "name": "Rent", "amount": 1500.5, "category": "Housing",
+        "frequency": "monthly", "due_date": "2024-02-29",
+    }
+    assert calendar["total_amount"] == 4501.5
+
+
+def test_no_bills(db):
+    assert upcoming(db, date(2024, 1, 1), date(2024, 12, 31)) == {
+        "start_date": "2024-01-01", "end_date": "2024-12-31",
+        "count": 0, "total_amount": 0.0, "occurrences": [],
+    }
+
+
+def test_route_returns_json(client):
+    response = client.get("/bills/upcoming", params={"horizon": 90, "start_date": "2024-01-01"})
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/json"
+    assert response.json()["end_date"] == "2024-03-30"
+
+
+def test_bills_list_is_documented_without_a_response_model(client):
+    client.post("/bills/", json={
+        "name": "Rent", "amount": 1500, "due_date": "2024-02-01", "category": "Housing",
+        "is_recurring": True, "frequency": "monthly",
+    })
+    bills = client.get("/bills/")
+    assert bills.headers["content-type"] == "application/json"
+    assert any(bill["name"] == "Rent" and bill["due_date"] == "2024-02-01" for bill in bills.json())
+
+    operation = client.get("/openapi.json").json()["paths"]["/bills/"]["get"]
+    schema = operation["responses"]["200"]["content"]["application/json"]["schema"]
+    assert schema["type"] == "array" and schema["items"]["$ref"].endswith("/Bill")
@@ -0,0 +1,142 @@
+from datetime import date
+
+from app import crud, models, schemas
+from app.migrations import schedules_from_fixed_transactions
+
+
+def fixed(**fields) -> dict:
+    return {
+        "date": date(2024, 1, 15),
+        "description": "Rent",
+        "amount": 1500,
+        "category": "Housing",
+        "type": "expense",
+        "is_fixed": True,
+        "frequency": "monthly",
+        **fields,
+    }
+
+
+def schedules(db):
+    db.expire_all()
+    return db.query(models.RecurringSchedule).order_by(models.RecurringSchedule.id).all()
+
+
+def occurrences(db, schedule_id):
+    return [
+        transaction.occurrence_date
+        for transaction in db.query(models.Transaction)
+        .filter(models.Transaction.schedule_id == schedule_id)
+        .order_by(models.Transaction.occurrence_date)
+    ]
+
+
+def test_create_starts_schedule(db):
+    transaction = crud.create_transaction(db, schemas.TransactionCreate(**fixed()))
+    [schedule] = schedules(db)
+    assert schedule.transaction_id == transaction.id
+    assert transaction.schedule_id == schedule.id
+
+    crud.materialize_occurrences(db, date(2024, 3, 31))
+    crud.materialize_occurrences(db, date(2024, 3, 31))
+    assert occurrences(db, schedule.id) == [date(2024, 1, 15), date(2024, 2, 15), date(2024, 3, 15)]
+
+
+def test_bulk_create_starts_schedules(db):
+    ids = crud.bulk_create_transactions(db, [
+        schemas.TransactionCreate(**fixed()),
+        schemas.TransactionCreate(**fixed(description="Gym", frequency="quarterly")),
+        schemas.TransactionCreate(**fixed(description="Coffee", is_fixed=False, frequency=None)),
+    ])
+    started = schedules(db)
+    assert [schedule.transaction_id for schedule in started] == ids[:2]
+    assert [db.get(models.Transaction, i).schedule_id for i in ids] == [started[0].id, started[1].id, None]
+
+    crud.materialize_occurrences(db, date(2024, 4, 30))
+    assert occurrences(db, started[1].id) == [date(2024, 1, 15), date(2024, 4, 15)]
+
+
+def test_update_to_fixed_starts_schedule(db):
+    transaction = crud.create_transaction(db, schemas.TransactionCreate(**fixed(is_fixed=False, frequency=None)))
+    assert schedules(db) == []
+
+    crud.update_transaction(db, transaction.id, schemas.TransactionUpdate(is_fixed=True, frequency="monthly"))
+    [schedule] = schedules(db)
+    assert schedule.transaction_id == transaction.id and schedule.is_active
+
+
+def test_unfixing_template_stops_schedule(db):
+    transaction = crud.create_transaction(db, schemas.TransactionCreate(**fixed()))
+    crud.update_transaction(db, transaction.id, schemas.TransactionUpdate(is_fixed=False))
+    [schedule] = schedules(db)
+    assert not schedule.is_active
+    assert crud.materialize_occurrences(db, date(2024, 6, 30)) == []
+
+    # Fixing it again resumes the same schedule, which catches up
+    crud.update_transaction(db, transaction.id, schemas.TransactionUpdate(is_fixed=True, frequency="monthly"))
+    [schedule] = schedules(db)
+    assert schedule.is_active
+    assert len(crud.materialize_occurrences(db, date(2024, 3, 31))) == 2
+
+
+def test_bulk_unfixing_template_stops_schedule(db):
+    [transaction_id] = crud.bulk_create_transactions(db, [schemas.TransactionCreate(**fixed())])
+    crud.bulk_update_transactions(db, [(transaction_id, schemas.TransactionUpdate(is_fixed=False))])
+    [schedule] = schedules(db)
+    assert not schedule.is_active
+    assert crud.materialize_occurrences(db, date(2024, 6, 30)) == []
+
+
+def test_template_edits_apply_to_later_occurrences(db):
+    transaction = crud.create_transaction(db, schemas.TransactionCreate(**fixed()))
+    crud.update_transaction(db, transaction.id, schemas.TransactionUpdate(amount=1600))
+    [schedule] = schedules(db)
+    assert schedule.amount == 1600 and schedule.is_active
+
+    crud.materialize_occurrences(db, date(2024, 2, 29))
+    february = db.query(models.Transaction).filter(models.Transaction.occurrence_date == date(2024, 2, 15)).one()
+    assert february.amount == 1600
+
+
+def test_deleting_template_stops_schedule(db):
+    transaction = crud.create_transaction(db, schemas.TransactionCreate(**fixed()))
+    crud.delete_transaction(db, transaction.id)
+    [schedule] = schedules(db)
+    assert not schedule.is_active
+    assert crud.materialize_occurrences(db, date(2024, 6, 30)) == []
+
+
+def test_bulk_deleting_template_stops_schedule(db):
+    ids = crud.bulk_create_transactions(db, [schemas.TransactionCreate(**fixed())])
+    crud.bulk_delete_transactions(db, ids)
+    [schedule] = schedules(db)
+    assert not schedule.is_active
+
+
+def test_deleting_occurrence_keeps_schedule(db):
+    crud.create_transaction(db, schemas.TransactionCreate(**fixed()))
+    [february] = crud.materialize_occurrences(db, date(2024, 2, 29))
+    crud.delete_transaction(db, february)
+    [schedule] = schedules(db)
+    assert schedule.is_active
+    # Not recreated either: the watermark is past it
+    crud.materialize_occurrences(db, date(2024, 3, 31))
+    assert occurrences(db, schedule.id) == [date(2024, 1, 15), date(2024, 3, 15)]
+
+
+def test_migrated_schedule_follows_its_template(db, engine):
+    # Fixed transactions from before schedules: a template and one copy
+    db.add_all([
+        models.Transaction(**fixed()),
+        models.Transaction(**fixed(date=date(2024, 2, 15))),
+    ])
+    db.commit()
+    schedules_from_fixed_transactions(engine)
+
+    [schedule] = schedules(db)
+    template = db.query(models.Transaction).filter(models.Transaction.date == date(2024, 1, 15)).one()
+    assert schedule.transaction_id == template.id
+    assert schedule.materialized_through == date(2024, 2, 15)
+
+    crud.delete_transaction(db, template.id)
+    assert not schedules(db)[0].is_active
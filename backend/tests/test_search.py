@@ -0,0 +1,68 @@
+from datetime import date
+
+from app import crud, models
+from app.diagnostics import explain
+
+
+def add_transactions(db, *descriptions):
+    db.add_all(
+        models.Transaction(
+            date=date(2024, 1, 1), description=description, amount=10,
+            category="Groceries", type="expense"
+        )
+        for description in descriptions
+    )
+    db.commit()
+
+
+def search(db, text, **kwargs):
+    page = crud.get_transactions(db, search=text, **kwargs)
+    return [transaction.description for transaction in page["transactions"]], page
+
+
+def test_substring_matches_are_kept_next_to_prefix_matches(db):
+    add_transactions(db, "MIGROS ZÜRICH", "Grossmann Bakery", "Coop")
+    descriptions, page = search(db, "gros")
+    # The token prefix hit ranks first, the substring-only hit follows
+    assert descriptions == ["Grossmann Bakery", "MIGROS ZÜRICH"]
+    assert page["total"] == 2
+
+
+def test_token_prefixes_and_diacritics(db):
+    add_transactions(db, "MIGROS ZÜRICH", "Coop Basel")
+    assert search(db, "migr zur")[0] == ["MIGROS ZÜRICH"]
+    assert search(db, "zurich")[0] == ["MIGROS ZÜRICH"]
+    assert search(db, "xyz")[0] == []
+
+
+def test_category_substring(db):
+    add_transactions(db, "Coop")
+    assert search(db, "ocer")[0] == ["Coop"]
+
+
+def test_cursor_pages_through_ranked_and_substring_hits(db):
+    add_transactions(db, *[f"Grossmann {i}" for i in range(3)], *[f"MIGROS {i}" for i in range(3)])
+    seen, cursor = [], None
+    while True:
+        descriptions, page = search(db, "gros", limit=2, cursor=cursor, include_total=False)
+        seen += descriptions
+        cursor = page["next_cursor"]
+        if cursor is None:
+            break
+    assert sorted(seen) == sorted([f"Grossmann {i}" for i in range(3)] + [f"MIGROS {i}" for i in range(3)])
+    assert [d.split()[0] for d in seen] == ["Grossmann"] * 3 + ["MIGROS"] * 3
+
+
+def test_short_terms_fall_back_to_substring_scan_without_index_hits(db):
+    add_transactions(db, "Coop", "MIGROS")
+    assert search(db, "co")[0] == ["Coop"]  # Word prefix, from the index
+    assert search(db, "oo")[0] == ["Coop"]  # No index hit: substring scan
+
+
+def test_search_is_served_by_the_indexes(db):
+    add_transactions(db, "MIGROS ZÜRICH", "Shop merchant 171")
+    for text in ("gros", "zuri", "migr zur", "merchant 17", "xyz"):
+        query, rank = crud.transaction._transactions_query(db, text, None)
+        plan = explain(db, query)
+        assert rank is not None
+        assert not any(step.startswith("SCAN transactions") and "VIRTUAL TABLE" not in step for step in plan), plan
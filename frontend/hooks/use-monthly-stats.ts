@@ -1,13 +1,18 @@
 import { useQuery } from '@tanstack/react-query'
 import { api } from '@/lib/api'
 
-export interface MonthlyStats {
+export interface MonthlySavings {
   total_income: number
   total_expenses: number
   net_savings: number
   saving_rate: number
 }
 
+export interface MonthlyStats extends MonthlySavings {
+  // Breakdown of the whole year, one entry per month (1-12)
+  months: (MonthlySavings & { month: number })[]
+}
+
 export function useMonthlyStats(year: number, month?: number) {
   return useQuery({
     queryKey: ['monthly-stats', year, month],